@@ -0,0 +1,162 @@
+"""Per-provider circuit breakers driven by error rate and latency."""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is refused because the provider's breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker over a rolling window of call outcomes.
+
+    The breaker opens when, over at least `min_calls` recent calls, either the
+    error rate or the rate of calls slower than `slow_seconds` reaches its
+    threshold. After `open_seconds` it lets a limited number of probe calls
+    through (half-open); a successful probe closes it, a failed one reopens it.
+    """
+
+    def __init__(self, name: str, window: int | None = None, min_calls: int | None = None,
+                 error_rate: float | None = None, slow_seconds: float | None = None,
+                 slow_rate: float | None = None, open_seconds: float | None = None,
+                 half_open_probes: int | None = None):
+        self.name = name
+        self.window = settings.LLM_BREAKER_WINDOW if window is None else window
+        self.min_calls = settings.LLM_BREAKER_MIN_CALLS if min_calls is None else min_calls
+        self.error_rate = settings.LLM_BREAKER_ERROR_RATE if error_rate is None else error_rate
+        self.slow_seconds = settings.LLM_BREAKER_SLOW_SECONDS if slow_seconds is None else slow_seconds
+        self.slow_rate = settings.LLM_BREAKER_SLOW_RATE if slow_rate is None else slow_rate
+        self.open_seconds = settings.LLM_BREAKER_OPEN_SECONDS if open_seconds is None else open_seconds
+        self.half_open_probes = (settings.LLM_BREAKER_HALF_OPEN_PROBES if half_open_probes is None
+                                 else half_open_probes)
+
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[bool, float]] = deque(maxlen=self.window)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self, now: float) -> None:
+        """Move an expired open breaker to half-open (lock held)."""
+        if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+            logger.info("Breaker %s half-open, allowing probes", self.name)
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+        # a probe whose result never arrived must not wedge the breaker
+        if (self.state == HALF_OPEN and self._probes_in_flight
+                and now - self._probe_started_at >= self.open_seconds):
+            self._probes_in_flight = 0
+
+    def available(self) -> bool:
+        """Return True if a call would currently be let through."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                return self._probes_in_flight < self.half_open_probes
+            return False
+
+    def acquire(self) -> bool:
+        """Reserve permission for one call; half-open breakers count probes."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                self._probe_started_at = now
+                return True
+            return False
+
+    def record(self, success: bool, latency: float) -> None:
+        """Record the outcome of a call that was let through."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if success and latency < self.slow_seconds:
+                    logger.info("Breaker %s closed after successful probe", self.name)
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip(time.monotonic())
+                return
+
+            self._outcomes.append((success, latency))
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+                total = len(self._outcomes)
+                errors = sum(1 for ok, _ in self._outcomes if not ok)
+                slow = sum(1 for _, lat in self._outcomes if lat >= self.slow_seconds)
+                if errors / total >= self.error_rate or slow / total >= self.slow_rate:
+                    self._trip(time.monotonic())
+
+    def release(self) -> None:
+        """Give back a call's permission without recording an outcome.
+
+        Used when a call ends for reasons that say nothing about the provider
+        (e.g. the solve deadline ran out), so a half-open probe slot is freed
+        instead of being held until the probe times out.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _trip(self, now: float) -> None:
+        """Open the breaker (lock held)."""
+        logger.warning("Breaker %s opened", self.name)
+        self.state = OPEN
+        self._opened_at = now
+        self._probes_in_flight = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serializable view of the breaker state."""
+        with self._lock:
+            self._refresh(time.monotonic())
+            total = len(self._outcomes)
+            errors = sum(1 for ok, _ in self._outcomes if not ok)
+            latencies = [lat for ok, lat in self._outcomes if ok]
+            return {
+                "state": self.state,
+                "calls": total,
+                "error_rate": round(errors / total, 3) if total else 0.0,
+                "avg_latency": round(sum(latencies) / len(latencies), 3) if latencies else None,
+                "open_for": round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+                if self.state == OPEN else 0.0,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Return the shared breaker for provider `name`, creating it on first use."""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_status() -> Dict[str, Dict[str, Any]]:
+    """Return snapshots of every known breaker keyed by provider name."""
+    with _registry_lock:
+        breakers = dict(_breakers)
+    return {name: b.snapshot() for name, b in breakers.items()}
+
+
+def reset_breakers() -> None:
+    """Forget all breaker state (used by tests)."""
+    with _registry_lock:
+        _breakers.clear()
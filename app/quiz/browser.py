@@ -4,17 +4,29 @@ For Vercel deployment, Playwright cannot run in serverless functions.
 This module provides fallback using httpx for basic HTML fetching.
 """
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import Dict, Any
 from pathlib import Path
+from app.quiz.netcapture import NetworkRecorder
+from app.utils.config import settings
+from app.utils.deadline import Deadline, DeadlineExceeded, call_timeout
+from app.utils.http import get_httpx_client
 from app.utils.logger import get_logger
+from app.utils import metrics, tracing
 
 logger = get_logger("browser")
 
+# Share of the page deadline (at most this many seconds) kept for reading content after the waits
+_COLLECT_SECONDS = 1.0
+
 # Check if running in serverless environment
 IS_SERVERLESS = os.getenv("VERCEL") == "1" or bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
 
 
-def fetch_page_and_downloads(url: str, download_dir: str | None = None, timeout: int = 30) -> Dict[str, Any]:
+def fetch_page_and_downloads(url: str, download_dir: str | None = None, timeout: float = 30,
+                             deadline: Deadline | None = None, method: str | None = None) -> Dict[str, Any]:
     """Fetch page content with appropriate method based on environment.
     
     In serverless mode (Vercel): Uses httpx for basic HTML fetching
@@ -24,22 +36,34 @@ def fetch_page_and_downloads(url: str, download_dir: str | None = None, timeout:
         url: URL to visit
         download_dir: Directory to save downloads
         timeout: Request timeout in seconds
+        deadline: Solve deadline; the timeout is cut to the remaining budget
+        method: "http" forces the plain httpx fetch; "browser" or None picks
+            by environment
         
     Returns:
         Dict with keys: html, url, downloads, js_data
+        
+    Raises:
+        DeadlineExceeded: If too little of the solve budget is left to fetch
     """
-    if IS_SERVERLESS:
-        logger.info("Running in serverless mode - using httpx")
-        return _fetch_with_httpx(url, timeout)
-    else:
-        logger.info("Running in local mode - using Playwright")
-        return _fetch_with_playwright(url, download_dir, timeout)
+    timeout = call_timeout(deadline, timeout, "fetch")
+    with tracing.span("fetch_page_and_downloads", url=url, timeout=round(timeout, 2)) as span:
+        if IS_SERVERLESS or method == "http":
+            logger.info("Using httpx fetch (serverless=%s, method=%s)", IS_SERVERLESS, method)
+            if not IS_SERVERLESS:
+                metrics.fallbacks_total.inc(kind="http_fetch")
+            span.set(method="http")
+            page = _fetch_with_httpx(url, timeout)
+        else:
+            logger.info("Running in local mode - using Playwright")
+            span.set(method="browser")
+            page = _fetch_with_playwright(url, download_dir, timeout, deadline)
+        span.set(bytes=len(page["html"]), downloads=len(page["downloads"]))
+        return page
 
 
-def _fetch_with_httpx(url: str, timeout: int) -> Dict[str, Any]:
+def _fetch_with_httpx(url: str, timeout: float) -> Dict[str, Any]:
     """Fetch HTML using httpx (serverless-compatible)."""
-    import httpx
-    
     try:
         logger.info("Fetching %s with httpx", url)
         
@@ -51,11 +75,11 @@ def _fetch_with_httpx(url: str, timeout: int) -> Dict[str, Any]:
             return {"html": html, "url": url, "downloads": [], "js_data": {}}
         
         # Fetch HTTP/HTTPS URLs
-        with httpx.Client(timeout=timeout, follow_redirects=True) as client:
-            response = client.get(url)
-            response.raise_for_status()
-            html = response.text
-            final_url = str(response.url)
+        response = get_httpx_client().get(url, timeout=timeout)
+        tracing.current_span().set(http_status=response.status_code)
+        response.raise_for_status()
+        html = response.text
+        final_url = str(response.url)
             
         logger.info("Successfully fetched %d bytes", len(html))
         return {"html": html, "url": final_url, "downloads": [], "js_data": {}}
@@ -65,79 +89,214 @@ def _fetch_with_httpx(url: str, timeout: int) -> Dict[str, Any]:
         raise
 
 
-def _fetch_with_playwright(url: str, download_dir: str | None, timeout: int) -> Dict[str, Any]:
-    """Fetch HTML using Playwright (local mode only)."""
-    from app.utils.config import settings
+class BrowserPool:
+    """Long-lived Chromium instances shared by every solve in the process.
     
+    Playwright's sync API binds a browser to the thread that launched it, so
+    each pool thread launches its own browser on first use and keeps it;
+    every fetch then gets a fresh, isolated context. The pool size bounds
+    how many Chromium processes run at once, and launch cost is paid once
+    per thread instead of once per fetch.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="browser")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.launches = 0
+        self.fetches = 0
+        self.active = 0
+
+    def _browser(self, until: float):
+        """Return this thread's browser, launching it if needed."""
+        browser = getattr(self._local, "browser", None)
+        if browser is None or not browser.is_connected():
+            from playwright.sync_api import sync_playwright
+            
+            if getattr(self._local, "playwright", None) is None:
+                self._local.playwright = sync_playwright().start()
+            browser = self._local.playwright.chromium.launch(
+                headless=settings.PLAYWRIGHT_HEADLESS, timeout=min(60000, _left_ms(until))
+            )
+            self._local.browser = browser
+            with self._lock:
+                self.launches += 1
+            logger.info("Launched pooled browser (%d launches)", self.launches)
+        return browser
+
+    def _run(self, url: str, download_path: Path, until: float) -> Dict[str, Any]:
+        with self._lock:
+            self.active += 1
+            self.fetches += 1
+        try:
+            return _render(self._browser(until), url, download_path, until)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def fetch(self, url: str, download_path: Path, timeout: float,
+              deadline: Deadline | None = None) -> Dict[str, Any]:
+        """Render `url` on a pooled browser within `timeout`, queueing included.
+        
+        Raises:
+            DeadlineExceeded: If the solve deadline ran out first
+            TimeoutError: If no browser became free and finished in time
+        """
+        # time spent queued for a browser counts against the fetch budget
+        until = time.monotonic() + timeout
+        # bound to the caller's context so the render can annotate the fetch span
+        future = self._executor.submit(tracing.bind(self._run), url, download_path, until)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            if deadline is not None and deadline.expired(deadline.reserve):
+                raise DeadlineExceeded("fetch", deadline.remaining())
+            raise TimeoutError(f"Browser pool fetch of {url} timed out after {timeout:.1f}s")
+
+    def snapshot(self) -> Dict[str, int]:
+        """Pool size, busy browsers, launches and fetches so far."""
+        with self._lock:
+            return {"size": self.size, "active": self.active, "launches": self.launches, "fetches": self.fetches}
+
+
+_pool: BrowserPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool | None:
+    """Return the shared browser pool, or None when BROWSER_POOL_SIZE is 0."""
+    global _pool
+    if settings.BROWSER_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(settings.BROWSER_POOL_SIZE)
+        return _pool
+
+
+def _pool_usage() -> Dict[tuple, float]:
+    snapshot = _pool.snapshot() if _pool is not None else {"size": settings.BROWSER_POOL_SIZE, "active": 0}
+    return {("active",): snapshot["active"], ("size",): snapshot["size"]}
+
+
+metrics.registry.register(metrics.Gauge(
+    "quiz_browser_pool_browsers", "Pooled browsers busy rendering (active) and the pool size.", ["state"],
+    function=_pool_usage,
+))
+
+
+def _fetch_with_playwright(url: str, download_dir: str | None, timeout: float,
+                           deadline: Deadline | None = None) -> Dict[str, Any]:
+    """Fetch HTML using Playwright (local mode only) within `timeout` seconds overall."""
     download_dir = download_dir or settings.DOWNLOAD_DIR
     download_path = Path(download_dir)
     download_path.mkdir(parents=True, exist_ok=True)
 
     try:
+        pool = get_browser_pool()
+        if pool is not None:
+            return pool.fetch(url, download_path, timeout, deadline)
+
         from playwright.sync_api import sync_playwright
 
+        until = time.monotonic() + timeout
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=settings.PLAYWRIGHT_HEADLESS, timeout=60000)
-            context = browser.new_context(accept_downloads=True)
-            page = context.new_page()
-            page.set_default_timeout(timeout * 1000)
-            
-            logger.info("Navigating to %s", url)
-            
+            browser = p.chromium.launch(headless=settings.PLAYWRIGHT_HEADLESS, timeout=min(60000, _left_ms(until)))
             try:
-                page.goto(url, timeout=timeout * 1000, wait_until="domcontentloaded")
-            except Exception as e:
-                logger.warning("Page navigation timeout/error: %s", e)
-                # Continue with whatever loaded
-                pass
+                return _render(browser, url, download_path, until)
+            finally:
+                browser.close()
 
-            # collect downloads triggered by initial load
-            downloads = []
-            
-            def on_download(download):
-                try:
-                    suggested = download.suggested_filename
-                    dest = download_path / suggested
-                    download.save_as(str(dest))
-                    downloads.append(str(dest))
-                    logger.info("Saved download %s", dest)
-                except Exception as e:
-                    logger.exception("Download failed: %s", e)
+    except Exception as e:
+        logger.exception("Playwright navigation failed: %s", e)
+        raise
 
-            page.on("download", on_download)
 
-            # allow some network activity (with shorter timeout)
-            try:
-                page.wait_for_load_state("networkidle", timeout=min(timeout * 1000, 10000))
-            except Exception:
-                logger.warning("Network idle timeout - continuing anyway")
+def _left_ms(until: float) -> float:
+    """Milliseconds left before `until` (a time.monotonic() value); at least 1, as 0 disables Playwright timeouts."""
+    return max(1.0, (until - time.monotonic()) * 1000)
 
-            html = page.content()
-            final_url = page.url
 
-            # Extract JavaScript global variables that might contain quiz data
-            js_data = {}
+def _render(browser, url: str, download_path: Path, until: float) -> Dict[str, Any]:
+    """Load `url` in a new context of `browser` and collect HTML, downloads and JS data.
+    
+    `until` is one deadline (a time.monotonic() value) for the whole page:
+    every wait gets only what is left of it rather than a fresh timeout, and
+    navigation waits stop a little earlier so reading the content still fits.
+    """
+    loaded_by = until - min(_COLLECT_SECONDS, max(0.0, until - time.monotonic()) / 10)
+    context = browser.new_context(accept_downloads=True)
+    try:
+        page = context.new_page()
+        page.set_default_timeout(_left_ms(until))
+        recorder = NetworkRecorder(page) if settings.HAR_CAPTURE_ENABLED else None
+        
+        logger.info("Navigating to %s", url)
+        
+        try:
+            page.goto(url, timeout=_left_ms(loaded_by), wait_until="domcontentloaded")
+        except Exception as e:
+            logger.warning("Page navigation timeout/error: %s", e)
+            # Continue with whatever loaded
+            pass
+
+        # collect downloads triggered by initial load
+        downloads = []
+        
+        def on_download(download):
             try:
-                # Try to extract common quiz data variable names
-                for var_name in ['quizData', 'quiz_data', 'data', 'questionData', 'question_data']:
-                    try:
-                        result = page.evaluate(f'window.{var_name}')
-                        if result:
-                            js_data[var_name] = result
-                            logger.info(f"Extracted JS variable: {var_name}")
-                    except Exception:
-                        pass
+                suggested = download.suggested_filename
+                dest = download_path / suggested
+                download.save_as(str(dest))
+                downloads.append(str(dest))
+                logger.info("Saved download %s", dest)
             except Exception as e:
-                logger.warning(f"Failed to extract JS variables: {e}")
+                logger.exception("Download failed: %s", e)
 
-            # find typical links and trigger downloads for direct links (but skip to avoid hanging)
-            logger.info("Skipping automatic downloads to prevent timeout")
-            
-            context.close()
-            browser.close()
+        page.on("download", on_download)
 
-            return {"html": html, "url": final_url, "downloads": downloads, "js_data": js_data}
+        # allow some network activity (with shorter timeout)
+        try:
+            if time.monotonic() >= loaded_by:
+                raise TimeoutError("page deadline reached")
+            page.wait_for_load_state("networkidle", timeout=min(_left_ms(loaded_by), 10000))
+        except Exception:
+            logger.warning("Network idle timeout - continuing anyway")
+            if recorder is not None:
+                recorder.notes["networkidle_timeout"] = True
 
-    except Exception as e:
-        logger.exception("Playwright navigation failed: %s", e)
-        raise
+        page.set_default_timeout(_left_ms(until))
+        html = page.content()
+        final_url = page.url
+
+        # Extract JavaScript global variables that might contain quiz data
+        js_data = {}
+        try:
+            # Try to extract common quiz data variable names
+            for var_name in ['quizData', 'quiz_data', 'data', 'questionData', 'question_data']:
+                if time.monotonic() >= until:
+                    logger.warning("Page deadline reached, skipping remaining JS variables")
+                    break
+                try:
+                    result = page.evaluate(f'window.{var_name}')
+                    if result:
+                        js_data[var_name] = result
+                        logger.info("Extracted JS variable: %s", var_name)
+                except Exception:
+                    pass
+        except Exception as e:
+            logger.warning("Failed to extract JS variables: %s", e)
+
+        # find typical links and trigger downloads for direct links (but skip to avoid hanging)
+        logger.info("Skipping automatic downloads to prevent timeout")
+
+        if recorder is not None:
+            capture_id = recorder.finish(url)
+            if capture_id:
+                tracing.current_span().set(har_capture=capture_id)
+
+        return {"html": html, "url": final_url, "downloads": downloads, "js_data": js_data}
+    finally:
+        context.close()
@@ -0,0 +1,138 @@
+"""Durable per-session checkpoints so an interrupted chain can resume."""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+from app.utils.config import settings
+from app.utils.db import connect
+from app.utils.logger import get_logger
+
+logger = get_logger("checkpoint")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    email TEXT NOT NULL,
+    start_url TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (email, start_url)
+);
+CREATE TABLE IF NOT EXISTS steps (
+    email TEXT NOT NULL,
+    start_url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    answer TEXT,
+    result TEXT,
+    next_url TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (email, start_url, depth)
+);
+"""
+
+
+class CheckpointStore:
+    """Completed chain steps keyed by the (email, start URL) session.
+    
+    A session is resumable while it is unfinished and was last updated
+    within the TTL; resuming starts at the `next_url` of its deepest
+    completed step.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = connect(path)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def begin(self, email: str, start_url: str, ttl: float | None = None) -> Tuple[str, int] | None:
+        """Open a session, resuming it if possible.
+        
+        Args:
+            email: User email
+            start_url: First URL of the chain
+            ttl: Seconds since the last update within which a session resumes
+            
+        Returns:
+            (url, depth) to resume from, or None when starting afresh (any
+            stale steps of the session are then dropped)
+        """
+        ttl = settings.CHECKPOINT_TTL_SECONDS if ttl is None else ttl
+        now = time.time()
+        key = (email, start_url)
+        with self._lock, self._conn:
+            session = self._conn.execute(
+                "SELECT updated_at, finished FROM sessions WHERE email = ? AND start_url = ?", key
+            ).fetchone()
+            if session and not session["finished"] and now - session["updated_at"] <= ttl:
+                last = self._conn.execute(
+                    "SELECT depth, next_url FROM steps WHERE email = ? AND start_url = ? "
+                    "ORDER BY depth DESC LIMIT 1", key
+                ).fetchone()
+                if last and last["next_url"]:
+                    self._conn.execute(
+                        "UPDATE sessions SET updated_at = ? WHERE email = ? AND start_url = ?", (now, *key)
+                    )
+                    return last["next_url"], last["depth"] + 1
+            self._conn.execute("DELETE FROM steps WHERE email = ? AND start_url = ?", key)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (email, start_url, started_at, updated_at, finished) "
+                "VALUES (?, ?, ?, ?, 0)", (*key, now, now)
+            )
+        return None
+
+    def record_step(self, email: str, start_url: str, depth: int, url: str, answer: Any,
+                    result: Dict[str, Any], next_url: str | None) -> None:
+        """Persist one correctly answered step of the session."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (email, start_url, depth, url, json.dumps(answer, default=str),
+                 json.dumps(result, default=str), next_url, now),
+            )
+            self._conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE email = ? AND start_url = ?", (now, email, start_url)
+            )
+
+    def finish(self, email: str, start_url: str) -> None:
+        """Mark the session complete so the next request starts afresh."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sessions SET finished = 1, updated_at = ? WHERE email = ? AND start_url = ?",
+                (time.time(), email, start_url),
+            )
+
+    def steps(self, email: str, start_url: str) -> List[Dict[str, Any]]:
+        """Return the completed steps of a session in chain order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT depth, url, answer, result, next_url, created_at FROM steps "
+                "WHERE email = ? AND start_url = ? ORDER BY depth", (email, start_url)
+            ).fetchall()
+        return [
+            {**dict(row), "answer": json.loads(row["answer"]), "result": json.loads(row["result"])}
+            for row in rows
+        ]
+
+
+_store: CheckpointStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore | None:
+    """Return the shared store, or None if checkpointing is off or unavailable."""
+    global _store
+    if not settings.CHECKPOINT_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = CheckpointStore(settings.CHECKPOINT_DB)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Checkpoint store unavailable at %s: %s", settings.CHECKPOINT_DB, e)
+                return None
+        return _store
@@ -29,7 +29,7 @@ def parse_html_for_quiz(html: str, js_data: Dict[str, Any] = None) -> Dict[str,
         js_data: Optional JavaScript data extracted from browser
         
     Returns:
-        Dict with keys: question, submit_url, links, embedded_json, tables
+        Dict with keys: question, submit_url, links, embedded_json, tables, page_text
     """
     js_data = js_data or {}
     soup = BeautifulSoup(html, "html.parser")
@@ -67,7 +67,7 @@ def parse_html_for_quiz(html: str, js_data: Dict[str, Any] = None) -> Dict[str,
         for var_name, data in js_data.items():
             if isinstance(data, dict):
                 embedded_json.append(data)
-                logger.info(f"Added JS variable {var_name} to embedded_json")
+                logger.info("Added JS variable %s to embedded_json", var_name)
                 
                 # Override question and submit_url if present in JS data
                 if 'question' in data and not question:
@@ -102,12 +102,18 @@ def parse_html_for_quiz(html: str, js_data: Dict[str, Any] = None) -> Dict[str,
     except Exception:
         pass
 
+    # visible page text (scripts and styles stripped) for retrieval
+    for el in soup(["script", "style"]):
+        el.decompose()
+    page_text = soup.get_text(separator="\n", strip=True)
+
     return {
         "question": question,
         "submit_url": submit_url,
         "links": links,
         "embedded_json": embedded_json,
-        "tables": tables
+        "tables": tables,
+        "page_text": page_text
     }
 
 
@@ -1,177 +1,552 @@
 """LLM integration for solving quiz questions using AIPipe or OpenAI API."""
 import json
-from typing import Any, Dict
-import requests
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Tuple
+from app.quiz.breaker import CircuitOpenError, get_breaker
+from app.quiz.prompt import Conversation
+from app.quiz.providers import (  # noqa: F401 - re-exported for callers
+    LLMProvider,
+    Messages,
+    build_messages,
+    call_aipipe_llm,
+    call_openai_llm,
+    get_providers,
+)
+from app.quiz.routing import Route, provider_router
+from app.quiz.structured import StructuredAnswerError, parse_structured, strip_fences
+from app.quiz.tiering import tier_tracker
 from app.utils.config import settings
+from app.utils.deadline import Deadline, DeadlineExceeded, call_timeout
 from app.utils.logger import get_logger
+from app.utils import metrics, tracing
 
 logger = get_logger("llm")
 
+# Shared pool for hedged provider calls
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm")
+# Separate pool for parallel candidates, whose calls may themselves hedge on _executor
+_candidate_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-candidates")
 
-def call_aipipe_llm(prompt: str, temperature: float = 0.1) -> str:
-    """Call AIPipe (institution) API with the given prompt.
+
+@dataclass
+class LLMResponse:
+    """Text of a completion plus the route that produced it.
     
-    Args:
-        prompt: User prompt
-        temperature: Sampling temperature
-        
-    Returns:
-        LLM response text
+    `choices` holds every sampled choice when several were requested.
     """
-    if not settings.SECRET:
-        raise ValueError("QUIZ_SECRET (token) not configured")
-    
-    logger.info("Calling AIPipe API model=%s", settings.AIPIPE_MODEL)
-    
+    text: str
+    provider: str
+    model: str
+    latency: float
+    choices: List[str] = field(default_factory=list)
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies per route."""
+
+    def __init__(self, window: int = 50):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float) -> None:
+        """Record one successful call latency for `provider` (a route key)."""
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, provider: str, pct: float) -> float | None:
+        """Return the `pct` percentile latency, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(provider, ()))
+        if len(samples) < 5:
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[idx]
+
+
+class HedgeBudget:
+    """Caps the fraction of recent calls that are allowed to fire a hedge."""
+
+    def __init__(self, window: int = 100):
+        self._calls: Deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        """Record a primary call that did not hedge."""
+        with self._lock:
+            self._calls.append(False)
+
+    def try_acquire(self, fraction: float) -> bool:
+        """Record a hedge and return True if it fits within `fraction` of recent calls."""
+        with self._lock:
+            hedged = sum(self._calls)
+            # allow one hedge of slack so a cold start can still hedge
+            if hedged >= fraction * len(self._calls) + 1:
+                self._calls.append(False)
+                return False
+            self._calls.append(True)
+            return True
+
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
+
+
+def _candidate_routes(tier: str | None = None) -> Dict[Route, LLMProvider]:
+    """Return every usable (provider, model) route mapped to its provider.
+
+    With a `tier`, each provider contributes only its model for that tier.
+    Unconfigured providers and providers whose circuit breaker is open are
+    skipped.
+    """
+    routes: Dict[Route, LLMProvider] = {}
+    for provider in get_providers():
+        if not get_breaker(provider.name).available():
+            logger.info("Skipping %s: circuit breaker open", provider.name)
+            continue
+        models = [provider.model_for_tier(tier)] if tier else provider.models()
+        for model in models:
+            routes[(provider.name, model)] = provider
+    return routes
+
+
+def _timed_call(provider: LLMProvider, model: str, messages: Messages, temperature: float,
+                n: int = 1, json_mode: bool = False, deadline: Deadline | None = None) -> LLMResponse:
+    """Run one completion through the provider's breaker and record the outcome.
+
+    The call timeout is REQUEST_TIMEOUT bounded by the remaining `deadline`.
+    A failure caused by the deadline running out raises DeadlineExceeded and
+    is not held against the provider.
+    """
+    route = (provider.name, model)
+    timeout = call_timeout(deadline, settings.REQUEST_TIMEOUT, "llm")
+    breaker = get_breaker(provider.name)
+    if not breaker.acquire():
+        raise CircuitOpenError(f"{provider.name} circuit breaker is open")
+    t0 = time.monotonic()
+    ok: bool | None = None  # stays None when the outcome says nothing about the provider
     try:
-        response = requests.post(
-            settings.AIPIPE_API_URL,
-            headers={
-                "Authorization": f"Bearer {settings.SECRET}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": settings.AIPIPE_MODEL,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a helpful data analysis assistant. You analyze data, perform calculations, and provide answers in the exact format requested."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": temperature
-            },
-            timeout=settings.REQUEST_TIMEOUT
-        )
-        
-        response.raise_for_status()
-        result = response.json()
-        
-        # Extract answer from response
-        answer = result.get("choices", [{}])[0].get("message", {}).get("content", "")
-        
-        if not answer:
-            logger.error("No content in AIPipe response: %s", result)
-            raise ValueError("Empty response from AIPipe")
-        
-        logger.info("AIPipe response received: %s", answer[:200])
-        return answer
-        
-    except requests.exceptions.RequestException as e:
-        logger.exception("AIPipe API call failed: %s", e)
+        with tracing.span("llm_provider_call", provider=provider.name, model=model, n=n,
+                          prompt_chars=sum(len(m["content"]) for m in messages)) as span:
+            if n > 1:
+                choices = provider.complete_n(messages, model, temperature, n, json_mode, timeout)
+            else:
+                choices = [provider.complete(messages, model, temperature, json_mode, timeout)]
+            text = choices[0]
+            span.set(reply_chars=len(text))
+        ok = True
+    except Exception as e:
+        if deadline is not None and deadline.expired(deadline.reserve):
+            raise DeadlineExceeded("llm", deadline.remaining()) from e
+        ok = False
+        metrics.provider_errors_total.inc(provider=provider.name)
         raise
+    finally:
+        # every exit settles the breaker permission, so a half-open probe is never leaked
+        latency = time.monotonic() - t0
+        if ok is None:
+            breaker.release()
+        else:
+            breaker.record(ok, latency)
+            provider_router.record_call(route, latency, ok=ok)
+    metrics.llm_call_seconds.observe(latency, provider=provider.name, model=model)
+    latency_tracker.record(f"{provider.name}/{model}", latency)
+    return LLMResponse(text=text, provider=provider.name, model=model, latency=latency, choices=choices)
+
+
+def _hedge_delay(route: Route) -> float:
+    """Seconds to wait on `route` before firing a hedged request."""
+    observed = latency_tracker.percentile("/".join(route), settings.LLM_HEDGE_PERCENTILE)
+    if observed is None:
+        return settings.LLM_HEDGE_DEFAULT_DELAY
+    return observed
+
+
+def _call_hedged(primary: Route, secondary: Route, routes: Dict[Route, LLMProvider],
+                 messages: Messages, temperature: float, json_mode: bool = False,
+                 deadline: Deadline | None = None) -> LLMResponse:
+    """Call `primary`, firing `secondary` in parallel if the primary is slow.
+
+    The first successful answer wins. The losing call cannot be interrupted
+    once its HTTP request is in flight, so its result is simply discarded.
+    """
+    options = {"json_mode": json_mode, "deadline": deadline}
+
+    def primary_or_fallback():
+        try:
+            return p_future.result()
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning("%s failed, falling back to %s: %s", primary[0], secondary[0], e)
+            metrics.fallbacks_total.inc(kind="provider_failover")
+            return _timed_call(routes[secondary], secondary[1], messages, temperature, **options)
+
+    p_future = _executor.submit(tracing.bind(_timed_call), routes[primary], primary[1], messages, temperature, **options)
+    done, _ = wait([p_future], timeout=_hedge_delay(primary))
+
+    if done:
+        hedge_budget.record_call()
+        return primary_or_fallback()
+
+    if not hedge_budget.try_acquire(settings.LLM_HEDGE_BUDGET):
+        logger.info("%s is slow but hedge budget exhausted, waiting", primary[0])
+        return primary_or_fallback()
 
+    logger.info("%s slow, firing hedged request to %s", primary[0], secondary[0])
+    s_future = _executor.submit(tracing.bind(_timed_call), routes[secondary], secondary[1], messages, temperature, **options)
+    names = {p_future: primary[0], s_future: secondary[0]}
+    pending = {p_future, s_future}
+    last_error: Exception | None = None
 
-def call_openai_llm(prompt: str, temperature: float = 0.1) -> str:
-    """Call OpenAI API with the given prompt.
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            try:
+                response = fut.result()
+            except Exception as e:
+                logger.warning("Hedged call to %s failed: %s", names[fut], e)
+                last_error = e
+                continue
+            for other in pending:
+                other.cancel()
+            logger.info("Hedged request won by %s", names[fut])
+            return response
+
+    raise last_error or RuntimeError("All hedged LLM calls failed")
+
+
+def complete(messages: Messages, temperature: float = 0.1, tier: str | None = None,
+             json_mode: bool = False, deadline: Deadline | None = None) -> LLMResponse:
+    """Route a chat completion to the best available provider and model.
+    
+    Routes are ranked by the adaptive router. When the runner-up is on a
+    different provider and hedging is enabled, it is fired in parallel once
+    the best route exceeds its recent latency percentile.
     
     Args:
-        prompt: User prompt
+        messages: Chat messages to send
         temperature: Sampling temperature
+        tier: Restrict routing to this model tier ("fast" or "strong")
+        json_mode: Ask providers for a JSON object response
+        deadline: Solve deadline bounding every provider call
         
     Returns:
-        LLM response text
+        LLMResponse with the text and the route that produced it
+        
+    Raises:
+        DeadlineExceeded: If the solve budget runs out
+        RuntimeError: If no provider is available or all of them fail
     """
-    if not settings.OPENAI_API_KEY or not settings.OPENAI_API_KEY.startswith("sk-"):
-        raise ValueError("Valid OpenAI API key not configured")
+    routes = _candidate_routes(tier)
+    ranked = provider_router.rank(list(routes))
     
-    try:
-        import openai
-        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        
-        logger.info("Calling OpenAI model=%s", settings.OPENAI_MODEL)
-        
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful data analysis assistant. You analyze data, perform calculations, and provide answers in the exact format requested."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=temperature
-        )
-        
-        answer = response.choices[0].message.content
-        logger.info("OpenAI response received: %s", answer[:200])
-        return answer
-    except Exception as e:
-        logger.exception("OpenAI API call failed: %s", e)
-        raise
+    if settings.LLM_HEDGE_ENABLED and ranked:
+        secondary = next((r for r in ranked[1:] if r[0] != ranked[0][0]), None)
+        if secondary:
+            try:
+                return _call_hedged(ranked[0], secondary, routes, messages, temperature, json_mode, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logger.warning("Hedged call failed: %s", e)
+                tried = (ranked[0], secondary)
+                ranked = [r for r in ranked if r not in tried]
+    
+    last_error: Exception | None = None
+    for route in ranked:
+        try:
+            return _timed_call(routes[route], route[1], messages, temperature,
+                               json_mode=json_mode, deadline=deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning("%s/%s failed: %s", route[0], route[1], e)
+            metrics.fallbacks_total.inc(kind="provider_failover")
+            last_error = e
+    raise last_error or RuntimeError("No LLM provider available")
 
 
-def call_llm(prompt: str, temperature: float = 0.1) -> str:
+def call_llm(prompt: str, temperature: float = 0.1, deadline: Deadline | None = None) -> str:
     """Call LLM API (AIPipe or OpenAI) with the given prompt.
     
     Args:
         prompt: User prompt
         temperature: Sampling temperature
+        deadline: Solve deadline bounding the call
         
     Returns:
         LLM response text
+        
+    Raises:
+        DeadlineExceeded: If the solve budget runs out
     """
-    # Use AIPipe by default (institution API)
-    if settings.USE_AIPIPE:
+    with tracing.span("call_llm", prompt_chars=len(prompt)) as span:
         try:
-            return call_aipipe_llm(prompt, temperature)
+            response = complete(build_messages(prompt), temperature, deadline=deadline)
+            span.set(provider=response.provider, model=response.model, reply_chars=len(response.text))
+            return response.text
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            logger.warning("AIPipe failed, falling back to OpenAI: %s", e)
-            # Fall through to OpenAI
+            logger.error("All LLM APIs failed: %s", e)
+            # Return a mock response for testing
+            logger.warning("Using mock response")
+            metrics.fallbacks_total.inc(kind="mock_42")
+            span.set(fallback="mock_42")
+            return "42"
+
+
+def record_answer_outcome(meta: Dict[str, Any], correct: bool) -> None:
+    """Feed a submission result back to the router for the route in `meta`.
     
-    # Try OpenAI as fallback
-    try:
-        return call_openai_llm(prompt, temperature)
-    except Exception as e:
-        logger.error("All LLM APIs failed: %s", e)
-        # Return a mock response for testing
-        logger.warning("Using mock response")
-        return "42"
+    Args:
+        meta: Dict filled in by `solve_with_llm` (empty if the LLM was not used)
+        correct: Whether the submitted answer was accepted
+    """
+    if meta.get("provider") and meta.get("model"):
+        provider_router.record_correctness((meta["provider"], meta["model"]), correct)
 
 
-def solve_with_llm(question: str, context: Dict[str, Any]) -> Any:
-    """Use LLM to solve a quiz question given extracted context.
+def estimate_confidence(raw: str, answer: Any) -> float:
+    """Cheap confidence estimate for a parsed answer.
+    
+    Typed or short answers are trusted; long free-text replies usually mean
+    the model explained instead of answering.
+    """
+    if not isinstance(answer, str):
+        return 1.0
+    if not answer.strip():
+        return 0.0
+    return 0.9 if len(raw.strip()) <= 80 else 0.4
+
+
+def parse_reply(text: str, question: str, structured: bool) -> Tuple[Any, float]:
+    """Parse a model reply into (answer, confidence).
+    
+    Structured replies are validated and coerced to the type the question
+    implies; a reply that still fails validation falls back to the loosely
+    parsed `answer` of its envelope (or the whole reply if it had none) with
+    low confidence so that tiering can escalate it.
+    """
+    if structured:
+        try:
+            parsed = parse_structured(text, question)
+            return parsed.answer, parsed.confidence
+        except StructuredAnswerError as e:
+            logger.warning("Structured reply failed validation: %s", e)
+            value = strip_fences(text) if e.value is None else e.value
+            return (parse_llm_response(value) if isinstance(value, str) else value), 0.2
+    answer = parse_llm_response(text)
+    return answer, estimate_confidence(text, answer)
+
+
+def ask(conversation: Conversation, meta: Dict[str, Any] | None = None,
+        tier: str | None = None, deadline: Deadline | None = None) -> Any:
+    """Send the conversation's messages and parse the reply.
+    
+    The reply is appended to the conversation so that a retry only needs to
+    add the submission feedback.
     
     Args:
-        question: The quiz question text
-        context: Extracted data including tables, PDFs, CSV data, etc.
+        conversation: Conversation holding the data prompt and earlier turns
+        meta: Optional dict that receives the provider, model, tier, latency
+            and confidence of the answer
+        tier: Model tier to use ("fast" or "strong"); any model if None
+        deadline: Solve deadline bounding the call
         
     Returns:
         Parsed answer (could be string, number, bool, dict, list)
+        
+    Raises:
+        DeadlineExceeded: If the solve budget runs out
     """
-    # build comprehensive prompt
-    prompt_parts = [f"Question: {question}\n"]
-    
-    if context.get("tables"):
-        prompt_parts.append("Available tables:")
-        for i, table in enumerate(context["tables"]):
-            prompt_parts.append(f"\nTable {i+1}:")
-            prompt_parts.append(json.dumps(table[:10], indent=2))  # first 10 rows
+    with tracing.span("llm_ask", tier=tier, prompt_tokens=conversation.prompt.tokens,
+                      turn=conversation.turns) as span:
+        try:
+            response = complete(conversation.messages, tier=tier, json_mode=conversation.structured,
+                                deadline=deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error("All LLM APIs failed: %s", e)
+            logger.warning("Using mock response")
+            metrics.fallbacks_total.inc(kind="mock_42")
+            span.set(fallback="mock_42")
+            if meta is not None:
+                meta.update(tier=tier, confidence=0.0)
+            return parse_llm_response("42")
+        
+        conversation.add_reply(response.text)
+        
+        # attempt to parse response
+        answer, confidence = parse_reply(response.text, conversation.question, conversation.structured)
+        
+        if tier:
+            tier_tracker.record_call(tier, response.latency)
+        span.set(provider=response.provider, model=response.model, latency=round(response.latency, 3),
+                 confidence=confidence, reply_chars=len(response.text))
+        if meta is not None:
+            meta.update(
+                provider=response.provider,
+                model=response.model,
+                tier=tier,
+                latency=response.latency,
+                confidence=confidence,
+                prompt_tokens=conversation.prompt.tokens,
+                truncated_sections=conversation.prompt.truncated,
+                turn=conversation.turns,
+            )
+        
+        return answer
+
+
+def candidate_temperatures(n: int) -> List[float]:
+    """Spread `n` sampling temperatures from 0.1 up to 1.0 for diverse candidates."""
+    if n <= 1:
+        return [0.1]
+    return [round(0.1 + 0.9 * i / (n - 1), 2) for i in range(n)]
+
+
+def _sample_candidates(messages: Messages, n: int, tier: str | None, json_mode: bool = False,
+                       deadline: Deadline | None = None) -> Tuple[List[LLMResponse], List[float]]:
+    """Sample `n` replies: one native `n` request if the best route supports it,
+    otherwise `n` parallel calls at spread temperatures.
     
-    if context.get("csv_data"):
-        prompt_parts.append("\nCSV data:")
-        for fname, df in context["csv_data"].items():
-            prompt_parts.append(f"\n{fname}:")
-            prompt_parts.append(df.head(20).to_string())
+    Returns the replies and the latency of each provider request made, which
+    is one for all replies on the native `n` path.
+    """
+    routes = _candidate_routes(tier)
+    ranked = provider_router.rank(list(routes))
+    if ranked and routes[ranked[0]].supports_n:
+        try:
+            response = _timed_call(routes[ranked[0]], ranked[0][1], messages,
+                                   settings.RETRY_CANDIDATE_TEMPERATURE, n=n,
+                                   json_mode=json_mode, deadline=deadline)
+            return [LLMResponse(text=c, provider=response.provider, model=response.model,
+                                latency=response.latency) for c in response.choices], [response.latency]
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.warning("Batched candidate request failed, sampling in parallel: %s", e)
+
+    futures = [_candidate_executor.submit(tracing.bind(complete), messages, t, tier, json_mode, deadline)
+               for t in candidate_temperatures(n)]
+    responses = []
+    deadline_error: DeadlineExceeded | None = None
+    for fut in futures:
+        try:
+            responses.append(fut.result())
+        except DeadlineExceeded as e:
+            deadline_error = e
+        except Exception as e:
+            logger.warning("Candidate call failed: %s", e)
+    if not responses and deadline_error:
+        raise deadline_error
+    return responses, [r.latency for r in responses]
+
+
+def _answer_key(answer: Any) -> str:
+    """Canonical form used to compare candidate answers."""
+    if isinstance(answer, str):
+        return answer.strip().lower()
+    if isinstance(answer, float) and answer.is_integer():
+        answer = int(answer)
+    return json.dumps(answer, sort_keys=True, default=str)
+
+
+def rank_candidates(answers: List[Any], exclude: List[Any] | None = None) -> List[Tuple[Any, int]]:
+    """De-duplicate answers and rank them by agreement (self-consistency).
     
-    if context.get("pdf_text"):
-        prompt_parts.append("\nPDF content (excerpt):")
-        prompt_parts.append(context["pdf_text"][:2000])
+    Args:
+        answers: Parsed candidate answers
+        exclude: Answers already known to be wrong
+        
+    Returns:
+        (answer, votes) pairs, most votes first, ties in sampling order
+    """
+    excluded = {_answer_key(a) for a in (exclude or [])}
+    votes: Dict[str, int] = {}
+    first: Dict[str, Any] = {}
+    for answer in answers:
+        key = _answer_key(answer)
+        if key in excluded:
+            continue
+        votes[key] = votes.get(key, 0) + 1
+        first.setdefault(key, answer)
+    order = sorted(votes, key=lambda k: -votes[k])
+    return [(first[k], votes[k]) for k in order]
+
+
+def ask_candidates(conversation: Conversation, n: int, tier: str | None = None,
+                   exclude: List[Any] | None = None,
+                   deadline: Deadline | None = None) -> List[Tuple[Any, Dict[str, Any]]]:
+    """Sample `n` diverse answers to the conversation's latest turn at once.
     
-    if context.get("embedded_json"):
-        prompt_parts.append("\nEmbedded JSON data:")
-        prompt_parts.append(json.dumps(context["embedded_json"], indent=2))
+    The replies are not appended to the conversation; the caller submits
+    them in rank order without further LLM calls.
     
-    prompt_parts.append("\n\nAnalyze the data and answer the question. If the answer is a number, return just the number. If it's a boolean, return true or false. If it's JSON, return valid JSON. Be precise and concise.")
+    Args:
+        conversation: Conversation holding the data prompt and feedback turns
+        n: Number of candidates to sample
+        tier: Model tier to use ("fast" or "strong"); any model if None
+        exclude: Answers already known to be wrong
+        deadline: Solve deadline bounding the calls
+        
+    Returns:
+        (answer, meta) pairs ranked by agreement; meta includes "votes"
+    """
+    responses, request_latencies = _sample_candidates(conversation.messages, n, tier, conversation.structured,
+                                                      deadline)
+    parsed = [parse_reply(r.text, conversation.question, conversation.structured)[0] for r in responses]
+    ranked = rank_candidates(parsed, exclude=exclude)
     
-    full_prompt = "\n".join(prompt_parts)
+    if tier:
+        # one call per provider request, however many candidates it returned
+        for latency in request_latencies:
+            tier_tracker.record_call(tier, latency)
+    source: Dict[str, LLMResponse] = {}
+    for answer, response in zip(parsed, responses):
+        source.setdefault(_answer_key(answer), response)
     
-    llm_response = call_llm(full_prompt)
+    results = []
+    for answer, votes in ranked:
+        response = source[_answer_key(answer)]
+        results.append((answer, {
+            "provider": response.provider,
+            "model": response.model,
+            "tier": tier,
+            "latency": response.latency,
+            "confidence": votes / len(parsed),
+            "votes": votes,
+            "turn": conversation.turns,
+        }))
+    logger.info("Sampled %d candidates, %d distinct after de-duplication: %s",
+                len(parsed), len(results), ranked)
+    return results
+
+
+def solve_with_llm(question: str, context: Dict[str, Any], meta: Dict[str, Any] | None = None,
+                   tier: str | None = None) -> Any:
+    """Use LLM to solve a quiz question given extracted context.
     
-    # attempt to parse response
-    answer = parse_llm_response(llm_response)
+    Single-shot wrapper around `Conversation` + `ask`.
     
-    return answer
+    Args:
+        question: The quiz question text
+        context: Extracted data including tables, PDFs, CSV data, etc.
+        meta: Optional dict that receives the provider, model, tier, latency
+            and confidence of the answer
+        tier: Model tier to use ("fast" or "strong"); any model if None
+        
+    Returns:
+        Parsed answer (could be string, number, bool, dict, list)
+    """
+    return ask(Conversation(question, context), meta=meta, tier=tier)
 
 
 def parse_llm_response(response: str) -> Any:
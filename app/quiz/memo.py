@@ -0,0 +1,167 @@
+"""Persistent memo of answers confirmed correct by the quiz server."""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable
+import pandas as pd
+from app.quiz.tiering import question_fingerprint
+from app.utils.config import settings
+from app.utils.db import connect
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+logger = get_logger("memo")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    url TEXT NOT NULL,
+    question_fp TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (url, question_fp, data_hash)
+);
+"""
+
+
+# Context keys only filled under "full" extraction; their data is hashed from
+# the raw files instead, so a step the scheduler downgraded still matches
+_PLAN_DEPENDENT_KEYS = ("page_text", "pdf_text")
+
+
+def data_fingerprint(context: Dict[str, Any], files: Iterable[str] = ()) -> str:
+    """Return a stable hash of the data a question is asked about.
+
+    Downloaded `files` hash by name and raw bytes, whether or not the plan
+    parsed them, so a changed PDF changes the fingerprint even when its text
+    was not extracted. Of the context, DataFrames hash by their CSV form and
+    everything else by sorted JSON; the extracted page and PDF text are left
+    out since only full extraction fills them.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(files, key=lambda f: Path(f).name):
+        digest.update(Path(path).name.encode("utf-8"))
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(chunk)
+        except OSError as e:
+            logger.warning("Could not hash %s for the answer memo: %s", path, e)
+    for key in sorted(k for k in context if k not in _PLAN_DEPENDENT_KEYS):
+        value = context[key]
+        digest.update(key.encode("utf-8"))
+        if isinstance(value, dict):
+            for name in sorted(value):
+                item = value[name]
+                digest.update(str(name).encode("utf-8"))
+                if isinstance(item, pd.DataFrame):
+                    digest.update(item.to_csv(index=False).encode("utf-8"))
+                else:
+                    digest.update(json.dumps(item, sort_keys=True, default=str).encode("utf-8"))
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnswerMemo:
+    """Verified answers keyed by quiz URL, question fingerprint and data hash.
+
+    An answer is only stored after the server accepted it. A lookup whose
+    question is known under a different data hash drops the stale entries,
+    so changed data always goes back to the LLM.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = connect(path)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stores = 0
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def lookup(self, url: str, question: str, data_hash: str) -> Any | None:
+        """Return the verified answer for this question and data, or None."""
+        key = (url, question_fingerprint(question))
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT answer FROM answers WHERE url = ? AND question_fp = ? AND data_hash = ?",
+                (*key, data_hash),
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE answers SET hits = hits + 1 WHERE url = ? AND question_fp = ? AND data_hash = ?",
+                    (*key, data_hash),
+                )
+                self.hits += 1
+                metrics.cache_requests_total.inc(cache="answer_memo", result="hit")
+                return json.loads(row["answer"])
+            stale = self._conn.execute(
+                "DELETE FROM answers WHERE url = ? AND question_fp = ?", key
+            ).rowcount
+            self.invalidations += stale
+            self.misses += 1
+        metrics.cache_requests_total.inc(cache="answer_memo", result="miss")
+        return None
+
+    def store(self, url: str, question: str, data_hash: str, answer: Any) -> None:
+        """Remember an answer the server accepted."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (url, question_fp, data_hash, answer, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, question_fingerprint(question), data_hash, json.dumps(answer, default=str), time.time()),
+            )
+            self.stores += 1
+
+    def invalidate(self, url: str, question: str) -> None:
+        """Forget every answer for a question, e.g. after the server rejected one."""
+        with self._lock, self._conn:
+            self.invalidations += self._conn.execute(
+                "DELETE FROM answers WHERE url = ? AND question_fp = ?", (url, question_fingerprint(question))
+            ).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return lookup counters, hit rate and the number of stored answers."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+                "stores": self.stores,
+            }
+
+
+_memo: AnswerMemo | None = None
+_memo_lock = threading.Lock()
+
+
+def get_answer_memo() -> AnswerMemo | None:
+    """Return the shared memo, or None if memoization is off or unavailable."""
+    global _memo
+    if not settings.ANSWER_MEMO_ENABLED:
+        return None
+    with _memo_lock:
+        if _memo is None:
+            try:
+                _memo = AnswerMemo(settings.ANSWER_MEMO_DB)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Answer memo unavailable at %s: %s", settings.ANSWER_MEMO_DB, e)
+                return None
+        return _memo
+
+
+def memo_stats() -> Dict[str, Any] | None:
+    """Stats of the shared memo, or None if it has not been opened yet."""
+    memo = _memo
+    return memo.stats() if memo is not None else None
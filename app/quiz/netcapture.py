@@ -0,0 +1,214 @@
+"""HAR-like network captures of slow or sampled browser fetches."""
+import json
+import os
+import random
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlparse
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("netcapture")
+
+_CAPTURE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Builds and writes captures after the fetch has returned its page
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="har")
+
+
+class NetworkRecorder:
+    """Collects a page's finished and failed requests while it renders.
+
+    Only data Playwright already delivered with its events is kept: request
+    timings and the status and headers of each response. Nothing is read
+    back from the browser, so finishing a capture adds no round trips to
+    the fetch, and the HAR is built and written on a background thread.
+    """
+
+    def __init__(self, page):
+        self.started = time.time()
+        self.requests: List[Tuple[Any, str | None]] = []
+        self.responses: Dict[Any, Any] = {}
+        self.notes: Dict[str, Any] = {}
+        page.on("response", self._on_response)
+        page.on("requestfinished", lambda request: self.requests.append((request, None)))
+        page.on("requestfailed", lambda request: self.requests.append((request, request.failure)))
+
+    def _on_response(self, response) -> None:
+        self.responses[response.request] = response
+
+    def finish(self, url: str) -> str | None:
+        """Queue a capture if the fetch was slow or sampled; return its id."""
+        elapsed = time.time() - self.started
+        if elapsed < settings.HAR_SLOW_SECONDS and random.random() >= settings.HAR_SAMPLE_RATE:
+            return None
+        try:
+            observed = [_observed(request, failure, self.responses.get(request)) for request, failure in self.requests]
+        except Exception as e:
+            logger.warning("Could not record network capture for %s: %s", url, e)
+            return None
+        capture_id = uuid.uuid4().hex
+        _writer.submit(_write_capture, capture_id, url, self.started, elapsed, observed, dict(self.notes))
+        return capture_id
+
+
+def flush_captures() -> None:
+    """Wait until every queued capture is written (e.g. in tests)."""
+    _writer.submit(lambda: None).result()
+
+
+def _observed(request, failure: str | None, response) -> Dict[str, Any]:
+    """Plain copy of what the browser reported for one request."""
+    return {
+        "method": request.method,
+        "url": request.url,
+        "resource_type": request.resource_type,
+        "timing": dict(request.timing),
+        "failure": failure,
+        "status": response.status if response is not None else 0,
+        "status_text": response.status_text if response is not None else (failure or ""),
+        "headers": {k.lower(): v for k, v in response.headers.items()} if response is not None else {},
+    }
+
+
+def _write_capture(capture_id: str, url: str, started: float, elapsed: float,
+                   observed: List[Dict[str, Any]], notes: Dict[str, Any]) -> None:
+    try:
+        entries = [_entry(request) for request in observed]
+        save_capture(url, started, elapsed, entries, notes, capture_id=capture_id)
+    except Exception as e:
+        logger.warning("Could not save network capture for %s: %s", url, e)
+        return
+    slowest = sorted(entries, key=lambda e: e["time"], reverse=True)[:3]
+    logger.warning("Fetch of %s took %.1fs; saved network capture %s (slowest: %s)", url, elapsed, capture_id,
+                   ", ".join(f"{e['request']['url'][:80]} {e['time']:.0f}ms" for e in slowest))
+
+
+def _span(start: float, end: float) -> float:
+    """Duration between two Playwright timing marks in ms; -1 if either is missing."""
+    return round(end - start, 3) if start >= 0 and end >= 0 else -1
+
+
+def _entry(request: Dict[str, Any]) -> Dict[str, Any]:
+    """HAR 1.2 entry for one request observed by `_observed`.
+
+    Sizes come from Content-Length, so they are -1 for chunked responses.
+    """
+    timing = request["timing"]
+    headers = request["headers"]
+    try:
+        body_size = int(headers.get("content-length", -1))
+    except ValueError:
+        body_size = -1
+    timings = {
+        "blocked": -1,
+        "dns": _span(timing["domainLookupStart"], timing["domainLookupEnd"]),
+        "connect": _span(timing["connectStart"], timing["connectEnd"]),
+        "ssl": _span(timing["secureConnectionStart"], timing["connectEnd"]),
+        "send": 0,
+        "wait": _span(timing["requestStart"], timing["responseStart"]),
+        "receive": _span(timing["responseStart"], timing["responseEnd"]),
+    }
+    return {
+        "startedDateTime": datetime.fromtimestamp(timing["startTime"] / 1000, timezone.utc).isoformat(),
+        # HAR's connect already includes ssl
+        "time": round(sum(v for k, v in timings.items() if v > 0 and k != "ssl"), 3),
+        "request": {
+            "method": request["method"], "url": request["url"], "httpVersion": "", "headers": [],
+            "queryString": [], "cookies": [], "headersSize": -1, "bodySize": -1,
+        },
+        "response": {
+            "status": request["status"],
+            "statusText": request["status_text"],
+            "httpVersion": "", "headers": [], "cookies": [], "redirectURL": "",
+            "headersSize": -1, "bodySize": body_size,
+            "content": {"size": body_size, "mimeType": headers.get("content-type", "")},
+        },
+        "cache": {},
+        "timings": timings,
+        "_resourceType": request["resource_type"],
+        "_failure": request["failure"],
+    }
+
+
+def save_capture(url: str, started: float, elapsed: float, entries: List[Dict[str, Any]],
+                 notes: Dict[str, Any] | None = None, capture_id: str | None = None) -> str:
+    """Write a capture to HAR_DIR, pruning the oldest beyond HAR_MAX_CAPTURES; return its id."""
+    capture_id = capture_id or uuid.uuid4().hex
+    har = {
+        "log": {
+            "version": "1.2",
+            "creator": {"name": "quiz-solver", "version": "1.0"},
+            "pages": [{
+                "startedDateTime": datetime.fromtimestamp(started, timezone.utc).isoformat(),
+                "id": capture_id,
+                "title": url,
+                "pageTimings": {"onLoad": round(elapsed * 1000, 1)},
+                "_notes": notes or {},
+            }],
+            "entries": [dict(e, pageref=capture_id) for e in entries],
+        }
+    }
+    os.makedirs(settings.HAR_DIR, exist_ok=True)
+    with open(os.path.join(settings.HAR_DIR, capture_id + ".har"), "w", encoding="utf-8") as f:
+        json.dump(har, f)
+    for stale in _capture_files()[settings.HAR_MAX_CAPTURES:]:
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            pass
+    return capture_id
+
+
+def _capture_files() -> List[str]:
+    """Capture files, newest first; files pruned while listing are skipped."""
+    if not os.path.isdir(settings.HAR_DIR):
+        return []
+    stamped = []
+    for name in os.listdir(settings.HAR_DIR):
+        if name.endswith(".har"):
+            path = os.path.join(settings.HAR_DIR, name)
+            try:
+                stamped.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+    return [path for _, path in sorted(stamped, reverse=True)]
+
+
+def list_captures(limit: int = 20) -> List[Dict[str, Any]]:
+    """Summaries of the newest captures: id, page URL, load time, resource count and host."""
+    captures = []
+    for path in _capture_files():
+        if len(captures) >= limit:
+            break
+        try:
+            with open(path, encoding="utf-8") as f:
+                log = json.load(f)["log"]
+        except FileNotFoundError:
+            # pruned by a concurrent save
+            continue
+        page = log["pages"][0]
+        captures.append({
+            "id": page["id"],
+            "url": page["title"],
+            "host": urlparse(page["title"]).netloc,
+            "started": page["startedDateTime"],
+            "load_ms": page["pageTimings"]["onLoad"],
+            "resources": len(log["entries"]),
+        })
+    return captures
+
+
+def load_capture(capture_id: str) -> Dict[str, Any] | None:
+    """Return a saved capture in HAR form, or None if unknown."""
+    if not _CAPTURE_ID_RE.match(capture_id):
+        return None
+    try:
+        with open(os.path.join(settings.HAR_DIR, capture_id + ".har"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
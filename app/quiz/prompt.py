@@ -0,0 +1,346 @@
+"""Token-budgeted prompt assembly with compact data encodings."""
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List
+import pandas as pd
+from app.quiz.providers import SYSTEM_PROMPT
+from app.quiz.retrieval import retrieve
+from app.quiz.structured import STRUCTURED_INSTRUCTIONS
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+# Optional import: exact token counts for OpenAI-family models
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+logger = get_logger("prompt")
+
+INSTRUCTIONS = "Analyze the data and answer the question. If the answer is a number, return just the number. If it's a boolean, return true or false. If it's JSON, return valid JSON. Be precise and concise."
+
+TRUNCATION_MARK = "\n...[truncated]"
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """Return the tiktoken encoding for `model`, or None if unavailable."""
+    if not HAS_TIKTOKEN:
+        return None
+    name = model.split("/")[-1]
+    try:
+        return tiktoken.encoding_for_model(name)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception:
+            return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """Count tokens of `text` with the target model's tokenizer.
+    
+    Falls back to a ~4 characters per token estimate without tiktoken.
+    
+    Args:
+        text: Text to measure
+        model: Model name (provider prefixes like "openai/" are ignored)
+        
+    Returns:
+        Token count
+    """
+    enc = _encoding(model or settings.AIPIPE_MODEL)
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def table_to_csv(rows: Any, max_rows: int | None = None) -> str:
+    """Encode a DataFrame or list of records as CSV with a header line."""
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+    max_rows = max_rows or settings.PROMPT_MAX_ROWS
+    return df.head(max_rows).to_csv(index=False).rstrip("\n")
+
+
+def minify_json(obj: Any) -> str:
+    """Serialize `obj` as JSON without whitespace."""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+@dataclass
+class PromptSection:
+    """One block of the prompt.
+    
+    Sections are filled in ascending `priority` order until the budget runs
+    out. `kind` selects the truncation rule: "rows" drops trailing lines but
+    keeps the first (header) line, "text" cuts at a token boundary, "fixed"
+    is never truncated.
+    """
+    name: str
+    title: str
+    body: str
+    priority: int = 1
+    kind: str = "text"
+    max_tokens: int | None = None
+
+
+@dataclass
+class BuiltPrompt:
+    """Final prompt text plus token accounting."""
+    text: str
+    tokens: int
+    budget: int
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    truncated: List[str] = field(default_factory=list)
+
+
+def _truncate_rows(body: str, budget: int, model: str) -> str:
+    """Keep the header line and as many following lines as fit in `budget`."""
+    lines = body.split("\n")
+    kept = [lines[0]]
+    used = count_tokens(lines[0], model)
+    for line in lines[1:]:
+        cost = count_tokens(line, model) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    dropped = len(lines) - len(kept)
+    return "\n".join(kept) + (f"\n... ({dropped} more rows)" if dropped else "")
+
+
+def _truncate_text(body: str, budget: int, model: str) -> str:
+    """Cut `body` so that it fits in `budget` tokens."""
+    tokens = count_tokens(body, model)
+    if tokens <= budget:
+        return body
+    cut = int(len(body) * budget / tokens)
+    while cut > 0 and count_tokens(body[:cut], model) > budget:
+        cut = int(cut * 0.9)
+    return body[:cut] + TRUNCATION_MARK
+
+
+def assemble(sections: List[PromptSection], budget: int | None = None,
+             model: str | None = None) -> BuiltPrompt:
+    """Fit `sections` into a token budget and join them into one prompt.
+    
+    Fixed sections are always included. The remaining budget goes to the
+    other sections in priority order, each capped by its `max_tokens`.
+    Sections that get no room at all are dropped.
+    
+    Args:
+        sections: Prompt sections in display order
+        budget: Total token budget (defaults to PROMPT_TOKEN_BUDGET)
+        model: Model whose tokenizer is used for counting
+        
+    Returns:
+        BuiltPrompt with the text and per-section token counts
+    """
+    budget = budget or settings.PROMPT_TOKEN_BUDGET
+    model = model or settings.AIPIPE_MODEL
+
+    rendered: Dict[str, str] = {}
+    section_tokens: Dict[str, int] = {}
+    truncated: List[str] = []
+    remaining = budget
+
+    for sec in sections:
+        if sec.kind == "fixed":
+            text = f"{sec.title}\n{sec.body}" if sec.title else sec.body
+            rendered[sec.name] = text
+            section_tokens[sec.name] = count_tokens(text, model)
+            remaining -= section_tokens[sec.name]
+
+    for sec in sorted((s for s in sections if s.kind != "fixed"), key=lambda s: s.priority):
+        header_cost = count_tokens(sec.title, model) + 2
+        allowance = remaining - header_cost
+        if sec.max_tokens is not None:
+            allowance = min(allowance, sec.max_tokens)
+        if allowance <= 0:
+            truncated.append(sec.name)
+            continue
+        body = sec.body
+        if count_tokens(body, model) > allowance:
+            truncate = _truncate_rows if sec.kind == "rows" else _truncate_text
+            body = truncate(body, allowance, model)
+            truncated.append(sec.name)
+        text = f"{sec.title}\n{body}"
+        rendered[sec.name] = text
+        section_tokens[sec.name] = count_tokens(text, model)
+        remaining -= section_tokens[sec.name]
+
+    full = "\n\n".join(rendered[s.name] for s in sections if s.name in rendered)
+    built = BuiltPrompt(
+        text=full,
+        tokens=count_tokens(full, model),
+        budget=budget,
+        section_tokens=section_tokens,
+        truncated=truncated,
+    )
+    logger.info("Prompt built: %d/%d tokens sections=%s truncated=%s",
+                built.tokens, budget, section_tokens, truncated)
+    return built
+
+
+def _document_section(name: str, title: str, text: str, question: str,
+                      model: str | None) -> PromptSection:
+    """Section for free text; long documents are reduced to relevant chunks."""
+    text = text.strip()
+    if count_tokens(text, model) > settings.RETRIEVAL_MIN_TOKENS:
+        excerpt = retrieve(text, question, settings.RETRIEVAL_TOKEN_BUDGET,
+                           lambda t: count_tokens(t, model))
+        return PromptSection(name=name, title=f"{title[:-1]} (most relevant excerpts):",
+                             body=excerpt, priority=2)
+    return PromptSection(name=name, title=title, body=text, priority=2)
+
+
+def file_section(fname: str, df: pd.DataFrame) -> PromptSection:
+    """Section for one parsed CSV or Excel file."""
+    return PromptSection(
+        name=f"file_{fname}",
+        title=f"{fname} ({len(df)} rows x {len(df.columns)} cols, CSV):",
+        body=table_to_csv(df),
+        priority=1,
+        kind="rows",
+    )
+
+
+def build_context_sections(context: Dict[str, Any], question: str = "",
+                           model: str | None = None,
+                           prebuilt: Dict[str, PromptSection] | None = None) -> List[PromptSection]:
+    """Turn solver context (tables, CSV, PDF/page text, JSON) into prompt sections.
+    
+    Args:
+        context: Extracted data including tables, PDFs, CSV data, etc.
+        question: Question used to pick relevant chunks of long documents
+        model: Model whose tokenizer is used for counting
+        prebuilt: File sections already rendered while parsing, keyed by name
+        
+    Returns:
+        Data sections in display order
+    """
+    prebuilt = prebuilt or {}
+    sections: List[PromptSection] = []
+
+    for i, table in enumerate(context.get("tables") or []):
+        sections.append(PromptSection(
+            name=f"table_{i + 1}",
+            title=f"Table {i + 1} ({len(table)} rows, CSV):",
+            body=table_to_csv(table),
+            priority=1,
+            kind="rows",
+        ))
+
+    for fname, df in (context.get("csv_data") or {}).items():
+        sections.append(prebuilt.get(f"file_{fname}") or file_section(fname, df))
+
+    if context.get("pdf_text"):
+        sections.append(_document_section("pdf_text", "PDF content:", context["pdf_text"], question, model))
+
+    if context.get("page_text"):
+        sections.append(_document_section("page_text", "Page text:", context["page_text"], question, model))
+
+    if context.get("embedded_json"):
+        sections.append(PromptSection(
+            name="embedded_json",
+            title="Embedded JSON data:",
+            body=minify_json(context["embedded_json"]),
+            priority=3,
+        ))
+
+    return sections
+
+
+def build_prompt(question: str, context: Dict[str, Any], budget: int | None = None,
+                 model: str | None = None, instructions: str = INSTRUCTIONS,
+                 prebuilt: Dict[str, PromptSection] | None = None) -> BuiltPrompt:
+    """Build the full solve prompt for `question` within a token budget.
+    
+    Args:
+        question: The quiz question text
+        context: Extracted data including tables, PDFs, CSV data, etc.
+        budget: Total token budget (defaults to PROMPT_TOKEN_BUDGET)
+        model: Model whose tokenizer is used for counting
+        instructions: Answer-format instructions appended after the question
+        prebuilt: File sections already rendered while parsing, keyed by name
+        
+    Returns:
+        BuiltPrompt with the text and token accounting
+    """
+    # data first and question last, so prompts over the same data share a
+    # cacheable prefix
+    sections = build_context_sections(context, question, model, prebuilt)
+    sections.append(PromptSection("question", "", f"Question: {question}", kind="fixed"))
+    sections.append(PromptSection("instructions", "", instructions, kind="fixed"))
+    return assemble(sections, budget=budget, model=model)
+
+
+def feedback_message(answer: Any, result: Dict[str, Any], structured: bool = False) -> str:
+    """Describe a rejected submission for the next conversation turn.
+    
+    Args:
+        answer: The answer that was submitted
+        result: Response from `submit_answer`
+        structured: Remind the model to keep the JSON answer format
+        
+    Returns:
+        Short user message carrying only the failure feedback
+    """
+    reason = result.get("reason") or result.get("message") or result.get("error")
+    parts = [f"Your answer {minify_json(answer)} was marked incorrect."]
+    if reason:
+        parts.append(f"Feedback: {reason}")
+    if structured:
+        parts.append("Reconsider using the data above and reply with a different answer in the same JSON format.")
+    else:
+        parts.append("Reconsider using the data above and reply with a different answer only.")
+    return " ".join(parts)
+
+
+class Conversation:
+    """Multi-turn solve session for one quiz step.
+    
+    The token-budgeted data prompt is built once and sent as the first user
+    turn. Retries append the previous reply and the submission feedback, so
+    the message list only grows by a small delta and every request shares
+    the same stable prefix (system prompt + data), which providers with
+    prefix caching can reuse.
+    """
+
+    def __init__(self, question: str, context: Dict[str, Any], model: str | None = None,
+                 structured: bool | None = None, prebuilt: Dict[str, PromptSection] | None = None):
+        self.question = question
+        self.structured = settings.LLM_STRUCTURED_OUTPUT if structured is None else structured
+        instructions = STRUCTURED_INSTRUCTIONS if self.structured else INSTRUCTIONS
+        self.prompt = build_prompt(question, context, model=model, instructions=instructions,
+                                   prebuilt=prebuilt)
+        self.model = model
+        self.messages: List[Dict[str, str]] = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": self.prompt.text},
+        ]
+
+    def add_reply(self, text: str) -> None:
+        """Record the assistant's reply to the latest user turn."""
+        self.messages.append({"role": "assistant", "content": text})
+
+    def discard_last_reply(self) -> None:
+        """Drop the latest assistant reply so the same turn can be re-asked."""
+        if self.messages[-1]["role"] == "assistant":
+            self.messages.pop()
+
+    def add_feedback(self, answer: Any, result: Dict[str, Any]) -> int:
+        """Append the failure feedback for `answer`; return the delta's token count."""
+        if self.messages[-1]["role"] != "assistant":
+            # the reply was never recorded (e.g. the LLM call failed)
+            self.add_reply(minify_json(answer))
+        text = feedback_message(answer, result, self.structured)
+        self.messages.append({"role": "user", "content": text})
+        return count_tokens(text, self.model)
+
+    @property
+    def turns(self) -> int:
+        """Number of user turns sent so far."""
+        return sum(1 for m in self.messages if m["role"] == "user")
@@ -0,0 +1,285 @@
+"""Pluggable LLM providers (AIPipe, OpenAI and a local stand-in)."""
+import threading
+import time
+from typing import Any, Callable, Dict, List
+import requests
+from app.utils.config import settings
+from app.utils.http import get_session
+from app.utils.logger import get_logger
+
+logger = get_logger("providers")
+
+SYSTEM_PROMPT = "You are a helpful data analysis assistant. You analyze data, perform calculations, and provide answers in the exact format requested."
+
+Messages = List[Dict[str, str]]
+
+
+def build_messages(prompt: str) -> Messages:
+    """Wrap a single user prompt in the standard system + user messages."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def call_aipipe_llm(prompt: str, temperature: float = 0.1, model: str | None = None,
+                    messages: Messages | None = None, json_mode: bool = False,
+                    timeout: float | None = None) -> str:
+    """Call AIPipe (institution) API with the given prompt.
+    
+    Args:
+        prompt: User prompt (ignored when `messages` is given)
+        temperature: Sampling temperature
+        model: Model name, defaults to AIPIPE_MODEL
+        messages: Full chat history to send instead of `prompt`
+        json_mode: Ask for a JSON object response (response_format)
+        timeout: Request timeout in seconds, defaults to REQUEST_TIMEOUT
+        
+    Returns:
+        LLM response text
+    """
+    if not settings.SECRET:
+        raise ValueError("QUIZ_SECRET (token) not configured")
+    
+    model = model or settings.AIPIPE_MODEL
+    logger.info("Calling AIPipe API model=%s", model)
+    
+    body = {
+        "model": model,
+        "messages": messages or build_messages(prompt),
+        "temperature": temperature
+    }
+    if json_mode:
+        body["response_format"] = {"type": "json_object"}
+    
+    try:
+        response = get_session().post(
+            settings.AIPIPE_API_URL,
+            headers={
+                "Authorization": f"Bearer {settings.SECRET}",
+                "Content-Type": "application/json"
+            },
+            json=body,
+            timeout=timeout or settings.REQUEST_TIMEOUT
+        )
+        
+        response.raise_for_status()
+        result = response.json()
+        
+        # Extract answer from response
+        answer = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+        
+        if not answer:
+            logger.error("No content in AIPipe response: %s", result)
+            raise ValueError("Empty response from AIPipe")
+        
+        logger.info("AIPipe response received: %s", answer[:200])
+        return answer
+        
+    except requests.exceptions.RequestException as e:
+        logger.exception("AIPipe API call failed: %s", e)
+        raise
+
+
+def call_openai_llm(prompt: str, temperature: float = 0.1, model: str | None = None,
+                    messages: Messages | None = None, n: int = 1,
+                    json_mode: bool = False, timeout: float | None = None) -> str | List[str]:
+    """Call OpenAI API with the given prompt.
+    
+    Args:
+        prompt: User prompt (ignored when `messages` is given)
+        temperature: Sampling temperature
+        model: Model name, defaults to OPENAI_MODEL
+        messages: Full chat history to send instead of `prompt`
+        n: Number of choices to sample; a list is returned when n > 1
+        json_mode: Ask for a JSON object response (response_format)
+        timeout: Request timeout in seconds, defaults to REQUEST_TIMEOUT
+        
+    Returns:
+        LLM response text (or list of texts when n > 1)
+    """
+    if not settings.OPENAI_API_KEY or not settings.OPENAI_API_KEY.startswith("sk-"):
+        raise ValueError("Valid OpenAI API key not configured")
+    
+    model = model or settings.OPENAI_MODEL
+    try:
+        client = _openai_client()
+        
+        logger.info("Calling OpenAI model=%s n=%d", model, n)
+        
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages or build_messages(prompt),
+            temperature=temperature,
+            n=n,
+            timeout=timeout or settings.REQUEST_TIMEOUT,
+            **extra
+        )
+        
+        answers = [choice.message.content for choice in response.choices]
+        logger.info("OpenAI response received: %s", answers[0][:200])
+        return answers if n > 1 else answers[0]
+    except Exception as e:
+        logger.exception("OpenAI API call failed: %s", e)
+        raise
+
+
+_openai_clients: Dict[str, Any] = {}
+_openai_lock = threading.Lock()
+
+
+def _openai_client() -> Any:
+    """Return the shared OpenAI client for the configured key (pooled connections)."""
+    import openai
+    with _openai_lock:
+        client = _openai_clients.get(settings.OPENAI_API_KEY)
+        if client is None:
+            client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.REQUEST_TIMEOUT)
+            _openai_clients[settings.OPENAI_API_KEY] = client
+        return client
+
+
+class LLMProvider:
+    """Base class for a chat-completion backend.
+
+    Subclasses set `name`, list the models they serve and implement
+    `complete`. Register instances with `register_provider`.
+    """
+
+    name = "base"
+    # True if one request can return several sampled choices (`n`)
+    supports_n = False
+
+    def models(self) -> List[str]:
+        """Return the model names this provider can route to, fastest first."""
+        raise NotImplementedError
+
+    def model_for_tier(self, tier: str) -> str:
+        """Return the model serving `tier` ("fast" is the first model, "strong" the last)."""
+        models = self.models()
+        return models[0] if tier == "fast" else models[-1]
+
+    def is_configured(self) -> bool:
+        """Return True if the provider has the credentials it needs."""
+        return True
+
+    def complete(self, messages: Messages, model: str, temperature: float,
+                 json_mode: bool = False, timeout: float | None = None) -> str:
+        """Run one chat completion and return the response text.
+
+        With `json_mode` the provider should constrain output to a JSON object.
+        `timeout` (seconds) must bound the whole call when given.
+        """
+        raise NotImplementedError
+
+    def complete_n(self, messages: Messages, model: str, temperature: float, n: int,
+                   json_mode: bool = False, timeout: float | None = None) -> List[str]:
+        """Sample `n` choices in one request (only if `supports_n`)."""
+        return [self.complete(messages, model, temperature, json_mode, timeout)]
+
+
+class AIPipeProvider(LLMProvider):
+    """Institution AIPipe (OpenRouter-compatible) API."""
+
+    name = "aipipe"
+
+    def models(self) -> List[str]:
+        return list(dict.fromkeys([settings.AIPIPE_FAST_MODEL, settings.AIPIPE_MODEL]))
+
+    def is_configured(self) -> bool:
+        return settings.USE_AIPIPE and bool(settings.SECRET)
+
+    def complete(self, messages: Messages, model: str, temperature: float,
+                 json_mode: bool = False, timeout: float | None = None) -> str:
+        return call_aipipe_llm("", temperature, model=model, messages=messages,
+                               json_mode=json_mode, timeout=timeout)
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions API."""
+
+    name = "openai"
+    supports_n = True
+
+    def models(self) -> List[str]:
+        return list(dict.fromkeys([settings.OPENAI_MODEL, settings.OPENAI_STRONG_MODEL]))
+
+    def is_configured(self) -> bool:
+        return bool(settings.OPENAI_API_KEY) and settings.OPENAI_API_KEY.startswith("sk-")
+
+    def complete(self, messages: Messages, model: str, temperature: float,
+                 json_mode: bool = False, timeout: float | None = None) -> str:
+        return call_openai_llm("", temperature, model=model, messages=messages,
+                               json_mode=json_mode, timeout=timeout)
+
+    def complete_n(self, messages: Messages, model: str, temperature: float, n: int,
+                   json_mode: bool = False, timeout: float | None = None) -> List[str]:
+        return call_openai_llm("", temperature, model=model, messages=messages, n=n,
+                               json_mode=json_mode, timeout=timeout)
+
+
+class LocalProvider(LLMProvider):
+    """Deterministic in-process stand-in used for testing and offline runs.
+
+    Answers with `responder(messages)` if given, else LOCAL_LLM_RESPONSE,
+    after sleeping `latency` seconds to imitate a remote call.
+    """
+
+    name = "local"
+
+    def __init__(self, responder: Callable[[Messages], str] | None = None,
+                 latency: float | None = None, model_names: List[str] | None = None,
+                 name: str | None = None):
+        self.responder = responder
+        self.latency = settings.LOCAL_LLM_LATENCY if latency is None else latency
+        self.model_names = model_names or ["local"]
+        if name:
+            self.name = name
+
+    def models(self) -> List[str]:
+        return list(self.model_names)
+
+    def complete(self, messages: Messages, model: str, temperature: float,
+                 json_mode: bool = False, timeout: float | None = None) -> str:
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"local provider timed out after {timeout:.1f}s")
+        if self.latency:
+            time.sleep(self.latency)
+        if self.responder:
+            return self.responder(messages)
+        return settings.LOCAL_LLM_RESPONSE
+
+
+_registry: Dict[str, LLMProvider] = {}
+
+
+def register_provider(provider: LLMProvider) -> None:
+    """Add (or replace) a provider in the routing pool."""
+    _registry[provider.name] = provider
+
+
+def unregister_provider(name: str) -> None:
+    """Remove a provider from the routing pool if present."""
+    _registry.pop(name, None)
+
+
+def get_providers() -> List[LLMProvider]:
+    """Return registered providers that are configured, in registration order."""
+    return [p for p in _registry.values() if p.is_configured()]
+
+
+def reset_providers() -> None:
+    """Restore the default provider set from LLM_PROVIDERS."""
+    _registry.clear()
+    builtin = {"aipipe": AIPipeProvider, "openai": OpenAIProvider, "local": LocalProvider}
+    for name in settings.LLM_PROVIDERS.split(","):
+        name = name.strip()
+        if name in builtin:
+            register_provider(builtin[name]())
+        elif name:
+            logger.warning("Unknown LLM provider in LLM_PROVIDERS: %s", name)
+
+
+reset_providers()
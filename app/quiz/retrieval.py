@@ -0,0 +1,154 @@
+"""In-process BM25 retrieval over long document text."""
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List
+from app.utils.config import settings
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+logger = get_logger("retrieval")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for indexing and querying."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def chunk_text(text: str, size: int | None = None, overlap: int | None = None) -> List[str]:
+    """Split `text` into overlapping chunks of about `size` characters.
+    
+    Chunks break on paragraph or line boundaries where possible so that
+    table rows and sentences stay intact.
+    
+    Args:
+        text: Document text
+        size: Target chunk size in characters (RETRIEVAL_CHUNK_CHARS)
+        overlap: Characters carried over between chunks (RETRIEVAL_CHUNK_OVERLAP)
+        
+    Returns:
+        List of chunk strings in document order
+    """
+    size = size or settings.RETRIEVAL_CHUNK_CHARS
+    overlap = settings.RETRIEVAL_CHUNK_OVERLAP if overlap is None else overlap
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            # prefer to break at a paragraph, then a line, then a space
+            for sep in ("\n\n", "\n", " "):
+                cut = text.rfind(sep, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks."""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._tfs = [Counter(tokenize(c)) for c in chunks]
+        self._lengths = [sum(tf.values()) for tf in self._tfs]
+        self._avg_len = (sum(self._lengths) / len(chunks)) if chunks else 0.0
+        df: Counter = Counter()
+        for tf in self._tfs:
+            df.update(tf.keys())
+        n = len(chunks)
+        self._idf: Dict[str, float] = {
+            term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        """Return the BM25 score of every chunk for `query`."""
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        result = []
+        for tf, length in zip(self._tfs, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self._avg_len or 1))
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            result.append(score)
+        return result
+
+    def top_k(self, query: str, k: int) -> List[int]:
+        """Return indexes of the `k` best chunks, best first (ties by position)."""
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: (-scores[i], i))
+        return [i for i in ranked[:k] if scores[i] > 0]
+
+
+_cache: "OrderedDict[str, BM25Index]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def document_hash(text: str) -> str:
+    """Return a stable hash identifying a document's text."""
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+def get_index(text: str) -> BM25Index:
+    """Return the (cached) BM25 index for `text`, keyed by its hash."""
+    key = document_hash(text)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            metrics.cache_requests_total.inc(cache="retrieval_index", result="hit")
+            return _cache[key]
+    metrics.cache_requests_total.inc(cache="retrieval_index", result="miss")
+    index = BM25Index(chunk_text(text))
+    with _cache_lock:
+        _cache[key] = index
+        while len(_cache) > settings.RETRIEVAL_CACHE_SIZE:
+            _cache.popitem(last=False)
+    logger.info("Indexed document %s into %d chunks", key[:12], len(index.chunks))
+    return index
+
+
+def retrieve(text: str, query: str, budget_tokens: int, count_tokens) -> str:
+    """Select the chunks of `text` most relevant to `query` within a token budget.
+    
+    Chunks are picked best first until the budget is spent and then emitted
+    in document order. If nothing matches the query, the leading chunks are
+    used instead.
+    
+    Args:
+        text: Full document text
+        query: Question used to rank chunks
+        budget_tokens: Maximum tokens of the returned excerpt
+        count_tokens: Callable returning the token count of a string
+        
+    Returns:
+        Excerpt made of the selected chunks separated by "..." markers
+    """
+    index = get_index(text)
+    order = index.top_k(query, settings.RETRIEVAL_TOP_K)
+    if not order:
+        order = list(range(min(settings.RETRIEVAL_TOP_K, len(index.chunks))))
+
+    picked: List[int] = []
+    used = 0
+    for i in order:
+        cost = count_tokens(index.chunks[i]) + 2
+        if used + cost > budget_tokens:
+            continue
+        picked.append(i)
+        used += cost
+    logger.info("Retrieved chunks %s of %d (%d tokens)", sorted(picked), len(index.chunks), used)
+    return "\n...\n".join(index.chunks[i] for i in sorted(picked))
@@ -0,0 +1,104 @@
+"""Adaptive LLM routing by observed latency, success and correctness."""
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("routing")
+
+Route = Tuple[str, str]  # (provider name, model)
+
+
+@dataclass
+class RouteStats:
+    """EWMA statistics for one (provider, model) route."""
+    latency: float
+    success: float
+    correct: float
+    calls: int = 0
+    graded: int = 0
+
+    def expected_time_to_correct(self) -> float:
+        """Expected seconds until a correct answer if every call is retried."""
+        p = max(self.success * self.correct, 0.01)
+        return self.latency / p
+
+
+class ProviderRouter:
+    """Ranks routes by expected time-to-correct-answer with epsilon exploration.
+
+    Latency and call success are updated after every LLM call; correctness is
+    fed back from submission results via `record_correctness`.
+    """
+
+    def __init__(self, alpha: float | None = None, exploration: float | None = None):
+        self.alpha = settings.LLM_ROUTER_ALPHA if alpha is None else alpha
+        self.exploration = settings.LLM_ROUTER_EXPLORATION if exploration is None else exploration
+        self._stats: Dict[Route, RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, route: Route) -> RouteStats:
+        """Return stats for `route`, seeding priors on first use (lock held)."""
+        if route not in self._stats:
+            self._stats[route] = RouteStats(
+                latency=settings.LLM_ROUTER_PRIOR_LATENCY,
+                success=0.9,
+                correct=0.7,
+            )
+        return self._stats[route]
+
+    def _ewma(self, old: float, new: float) -> float:
+        return (1 - self.alpha) * old + self.alpha * new
+
+    def record_call(self, route: Route, latency: float, ok: bool) -> None:
+        """Update latency (successful calls only) and call success for `route`."""
+        with self._lock:
+            stats = self._get(route)
+            stats.calls += 1
+            stats.success = self._ewma(stats.success, 1.0 if ok else 0.0)
+            if ok:
+                stats.latency = self._ewma(stats.latency, latency)
+
+    def record_correctness(self, route: Route, correct: bool) -> None:
+        """Update answer correctness for `route` from a submission result."""
+        with self._lock:
+            stats = self._get(route)
+            stats.graded += 1
+            stats.correct = self._ewma(stats.correct, 1.0 if correct else 0.0)
+
+    def rank(self, routes: List[Route]) -> List[Route]:
+        """Order `routes` best first; occasionally promote a random one to explore.
+
+        Ties keep the input order, so registration order acts as a preference.
+        """
+        if not routes:
+            return []
+        with self._lock:
+            scores = {r: self._get(r).expected_time_to_correct() for r in routes}
+        ranked = sorted(routes, key=lambda r: scores[r])
+        if len(ranked) > 1 and random.random() < self.exploration:
+            pick = random.choice(ranked[1:])
+            ranked.remove(pick)
+            ranked.insert(0, pick)
+            logger.info("Exploring route %s/%s", *pick)
+        return ranked
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return JSON-serializable stats keyed by "provider/model"."""
+        with self._lock:
+            return {
+                f"{p}/{m}": {
+                    "latency": round(s.latency, 3),
+                    "success": round(s.success, 3),
+                    "correct": round(s.correct, 3),
+                    "calls": s.calls,
+                    "graded": s.graded,
+                    "expected_time_to_correct": round(s.expected_time_to_correct(), 3),
+                }
+                for (p, m), s in self._stats.items()
+            }
+
+
+provider_router = ProviderRouter()
@@ -0,0 +1,143 @@
+"""Budget-aware strategy selection for each step of a quiz chain."""
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict
+from app.quiz.browser import IS_SERVERLESS
+from app.quiz.tiering import FAST, STRONG
+from app.utils.config import settings
+from app.utils.deadline import Deadline
+from app.utils.logger import get_logger
+
+logger = get_logger("scheduler")
+
+# Prior per-stage latencies (seconds) used until enough history exists
+STAGE_PRIORS = {
+    "fetch_browser": 8.0,
+    "fetch_http": 2.0,
+    "parse": 1.0,
+    "llm_fast": 4.0,
+    "llm_strong": 10.0,
+    "submit": 1.5,
+}
+
+
+class StageHistory:
+    """Rolling per-stage latency samples."""
+
+    def __init__(self, window: int = 50):
+        self._samples: Dict[str, Deque[float]] = {}
+        self.window = window
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record one latency sample for `stage`."""
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def estimate(self, stage: str, pct: float = 90) -> float:
+        """Return the `pct` percentile latency of `stage`, or its prior."""
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if len(samples) < 3:
+            return STAGE_PRIORS.get(stage, 5.0)
+        return samples[min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return p50/p90 and sample counts per stage."""
+        with self._lock:
+            stages = list(self._samples)
+        return {
+            stage: {
+                "p50": round(self.estimate(stage, 50), 3),
+                "p90": round(self.estimate(stage, 90), 3),
+                "samples": len(self._samples.get(stage, ())),
+            }
+            for stage in stages
+        }
+
+
+@dataclass
+class StepPlan:
+    """Strategy chosen for one quiz step.
+    
+    `tier` is None when tiering may choose freely; `fetch` is "browser" or
+    "http"; `extraction` is "full" or "minimal" (no PDF parsing or page
+    text); `best_effort` means submit the first answer without retries.
+    """
+    tier: str | None
+    fetch: str
+    extraction: str
+    max_attempts: int
+    allow_escalation: bool
+    best_effort: bool
+    reason: str
+
+
+stage_history = StageHistory()
+
+
+def plan_step(deadline: Deadline, depth: int, history: StageHistory | None = None) -> StepPlan:
+    """Choose fetch method, model tier, extraction depth and retry count.
+    
+    The plan compares the step's budget with the p90 latency of each
+    stage: a step that cannot afford the browser falls back to plain HTTP,
+    one that cannot afford a strong-model call pins the fast tier, and one
+    that can barely afford a single fast attempt switches to best-effort.
+    
+    The step's budget is the remaining chain budget less one minimal fast
+    attempt for each step still expected after this one
+    (SCHEDULER_EXPECTED_STEPS minus `depth`), so early steps leave room for
+    the rest of the chain and later steps may spend what is left.
+    
+    Args:
+        deadline: Solve deadline for the chain
+        depth: Number of steps already completed
+        history: Stage latency history (defaults to the shared one)
+        
+    Returns:
+        StepPlan for this step (also logged)
+    """
+    history = history or stage_history
+    budget = deadline.remaining() - deadline.reserve
+    browser = history.estimate("fetch_browser")
+    http = history.estimate("fetch_http")
+    parse = history.estimate("parse")
+    fast = history.estimate("llm_fast")
+    strong = history.estimate("llm_strong")
+    submit = history.estimate("submit")
+    minimal = http + parse + fast + submit
+    later_steps = max(0, settings.SCHEDULER_EXPECTED_STEPS - depth - 1)
+    step_budget = max(minimal, budget - later_steps * minimal)
+
+    if not settings.SCHEDULER_ENABLED:
+        plan = StepPlan(None, "browser", "full", settings.MAX_RETRIES, True, False, "scheduler disabled")
+    elif budget < minimal:
+        plan = StepPlan(FAST, "http", "minimal", 1, False, True,
+                        f"best effort: {budget:.1f}s left < one fast attempt")
+    else:
+        use_browser = not IS_SERVERLESS and step_budget >= browser + parse + fast + submit
+        fetch_cost = browser if use_browser else http
+        after_fetch = step_budget - fetch_cost - parse
+        # retries can use the strong tier only if one strong call still fits
+        can_afford_strong = after_fetch >= fast + strong + 2 * submit
+        attempt_cost = (strong if can_afford_strong else fast) + submit
+        max_attempts = max(1, min(settings.MAX_RETRIES, int((after_fetch - fast - submit) // attempt_cost) + 1))
+        extraction = "full" if after_fetch >= fast + submit + settings.SCHEDULER_FULL_EXTRACTION_SLACK else "minimal"
+        plan = StepPlan(
+            tier=None if can_afford_strong else FAST,
+            fetch="browser" if use_browser else "http",
+            extraction=extraction,
+            max_attempts=max_attempts,
+            allow_escalation=can_afford_strong,
+            best_effort=False,
+            reason=f"{budget:.1f}s left, {step_budget:.1f}s for this step ({later_steps} more expected)",
+        )
+
+    logger.info("Step plan depth=%d: %s", depth, asdict(plan))
+    return plan
+
+
+def llm_stage(tier: str | None) -> str:
+    """History stage name for an LLM call on `tier`."""
+    return "llm_strong" if tier == STRONG else "llm_fast"
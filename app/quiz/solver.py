@@ -1,73 +1,212 @@
-"""Main quiz solver orchestration with recursive solving and retries."""
+"""Quiz chain executor: iterative, async step-by-step solving with retries."""
+import asyncio
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 from pathlib import Path
+from urllib.parse import urlparse
 from app.quiz.browser import fetch_page_and_downloads
+from app.quiz.checkpoint import CheckpointStore
 from app.quiz.extractor import (
     parse_html_for_quiz,
     parse_csv,
     parse_xlsx,
     parse_pdf
 )
-from app.quiz.llm import solve_with_llm
+from app.quiz.memo import AnswerMemo, data_fingerprint
+from app.quiz.llm import ask, ask_candidates, record_answer_outcome
+from app.quiz.prompt import Conversation, PromptSection, file_section
+from app.quiz.scheduler import StepPlan, llm_stage, plan_step, stage_history
+from app.quiz.telemetry import TelemetryStore
 from app.quiz.submitter import submit_answer
+from app.quiz.tiering import STRONG, tier_tracker
+from app.quiz.trace import ChainTrace, StepTrace, register_active
 from app.utils.logger import get_logger
 from app.utils.config import settings
+from app.utils import metrics, tracing
+from app.utils.deadline import Deadline, DeadlineExceeded
 
 logger = get_logger("solver")
 
+# Steps after the first before the chain is abandoned
+MAX_CHAIN_DEPTH = 10
 
-def solve_quiz(url: str, email: str, start_time: float | None = None, depth: int = 0) -> Dict[str, Any]:
-    """Recursively solve quiz at given URL.
+
+def solve_quiz(url: str, email: str, start_time: float | None = None, depth: int = 0,
+               deadline: Deadline | None = None, trace: ChainTrace | None = None,
+               checkpoint: CheckpointStore | None = None, memo: AnswerMemo | None = None,
+               telemetry: TelemetryStore | None = None) -> Dict[str, Any]:
+    """Solve the quiz chain starting at `url`, blocking until it finishes.
     
-    This function:
-    1. Fetches the page with Playwright
-    2. Extracts question, data, and submit endpoint
-    3. Parses downloaded files (CSV, PDF, etc.)
-    4. Calls LLM to solve the question
-    5. Submits the answer
-    6. If incorrect and within time window, retries
-    7. If new URL returned, recursively solves next quiz
+    Sync wrapper around `solve_chain` for callers without an event loop;
+    code already running in one should await `solve_chain` instead.
     
     Args:
         url: Quiz URL
         email: User email
         start_time: Timestamp when solving started (for 3-minute window)
-        depth: Recursion depth (to prevent infinite loops)
+        depth: Depth of `url` within the chain
+        deadline: Solve deadline shared by the whole chain; created from
+            start_time and RETRY_WINDOW_SECONDS when omitted
+        trace: Trace to record the chain into (a new one when omitted)
+        checkpoint: Store to resume from and persist completed steps to
+        memo: Verified-answer memo consulted before the LLM
+        telemetry: Store the finished chain's per-step timings are queued to
         
     Returns:
-        Final quiz result
+        Final quiz result, or a "deadline_exceeded" result naming the stage
+        that ran out of time
         
     Raises:
-        ValueError: If max depth or retries exceeded
+        ValueError: If max depth exceeded or a page cannot be solved
     """
-    if depth > 10:
-        raise ValueError("Max recursion depth exceeded")
+    return asyncio.run(solve_chain(url, email, start_time=start_time, depth=depth,
+                                   deadline=deadline, trace=trace, checkpoint=checkpoint,
+                                   memo=memo, telemetry=telemetry))
+
+
+async def solve_chain(url: str, email: str, start_time: float | None = None, depth: int = 0,
+                      deadline: Deadline | None = None, trace: ChainTrace | None = None,
+                      checkpoint: CheckpointStore | None = None,
+                      memo: AnswerMemo | None = None,
+                      telemetry: TelemetryStore | None = None) -> Dict[str, Any]:
+    """Solve a quiz chain iteratively, one state transition per step.
+    
+    Each step:
+    1. Fetches the page (browser or plain HTTP, per the step plan)
+    2. Extracts the question while parsing downloaded files in parallel
+    3. Calls the LLM to answer the question
+    4. Submits, retrying incorrect answers within the time window
+    5. Moves on to the returned next URL, if any
     
-    if start_time is None:
-        start_time = time.time()
+    A step's page, parsed files and conversation go out of scope once it has
+    been submitted, and blocking stages run in worker threads only while
+    they execute, so a long chain neither grows the stack nor pins a thread.
     
-    elapsed = time.time() - start_time
-    if elapsed > settings.RETRY_WINDOW_SECONDS:
-        raise ValueError("Exceeded 3-minute time window")
+    With a checkpoint store, every correctly answered step is persisted
+    under (email, start URL), and a retried session resumes at the first
+    unsolved URL instead of the start.
+    
+    Args:
+        url: Quiz URL
+        email: User email
+        start_time: Timestamp when solving started (for 3-minute window)
+        depth: Depth of `url` within the chain
+        deadline: Solve deadline shared by the whole chain; created from
+            start_time and RETRY_WINDOW_SECONDS when omitted
+        trace: Trace to record the chain into (a new one when omitted)
+        checkpoint: Store to resume from and persist completed steps to
+        memo: Verified-answer memo consulted before the LLM
+        telemetry: Store the finished chain's per-step timings are queued to
+        
+    Returns:
+        Final quiz result, or a "deadline_exceeded" result naming the stage
+        that ran out of time
+        
+    Raises:
+        ValueError: If max depth exceeded or a page cannot be solved
+    """
+    if deadline is None:
+        deadline = Deadline(settings.RETRY_WINDOW_SECONDS, start=start_time)
+    if trace is None:
+        trace = ChainTrace(url, email)
+    
+    register_active(trace)
+    metrics.solves_in_flight.inc()
+    start_url = url
+    if checkpoint is not None:
+        resumed = checkpoint.begin(email, start_url)
+        if resumed:
+            url, depth = resumed
+            trace.resumed_at = depth
+            logger.info("Resuming chain from checkpoint at depth=%d url=%s", depth, url)
+    trace.emit("chain_started", chain_id=trace.chain_id, url=url, depth=depth, resumed=trace.resumed_at is not None)
+    
+    with tracing.span("solve_chain", chain_id=trace.chain_id, url=url, depth=depth,
+                      resumed=trace.resumed_at is not None) as root:
+        try:
+            while True:
+                if depth > MAX_CHAIN_DEPTH:
+                    raise ValueError("Max chain depth exceeded")
+                step = trace.start_step(url, depth)
+                with tracing.span("solve_step", url=url, depth=depth) as span:
+                    result = await _run_step(url, email, depth, deadline, step, memo)
+                    span.set(status=step.status, attempts=step.attempts, memo_hit=step.memo_hit)
+                next_url = (result.get("next_url") or result.get("url")) if step.correct else None
+                if checkpoint is not None and step.correct:
+                    checkpoint.record_step(email, start_url, depth, url, step.answer, result, next_url)
+                    if not next_url:
+                        checkpoint.finish(email, start_url)
+                if not next_url:
+                    break
+                logger.info("Next quiz URL: %s", next_url)
+                step.emit("next_url", url=next_url)
+                url, depth = next_url, depth + 1
+        except DeadlineExceeded as e:
+            logger.error("Deadline exceeded at depth=%d during %s: %s", depth, e.stage, e)
+            trace.steps[-1].status = "deadline_exceeded"
+            trace.emit("deadline_exceeded", stage=e.stage, depth=depth)
+            result = {
+                "status": "deadline_exceeded",
+                "message": str(e),
+                "stage": e.stage,
+                "depth": depth,
+                "url": url,
+                "elapsed": round(deadline.elapsed(), 2)
+            }
+        except Exception:
+            trace.finish({"status": "error"})
+            if telemetry is not None:
+                telemetry.record_chain(trace)
+            raise
+        finally:
+            metrics.solves_in_flight.dec()
+        root.set(status=result.get("status"), steps=len(trace.steps))
+    
+    trace.finish(result)
+    if telemetry is not None:
+        telemetry.record_chain(trace)
+    logger.info("Chain %s finished: %s after %d steps in %.1fs",
+                trace.chain_id, trace.status, len(trace.steps), trace.elapsed)
+    return result
+
+
+async def _run_step(url: str, email: str, depth: int, deadline: Deadline, step: StepTrace,
+                    memo: AnswerMemo | None = None) -> Dict[str, Any]:
+    """Fetch, extract, answer and submit one quiz page under `deadline`."""
+    deadline.check("start")
     
     logger.info("Solving quiz at depth=%d url=%s", depth, url)
+    plan = plan_step(deadline, depth)
+    step.emit("step_started", url=url, fetch=plan.fetch, tier=plan.tier, max_attempts=plan.max_attempts,
+              remaining=round(deadline.remaining(), 1))
     
-    # Step 1: Fetch page and downloads
+    # Fetch page and downloads
     try:
-        logger.info("Fetching page with Playwright...")
-        page_data = fetch_page_and_downloads(url)
+        logger.info("Fetching page (method=%s)...", plan.fetch)
+        fetch_start = time.monotonic()
+        with step.stage("fetch"):
+            page_data = await asyncio.to_thread(fetch_page_and_downloads, url, deadline=deadline,
+                                                method=plan.fetch)
+        stage_history.record(f"fetch_{plan.fetch}", time.monotonic() - fetch_start)
         logger.info("Page fetched successfully")
+        step.emit("page_fetched", seconds=step.stages["fetch"], bytes=len(page_data["html"]),
+                  downloads=len(page_data["downloads"]))
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.exception("Failed to fetch page: %s", e)
         raise ValueError(f"Browser automation failed: {str(e)}")
     
-    html = page_data["html"]
-    downloads = page_data["downloads"]
-    js_data = page_data.get("js_data", {})
+    # HTML extraction and file parsing are independent, so they run side by side
+    parse_start = time.monotonic()
+    with step.stage("extract"):
+        quiz_info, *parsed = await asyncio.gather(
+            asyncio.to_thread(_parse_page, page_data["html"], page_data.get("js_data", {})),
+            *(asyncio.to_thread(_parse_download, fpath, plan) for fpath in page_data["downloads"]),
+        )
+    downloads = list(page_data["downloads"])
+    del page_data
     
-    # Step 2: Extract quiz info
-    quiz_info = parse_html_for_quiz(html, js_data)
     question = quiz_info.get("question")
     submit_url = quiz_info.get("submit_url")
     
@@ -82,14 +221,14 @@ def solve_quiz(url: str, email: str, start_time: float | None = None, depth: int
             submit_url = url.replace("/quiz/", "/submit/")
         else:
             # Extract base URL and add /submit
-            from urllib.parse import urlparse
-            parsed = urlparse(url)
-            submit_url = f"{parsed.scheme}://{parsed.netloc}/submit"
+            parsed_url = urlparse(url)
+            submit_url = f"{parsed_url.scheme}://{parsed_url.netloc}/submit"
     
     logger.info("Question: %s", question[:100])
     logger.info("Submit URL: %s", submit_url)
+    step.question = question
+    step.files = sum(1 for item in parsed if item is not None)
     
-    # Step 3: Parse downloaded files
     context = {
         "tables": quiz_info.get("tables", []),
         "embedded_json": quiz_info.get("embedded_json", []),
@@ -97,76 +236,241 @@ def solve_quiz(url: str, email: str, start_time: float | None = None, depth: int
         "pdf_text": ""
     }
     
-    for fpath in downloads:
-        p = Path(fpath)
-        ext = p.suffix.lower()
-        
-        try:
-            if ext == ".csv":
+    # include the rest of the page only when it says more than the question
+    page_text = quiz_info.get("page_text", "")
+    if plan.extraction == "full" and len(page_text) > len(question) + 200:
+        context["page_text"] = page_text
+    
+    prebuilt: Dict[str, PromptSection] = {}
+    for item in parsed:
+        if item is None:
+            continue
+        kind, name, value, section = item
+        if kind == "csv_data":
+            context["csv_data"][name] = value
+            prebuilt[section.name] = section
+        else:
+            context["pdf_text"] += f"\n\n{name}:\n{value}"
+    stage_history.record("parse", time.monotonic() - parse_start)
+    step.emit("extracted", seconds=step.stages["extract"], question=question[:200], submit_url=submit_url,
+              files=step.files, tables=len(context["tables"]), pdf_chars=len(context["pdf_text"]))
+    
+    result = await _answer_and_submit(url, email, question, submit_url, context, prebuilt,
+                                      plan, deadline, step, memo, downloads)
+    step.status = "correct" if step.correct else str(result.get("status") or "incorrect")
+    return result
+
+
+def _parse_page(html: str, js_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Run `parse_html_for_quiz` under a tracing span."""
+    with tracing.span("parse_html_for_quiz", bytes=len(html)) as span:
+        quiz_info = parse_html_for_quiz(html, js_data)
+        span.set(question_found=bool(quiz_info.get("question")), tables=len(quiz_info.get("tables", [])),
+                 embedded_json=len(quiz_info.get("embedded_json", [])))
+        return quiz_info
+
+
+def _parse_download(fpath: str, plan: StepPlan) -> Tuple[str, str, Any, PromptSection | None] | None:
+    """Parse one downloaded file into ("csv_data" | "pdf_text", name, value, section).
+    
+    Tables get their prompt section rendered right after parsing, so that
+    encoding one file overlaps the page and the other files still parsing;
+    `section` is None for PDFs, whose excerpts depend on the question.
+    
+    Returns None for unsupported or failed files, and for PDFs when the plan
+    only allows minimal extraction.
+    """
+    p = Path(fpath)
+    ext = p.suffix.lower()
+    
+    start = time.monotonic()
+    try:
+        if ext == ".csv":
+            with tracing.span("parse_csv", file=p.name, bytes=p.stat().st_size) as span:
                 df = parse_csv(fpath)
-                context["csv_data"][p.name] = df
-                logger.info("Parsed CSV: %s with %d rows", p.name, len(df))
-            elif ext in (".xlsx", ".xls"):
+                span.set(rows=len(df), columns=len(df.columns))
+            logger.info("Parsed CSV: %s with %d rows", p.name, len(df))
+            return "csv_data", p.name, df, file_section(p.name, df)
+        elif ext in (".xlsx", ".xls"):
+            with tracing.span("parse_xlsx", file=p.name, bytes=p.stat().st_size) as span:
                 df = parse_xlsx(fpath)
-                context["csv_data"][p.name] = df
-                logger.info("Parsed Excel: %s with %d rows", p.name, len(df))
-            elif ext == ".pdf":
+                span.set(rows=len(df), columns=len(df.columns))
+            logger.info("Parsed Excel: %s with %d rows", p.name, len(df))
+            return "csv_data", p.name, df, file_section(p.name, df)
+        elif ext == ".pdf" and plan.extraction == "full":
+            with tracing.span("parse_pdf", file=p.name, bytes=p.stat().st_size) as span:
                 text = parse_pdf(fpath)
-                context["pdf_text"] += f"\n\n{p.name}:\n{text}"
-                logger.info("Parsed PDF: %s (%d chars)", p.name, len(text))
-        except Exception as e:
-            logger.exception("Failed to parse %s: %s", fpath, e)
+                span.set(chars=len(text))
+            logger.info("Parsed PDF: %s (%d chars)", p.name, len(text))
+            return "pdf_text", p.name, text, None
+    except Exception as e:
+        logger.exception("Failed to parse %s: %s", fpath, e)
+    finally:
+        metrics.stage_seconds.observe(time.monotonic() - start, stage="parse")
+    return None
+
+
+async def _answer_and_submit(url: str, email: str, question: str, submit_url: str, context: Dict[str, Any],
+                             prebuilt: Dict[str, PromptSection], plan: StepPlan, deadline: Deadline,
+                             step: StepTrace, memo: AnswerMemo | None = None,
+                             downloads: List[str] | None = None) -> Dict[str, Any]:
+    """Answer `question` and submit until correct or out of attempts.
     
-    # Step 4: Solve with LLM
+    The prompt is built in a worker thread while the memo is consulted, and
+    is only waited for once the LLM is actually needed.
+    """
+    prompt = asyncio.create_task(asyncio.to_thread(Conversation, question, context, prebuilt=prebuilt))
     try:
-        logger.info("Calling LLM to solve question...")
-        answer = solve_with_llm(question, context)
-        logger.info("LLM answer: %s", answer)
-    except Exception as e:
-        logger.exception("LLM failed: %s", e)
-        # Use a default answer instead of crashing
-        logger.warning("Using default answer due to LLM failure")
-        answer = "Unable to solve"
+        return await _submit_until_correct(url, email, question, submit_url, context, prompt,
+                                           plan, deadline, step, memo, downloads)
+    finally:
+        if not prompt.done():
+            # a memo answer was accepted before the prompt was needed
+            prompt.cancel()
+        elif not prompt.cancelled() and prompt.exception() is not None:
+            logger.warning("Prompt building failed: %s", prompt.exception())
+
+
+async def _submit_until_correct(url: str, email: str, question: str, submit_url: str, context: Dict[str, Any],
+                                prompt: "asyncio.Task[Conversation]", plan: StepPlan, deadline: Deadline,
+                                step: StepTrace, memo: AnswerMemo | None = None,
+                                downloads: List[str] | None = None) -> Dict[str, Any]:
+    """Answer loop of `_answer_and_submit`.
     
-    # Step 5: Submit answer
-    for attempt in range(settings.MAX_RETRIES):
+    Each memo, LLM and submit call is its own worker-thread hop, so no
+    thread is held across the retry loop. A verified answer from `memo`
+    replaces the first LLM call; accepted answers are stored back and a
+    rejected memo answer is forgotten. The returned result carries the next
+    URL (if any) for the chain executor to follow.
+    """
+    # Answer from the memo, else the LLM (fast tier first, escalate on low confidence)
+    tier = plan.tier or tier_tracker.choose(question, attempt=0)
+    llm_meta: Dict[str, Any] = {}
+    conversation: Conversation | None = None
+    memo_answer = None
+    if memo is not None:
+        data_hash = await asyncio.to_thread(data_fingerprint, context, downloads or ())
+        memo_answer = await asyncio.to_thread(memo.lookup, url, question, data_hash)
+    if memo_answer is not None:
+        # a known question over unchanged data needs no LLM call
+        logger.info("Using verified answer from memo: %r", memo_answer)
+        answer = memo_answer
+        step.memo_hit = True
+        step.answer = answer
+        step.emit("answer", answer=_event_value(answer), source="memo")
+    else:
         try:
-            logger.info(f"Submitting answer (attempt {attempt + 1}/{settings.MAX_RETRIES})...")
-            result = submit_answer(submit_url, answer, email, settings.SECRET, url)
+            logger.info("Calling LLM to solve question (tier=%s)...", tier)
+            with step.stage("llm"):
+                conversation = await prompt
+                answer = await asyncio.to_thread(ask, conversation, meta=llm_meta, tier=tier, deadline=deadline)
+            _record_llm_stage(llm_meta)
+            if plan.allow_escalation and tier_tracker.should_escalate(tier, llm_meta.get("confidence")):
+                logger.info("Low-confidence %s answer %r, escalating to strong model", tier, answer)
+                tier_tracker.record_escalation(tier)
+                tier = STRONG
+                llm_meta = {}
+                conversation.discard_last_reply()
+                with step.stage("llm"):
+                    answer = await asyncio.to_thread(ask, conversation, meta=llm_meta, tier=tier,
+                                                     deadline=deadline)
+                _record_llm_stage(llm_meta)
+            logger.info("LLM answer: %s", answer)
+            step.answer = answer
+            step.emit("answer", answer=_event_value(answer), source="llm", provider=llm_meta.get("provider"),
+                      model=llm_meta.get("model"), tier=llm_meta.get("tier"), latency=llm_meta.get("latency"),
+                      confidence=llm_meta.get("confidence"))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.exception("LLM failed: %s", e)
+            # Use a default answer instead of crashing
+            logger.warning("Using default answer due to LLM failure")
+            metrics.fallbacks_total.inc(kind="default_answer")
+            answer = "Unable to solve"
+    
+    # Submit, retrying incorrect answers while the plan allows
+    tried: List[Any] = []
+    candidates: List[Tuple[Any, Dict[str, Any]]] = []
+    max_attempts = plan.max_attempts
+    for attempt in range(max_attempts):
+        try:
+            logger.info("Submitting answer (attempt %d/%d)...", attempt + 1, max_attempts)
+            step.attempts = attempt + 1
+            step.answer = answer
+            if llm_meta.get("provider"):
+                step.provider, step.model = llm_meta["provider"], llm_meta.get("model")
+                step.tier, step.prompt_tokens = llm_meta.get("tier"), llm_meta.get("prompt_tokens")
+            submit_start = time.monotonic()
+            with step.stage("submit"):
+                result = await asyncio.to_thread(submit_answer, submit_url, answer, email, settings.SECRET, url,
+                                                 deadline=deadline)
+            stage_history.record("submit", time.monotonic() - submit_start)
+            correct = bool(result.get("correct") or result.get("status") == "success")
+            step.correct = correct
+            metrics.submits_total.inc(result="correct" if correct else "incorrect")
+            step.emit("submitted", attempt=attempt + 1, answer=_event_value(answer), correct=correct,
+                      status=result.get("status"), reason=result.get("reason"),
+                      seconds=round(time.monotonic() - submit_start, 3))
+            if memo is not None:
+                if correct and not (step.memo_hit and attempt == 0):
+                    await asyncio.to_thread(memo.store, url, question, data_hash, answer)
+                elif not correct and step.memo_hit and attempt == 0:
+                    await asyncio.to_thread(memo.invalidate, url, question)
+            if result.get("status") != "error":
+                record_answer_outcome(llm_meta, correct)
+                if llm_meta.get("tier"):
+                    tier_tracker.record_outcome(question, llm_meta["tier"], correct)
             
             # check if correct
-            if result.get("correct") or result.get("status") == "success":
+            if correct:
                 logger.info("Answer correct!")
                 
                 # check for next URL
-                next_url = result.get("next_url") or result.get("url")
-                if next_url:
-                    logger.info("Next quiz URL: %s", next_url)
-                    return solve_quiz(next_url, email, start_time, depth + 1)
-                
                 return result
             
             # incorrect
             logger.warning("Answer incorrect on attempt %d", attempt + 1)
             
             # check time window
-            elapsed = time.time() - start_time
-            if elapsed > settings.RETRY_WINDOW_SECONDS:
+            if deadline.expired(deadline.reserve):
                 logger.error("Exceeded time window, cannot retry")
                 return result
             
-            # retry with updated context
-            if attempt < settings.MAX_RETRIES - 1:
-                logger.info("Retrying with refined prompt...")
-                # optionally refine prompt here
-                answer = solve_with_llm(
-                    f"{question}\n\nPrevious answer was incorrect: {answer}\nPlease reconsider and provide a different answer.",
-                    context
-                )
+            tried.append(answer)
+            
+            # retry as a follow-up turn carrying only the submit feedback
+            if attempt < max_attempts - 1:
+                metrics.retries_total.inc()
+                if not candidates:
+                    tier = plan.tier or tier_tracker.choose(question, attempt=attempt + 1)
+                    if conversation is None:
+                        conversation = await prompt
+                    delta_tokens = conversation.add_feedback(answer, result)
+                    logger.info("Retrying with feedback turn (tier=%s, +%d tokens)...", tier, delta_tokens)
+                    if settings.RETRY_MODE == "candidates":
+                        with step.stage("llm"):
+                            candidates = await asyncio.to_thread(ask_candidates, conversation,
+                                                                 settings.RETRY_CANDIDATES, tier,
+                                                                 exclude=tried, deadline=deadline)
+                
+                if candidates:
+                    # submit the next-ranked candidate without another LLM call
+                    answer, llm_meta = candidates.pop(0)
+                    logger.info("Trying candidate %r (%d votes)", answer, llm_meta["votes"])
+                else:
+                    llm_meta = {}
+                    with step.stage("llm"):
+                        answer = await asyncio.to_thread(ask, conversation, meta=llm_meta, tier=tier,
+                                                         deadline=deadline)
+                    _record_llm_stage(llm_meta)
         
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.exception("Submit failed on attempt %d: %s", attempt + 1, e)
-            if attempt == settings.MAX_RETRIES - 1:
+            metrics.submits_total.inc(result="error")
+            if attempt == max_attempts - 1:
                 # Return error response instead of crashing
                 return {
                     "status": "error",
@@ -181,3 +485,18 @@ def solve_quiz(url: str, email: str, start_time: float | None = None, depth: int
         "answer": answer,
         "question": question[:100] if question else None
     }
+
+
+def _event_value(answer: Any) -> Any:
+    """Answer as sent in progress events: JSON scalars as-is, others truncated."""
+    if isinstance(answer, str):
+        return answer[:200]
+    if isinstance(answer, (int, float, bool, type(None))):
+        return answer
+    return repr(answer)[:200]
+
+
+def _record_llm_stage(meta: Dict[str, Any]) -> None:
+    """Feed the latency of a completed LLM call into the scheduler history."""
+    if meta.get("latency") is not None:
+        stage_history.record(llm_stage(meta.get("tier")), meta["latency"])
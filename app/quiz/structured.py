@@ -0,0 +1,233 @@
+"""Structured answer protocol: JSON replies, typed coercion and local repair."""
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Tuple
+from app.utils.logger import get_logger
+
+logger = get_logger("structured")
+
+NUMBER = "number"
+BOOLEAN = "boolean"
+STRING = "string"
+JSON = "json"
+TYPES = (NUMBER, BOOLEAN, STRING, JSON)
+
+STRUCTURED_INSTRUCTIONS = (
+    "Analyze the data and answer the question. Reply with a single JSON object "
+    'and nothing else: {"answer": <value>, "type": "number" | "boolean" | "string" | "json", '
+    '"confidence": <0.0-1.0>}. Numbers must be JSON numbers without units or '
+    "thousands separators, booleans must be true or false, and JSON answers must be "
+    "the object or array itself, not a string."
+)
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_NUMBER_RE = re.compile(r"^[-+]?\d+(\.\d+)?([eE][-+]?\d+)?$")
+_NUMBER_IN_TEXT_RE = re.compile(r"[-+]?\d[\d,]*(\.\d+)?")
+
+_TYPE_HINTS = (
+    (BOOLEAN, re.compile(r"\b(true or false|yes or no|true/false|yes/no|boolean)\b")),
+    (JSON, re.compile(r"\b(json|array|as a list|object with)\b")),
+    (NUMBER, re.compile(r"\b(how many|how much|number of|count|sum|total|average|mean|median|"
+                        r"maximum|minimum|max|min|percentage|ratio|calculate|compute)\b")),
+)
+# "Which city has the maximum population?" names an entity; the aggregate is only the criterion
+_ENTITY_QUESTION_RE = re.compile(r"^\W*(which|who|whose|where)\b|\b(name of|which (one|row|item|column))\b")
+
+
+class StructuredAnswerError(ValueError):
+    """Raised when a reply cannot be coerced to the required type.
+    
+    `value` holds the answer unwrapped from the reply's envelope, if any, so
+    that callers falling back to loose parsing do not submit the envelope.
+    """
+
+    def __init__(self, message: str, value: Any = None):
+        super().__init__(message)
+        self.value = value
+
+
+@dataclass
+class StructuredAnswer:
+    """Validated answer with its type and the model's confidence."""
+    answer: Any
+    type: str
+    confidence: float
+    repaired: bool = False
+
+
+def expected_type(question: str) -> str | None:
+    """Infer the answer type a question asks for, or None if unclear."""
+    text = (question or "").lower()
+    for answer_type, pattern in _TYPE_HINTS:
+        if answer_type == NUMBER and _ENTITY_QUESTION_RE.search(text):
+            continue
+        if pattern.search(text):
+            return answer_type
+    return None
+
+
+def strip_fences(text: str) -> str:
+    """Remove surrounding Markdown code fences."""
+    return _FENCE_RE.sub("", text.strip()).strip()
+
+
+def repair_json(text: str) -> Any:
+    """Best-effort parse of almost-JSON model output.
+    
+    Handles code fences, surrounding prose, single quotes, trailing commas
+    and Python literals. Raises ValueError if nothing parses.
+    """
+    text = strip_fences(text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("no JSON object found")
+    cand = text[start:end + 1]
+    cand = re.sub(r",\s*([}\]])", r"\1", cand)
+    cand = re.sub(r"\bTrue\b", "true", cand)
+    cand = re.sub(r"\bFalse\b", "false", cand)
+    cand = re.sub(r"\bNone\b", "null", cand)
+    try:
+        return json.loads(cand)
+    except ValueError:
+        return json.loads(cand.replace("'", '"'))
+
+
+def coerce(value: Any, answer_type: str) -> Any:
+    """Strictly convert `value` to `answer_type`.
+    
+    Args:
+        value: Raw answer value from the model
+        answer_type: One of number, boolean, string, json
+        
+    Returns:
+        Converted value (integral numbers become int)
+        
+    Raises:
+        StructuredAnswerError: If the value cannot represent that type
+    """
+    if answer_type == NUMBER:
+        if isinstance(value, bool):
+            raise StructuredAnswerError(f"boolean is not a number: {value!r}")
+        if isinstance(value, (int, float)):
+            num = value
+        else:
+            text = strip_fences(str(value)).strip().rstrip("%")
+            text = re.sub(r"^[$€£₹]|,(?=\d{3}\b)", "", text).strip()
+            if not _NUMBER_RE.match(text):
+                raise StructuredAnswerError(f"not a number: {value!r}")
+            num = float(text)
+        return int(num) if float(num).is_integer() else num
+    if answer_type == BOOLEAN:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in ("true", "yes", "1"):
+            return True
+        if text in ("false", "no", "0"):
+            return False
+        raise StructuredAnswerError(f"not a boolean: {value!r}")
+    if answer_type == JSON:
+        if isinstance(value, (dict, list)):
+            return value
+        try:
+            parsed = json.loads(strip_fences(str(value)))
+        except ValueError:
+            raise StructuredAnswerError(f"not JSON: {value!r}")
+        if not isinstance(parsed, (dict, list)):
+            raise StructuredAnswerError(f"not a JSON object or array: {value!r}")
+        return parsed
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value).strip()
+
+
+def _coerce_reply(value: Any, answer_type: str) -> Tuple[Any, bool]:
+    """Coerce `value`, digging a lone number out of prose for number answers.
+    
+    Returns (answer, repaired).
+    """
+    try:
+        return coerce(value, answer_type), False
+    except StructuredAnswerError:
+        if answer_type != NUMBER:
+            raise
+        # prose around a single number ("There are 12 rows.")
+        matches = [m.group(0) for m in _NUMBER_IN_TEXT_RE.finditer(str(value))]
+        if len(matches) != 1:
+            raise
+        return coerce(matches[0], NUMBER), True
+
+
+def parse_structured(text: str, question: str = "") -> StructuredAnswer:
+    """Parse and validate a structured reply.
+    
+    The type implied by the question wins over the type the model claims;
+    if the answer does not fit it, the claimed type is tried next with the
+    confidence capped at 0.5. Malformed JSON goes through `repair_json`; a
+    reply with no JSON at all is treated as a bare answer with lowered
+    confidence.
+    
+    Args:
+        text: Raw model reply
+        question: Question text used to infer the expected type
+        
+    Returns:
+        StructuredAnswer with the coerced value
+        
+    Raises:
+        StructuredAnswerError: If the value cannot be coerced to the expected type
+    """
+    repaired = False
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        repaired = True
+        try:
+            payload = repair_json(text)
+        except ValueError:
+            payload = None
+
+    if isinstance(payload, dict) and "answer" in payload:
+        value = payload["answer"]
+        claimed = payload.get("type") if payload.get("type") in TYPES else None
+        try:
+            confidence = min(1.0, max(0.0, float(payload.get("confidence", 0.8))))
+        except (TypeError, ValueError):
+            confidence = 0.5
+    else:
+        # no envelope: the whole reply is the answer
+        value = strip_fences(text)
+        claimed = None
+        confidence = 0.5
+        repaired = True
+
+    answer_type = expected_type(question) or claimed
+    if answer_type is None:
+        answer_type = JSON if isinstance(value, (dict, list)) else (
+            BOOLEAN if isinstance(value, bool) else NUMBER if isinstance(value, (int, float)) else STRING)
+        if answer_type == STRING:
+            try:
+                return StructuredAnswer(coerce(value, NUMBER), NUMBER, confidence, repaired)
+            except StructuredAnswerError:
+                pass
+
+    try:
+        answer, fixed = _coerce_reply(value, answer_type)
+    except StructuredAnswerError as e:
+        if claimed is None or claimed == answer_type:
+            raise StructuredAnswerError(str(e), value=value) from e
+        try:
+            answer, fixed = _coerce_reply(value, claimed)
+        except StructuredAnswerError:
+            raise StructuredAnswerError(str(e), value=value) from e
+        logger.info("Answer does not fit the question's %s type, using the claimed %s", answer_type, claimed)
+        answer_type, confidence = claimed, min(confidence, 0.5)
+    repaired = repaired or fixed
+    if repaired:
+        logger.info("Repaired malformed structured reply into %s answer", answer_type)
+    return StructuredAnswer(answer, answer_type, confidence, repaired)
@@ -3,11 +3,15 @@ import requests
 from typing import Any, Dict
 from app.utils.logger import get_logger
 from app.utils.config import settings
+from app.utils.deadline import Deadline, DeadlineExceeded, call_timeout
+from app.utils.http import get_session
+from app.utils import tracing
 
 logger = get_logger("submitter")
 
 
-def submit_answer(submit_url: str, answer: Any, email: str, secret: str = None, original_url: str = None) -> Dict[str, Any]:
+def submit_answer(submit_url: str, answer: Any, email: str, secret: str = None, original_url: str = None,
+                  deadline: Deadline | None = None) -> Dict[str, Any]:
     """Submit answer to quiz endpoint.
     
     Args:
@@ -16,13 +20,17 @@ def submit_answer(submit_url: str, answer: Any, email: str, secret: str = None,
         email: User email
         secret: Secret token (required by some endpoints)
         original_url: Original quiz URL (required by some endpoints)
+        deadline: Solve deadline; submit may use the whole remaining budget
         
     Returns:
         Response JSON
         
     Raises:
-        requests.HTTPError: If submission fails
+        DeadlineExceeded: If the solve budget runs out before or during the submit
     """
+    # the reserve exists for this call, so it is not held back here
+    timeout = call_timeout(deadline, settings.REQUEST_TIMEOUT, "submit", reserve=0)
+    
     # Build payload according to demo spec
     payload = {
         "email": email,
@@ -38,46 +46,51 @@ def submit_answer(submit_url: str, answer: Any, email: str, secret: str = None,
         payload["url"] = original_url
     
     logger.info("Submitting answer to %s", submit_url)
-    logger.info("Payload: %s", {**payload, "answer": str(payload["answer"])[:100]})
+    logger.debug("Payload: %s", {**payload, "answer": str(payload["answer"])[:100]})
     
-    try:
-        response = requests.post(
-            submit_url,
-            json=payload,
-            timeout=settings.REQUEST_TIMEOUT
-        )
-        
-        response.raise_for_status()
-        
+    with tracing.span("submit_answer", url=submit_url, answer_chars=len(str(answer))) as span:
         try:
-            result = response.json()
-        except ValueError:
-            # Handle non-JSON responses
-            logger.warning("Non-JSON response from submit endpoint")
-            result = {
-                "status": "success",
-                "answer": answer,
-                "raw_response": response.text[:500]
-            }
+            response = get_session().post(
+                submit_url,
+                json=payload,
+                timeout=timeout
+            )
+            span.set(http_status=response.status_code, bytes=len(response.content))
+            response.raise_for_status()
+            
+            try:
+                result = response.json()
+            except ValueError:
+                # Handle non-JSON responses
+                logger.warning("Non-JSON response from submit endpoint")
+                result = {
+                    "status": "success",
+                    "answer": answer,
+                    "raw_response": response.text[:500]
+                }
+            
+            # Special handling for httpbin.org (test endpoint that echoes data)
+            if "httpbin.org" in submit_url and "json" in result:
+                logger.info("httpbin.org detected - treating as success")
+                result = {
+                    "status": "success",
+                    "correct": True,
+                    "answer": answer,
+                    "httpbin_response": result
+                }
+            
+            logger.info("Submit response: %s", result)
+            span.set(correct=bool(result.get("correct")))
+            return result
         
-        # Special handling for httpbin.org (test endpoint that echoes data)
-        if "httpbin.org" in submit_url and "json" in result:
-            logger.info("httpbin.org detected - treating as success")
-            result = {
-                "status": "success",
-                "correct": True,
-                "answer": answer,
-                "httpbin_response": result
+        except requests.exceptions.RequestException as e:
+            if isinstance(e, requests.exceptions.Timeout) and deadline is not None and deadline.expired():
+                raise DeadlineExceeded("submit", deadline.remaining()) from e
+            logger.error("Submit failed: %s", e)
+            span.set(error=str(e)[:300])
+            # Return a default response instead of crashing
+            return {
+                "status": "error",
+                "message": str(e),
+                "answer": answer
             }
-        
-        logger.info("Submit response: %s", result)
-        return result
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Submit failed: {e}")
-        # Return a default response instead of crashing
-        return {
-            "status": "error",
-            "message": str(e),
-            "answer": answer
-        }
@@ -0,0 +1,180 @@
+"""Persistent solve telemetry with latency percentiles over time windows."""
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence
+from urllib.parse import urlparse
+from app.quiz.trace import ChainTrace
+from app.utils.config import settings
+from app.utils.db import connect
+from app.utils.logger import get_logger
+
+logger = get_logger("telemetry")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    ts REAL NOT NULL,
+    chain_id TEXT NOT NULL,
+    host TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    provider TEXT,
+    model TEXT,
+    tier TEXT,
+    prompt_tokens INTEGER,
+    attempts INTEGER NOT NULL,
+    correct INTEGER,
+    status TEXT NOT NULL,
+    memo_hit INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS steps_ts ON steps (ts);
+CREATE TABLE IF NOT EXISTS stage_timings (
+    ts REAL NOT NULL,
+    host TEXT NOT NULL,
+    provider TEXT,
+    model TEXT,
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stage_timings_ts ON stage_timings (ts);
+"""
+
+# Writes between retention sweeps
+_PRUNE_EVERY = 500
+
+
+class TelemetryStore:
+    """Per-step performance rows of finished chains, written by a background thread.
+
+    `record_chain` only turns the trace into rows and queues them, so the
+    solve never waits on SQLite. Rows older than the retention period are
+    swept periodically.
+    """
+
+    def __init__(self, path: str, retention_days: float = 7):
+        self.path = path
+        self.retention = retention_days * 86400
+        self._conn = connect(path)
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._writes = 0
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+        threading.Thread(target=self._write_loop, name="telemetry", daemon=True).start()
+
+    def record_chain(self, trace: ChainTrace) -> None:
+        """Queue one row per step of a finished chain, plus its stage timings."""
+        steps, stages = [], []
+        for step in trace.steps:
+            host = urlparse(step.url).netloc or "local"
+            steps.append((
+                step.started_at, trace.chain_id, host, step.depth, step.provider, step.model, step.tier,
+                step.prompt_tokens, step.attempts, None if step.correct is None else int(step.correct),
+                step.status, int(step.memo_hit), round(sum(step.stages.values()), 4),
+            ))
+            stages.extend((step.started_at, host, step.provider, step.model, name, seconds)
+                          for name, seconds in step.stages.items())
+        self._queue.put((steps, stages))
+
+    def flush(self) -> None:
+        """Block until every queued chain has been written."""
+        self._queue.join()
+
+    def stats(self, windows: Sequence[float], now: float | None = None) -> List[Dict[str, Any]]:
+        """Latency percentiles per stage, provider and host for each trailing window.
+
+        Args:
+            windows: Window lengths in seconds, e.g. (300, 3600, 86400)
+            now: End of the windows (defaults to the current time)
+
+        Returns:
+            One entry per window with step counts, the correct rate, retries and
+            count/p50/p95/p99 seconds keyed by stage, by LLM provider/model
+            (LLM stage only) and by quiz host (whole step)
+        """
+        now = time.time() if now is None else now
+        report = []
+        for window in windows:
+            since = now - window
+            with self._lock:
+                stage_rows = self._conn.execute(
+                    "SELECT stage, provider, model, seconds FROM stage_timings WHERE ts >= ? AND ts <= ?",
+                    (since, now),
+                ).fetchall()
+                step_rows = self._conn.execute(
+                    "SELECT host, attempts, correct, seconds FROM steps WHERE ts >= ? AND ts <= ?",
+                    (since, now),
+                ).fetchall()
+            by_stage, by_provider, by_host = defaultdict(list), defaultdict(list), defaultdict(list)
+            for row in stage_rows:
+                by_stage[row["stage"]].append(row["seconds"])
+                if row["stage"] == "llm" and row["provider"]:
+                    by_provider[f"{row['provider']}/{row['model']}"].append(row["seconds"])
+            for row in step_rows:
+                by_host[row["host"]].append(row["seconds"])
+            judged = [row["correct"] for row in step_rows if row["correct"] is not None]
+            report.append({
+                "window_seconds": window,
+                "steps": len(step_rows),
+                "correct_rate": round(sum(judged) / len(judged), 3) if judged else None,
+                "retries": sum(max(0, row["attempts"] - 1) for row in step_rows),
+                "stages": _summarize(by_stage),
+                "providers": _summarize(by_provider),
+                "hosts": _summarize(by_host),
+            })
+        return report
+
+    def _write_loop(self) -> None:
+        while True:
+            steps, stages = self._queue.get()
+            try:
+                with self._lock, self._conn:
+                    self._conn.executemany("INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", steps)
+                    self._conn.executemany("INSERT INTO stage_timings VALUES (?, ?, ?, ?, ?, ?)", stages)
+                    self._writes += 1
+                    if self._writes % _PRUNE_EVERY == 0:
+                        cutoff = time.time() - self.retention
+                        self._conn.execute("DELETE FROM steps WHERE ts < ?", (cutoff,))
+                        self._conn.execute("DELETE FROM stage_timings WHERE ts < ?", (cutoff,))
+            except sqlite3.Error as e:
+                logger.warning("Dropping telemetry for %d steps: %s", len(steps), e)
+            finally:
+                self._queue.task_done()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def _summarize(groups: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for key, values in sorted(groups.items()):
+        values.sort()
+        summary[key] = {
+            "count": len(values),
+            "p50": round(_percentile(values, 50), 3),
+            "p95": round(_percentile(values, 95), 3),
+            "p99": round(_percentile(values, 99), 3),
+        }
+    return summary
+
+
+_store: TelemetryStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_telemetry_store() -> TelemetryStore | None:
+    """Return the shared telemetry store, or None if telemetry is off or unavailable."""
+    global _store
+    if not settings.TELEMETRY_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = TelemetryStore(settings.TELEMETRY_DB, settings.TELEMETRY_RETENTION_DAYS)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Telemetry store unavailable at %s: %s", settings.TELEMETRY_DB, e)
+                return None
+        return _store
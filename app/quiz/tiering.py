@@ -0,0 +1,107 @@
+"""Model tiering: try a fast model first and escalate to the strong one."""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("tiering")
+
+FAST = "fast"
+STRONG = "strong"
+TIERS = (FAST, STRONG)
+
+
+def question_fingerprint(question: str) -> str:
+    """Return a stable hash of a question, ignoring case and whitespace."""
+    normalized = re.sub(r"\s+", " ", question or "").strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class TierStats:
+    """Latency and accuracy counters for one tier."""
+    calls: int = 0
+    total_latency: float = 0.0
+    graded: int = 0
+    correct: int = 0
+    escalations: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "avg_latency": round(self.total_latency / self.calls, 3) if self.calls else None,
+            "graded": self.graded,
+            "accuracy": round(self.correct / self.graded, 3) if self.graded else None,
+            "escalations": self.escalations,
+        }
+
+
+class TierTracker:
+    """Chooses a tier per attempt and remembers questions the fast tier got wrong."""
+
+    def __init__(self, max_questions: int = 1000):
+        self.max_questions = max_questions
+        self._stats: Dict[str, TierStats] = {tier: TierStats() for tier in TIERS}
+        self._needs_strong: "OrderedDict[str, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def choose(self, question: str, attempt: int = 0) -> str:
+        """Pick the tier for `attempt` (0 = first try) of `question`.
+        
+        Args:
+            question: Original question text
+            attempt: Zero-based attempt number
+            
+        Returns:
+            FAST or STRONG
+        """
+        if not settings.LLM_TIERING_ENABLED or attempt > 0:
+            return STRONG
+        with self._lock:
+            if question_fingerprint(question) in self._needs_strong:
+                logger.info("Question historically needs the strong model")
+                return STRONG
+        return FAST
+
+    def should_escalate(self, tier: str, confidence: float | None) -> bool:
+        """Return True if a `tier` answer with `confidence` should be re-asked on STRONG."""
+        if tier != FAST or confidence is None:
+            return False
+        return confidence < settings.LLM_ESCALATE_CONFIDENCE
+
+    def record_call(self, tier: str, latency: float) -> None:
+        """Record the latency of one completed call on `tier`."""
+        with self._lock:
+            stats = self._stats.setdefault(tier, TierStats())
+            stats.calls += 1
+            stats.total_latency += latency
+
+    def record_escalation(self, tier: str) -> None:
+        """Count an answer from `tier` that was escalated before submission."""
+        with self._lock:
+            self._stats.setdefault(tier, TierStats()).escalations += 1
+
+    def record_outcome(self, question: str, tier: str, correct: bool) -> None:
+        """Record a graded answer; fast-tier misses mark the question for STRONG."""
+        fingerprint = question_fingerprint(question)
+        with self._lock:
+            stats = self._stats.setdefault(tier, TierStats())
+            stats.graded += 1
+            stats.correct += int(correct)
+            if tier == FAST and not correct:
+                self._needs_strong[fingerprint] = True
+                self._needs_strong.move_to_end(fingerprint)
+                while len(self._needs_strong) > self.max_questions:
+                    self._needs_strong.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return JSON-serializable per-tier stats."""
+        with self._lock:
+            return {tier: stats.as_dict() for tier, stats in self._stats.items()}
+
+
+tier_tracker = TierTracker()
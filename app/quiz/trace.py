@@ -0,0 +1,162 @@
+"""Structured per-step trace of a quiz chain, with a live event feed."""
+import asyncio
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Tuple
+from app.utils.config import settings
+from app.utils import metrics
+
+
+@dataclass
+class StepTrace:
+    """One state transition of a chain: fetch, extract, answer, submit."""
+    url: str
+    depth: int
+    started_at: float = field(default_factory=time.time)
+    stages: Dict[str, float] = field(default_factory=dict)
+    question: str | None = None
+    files: int = 0
+    attempts: int = 0
+    memo_hit: bool = False
+    provider: str | None = None
+    model: str | None = None
+    tier: str | None = None
+    prompt_tokens: int | None = None
+    answer: Any = None
+    correct: bool | None = None
+    status: str = "running"
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block and record it under `name` and in the stage histogram."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed, 4)
+            metrics.stage_seconds.observe(elapsed, stage=name)
+
+    def emit(self, kind: str, **data: Any) -> None:
+        """Publish a progress event for this step on its chain's feed."""
+        chain = getattr(self, "chain", None)
+        if chain is not None:
+            chain.emit(kind, depth=self.depth, **data)
+
+
+@dataclass
+class ChainTrace:
+    """Every step of one solve, from the start URL to the final result."""
+    start_url: str
+    email: str
+    chain_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started_at: float = field(default_factory=time.time)
+    steps: List[StepTrace] = field(default_factory=list)
+    status: str = "running"
+    elapsed: float | None = None
+    resumed_at: int | None = None
+
+    def __post_init__(self):
+        # progress events and their live subscribers (not part of to_dict)
+        self.events: List[Dict[str, Any]] = []
+        self._listeners: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._events_lock = threading.Lock()
+
+    def start_step(self, url: str, depth: int) -> StepTrace:
+        """Append and return a new step."""
+        step = StepTrace(url=url, depth=depth)
+        step.chain = self
+        self.steps.append(step)
+        return step
+
+    def emit(self, kind: str, **data: Any) -> None:
+        """Record a progress event and push it to live subscribers.
+        
+        Safe to call from worker threads; with no subscribers it is a list
+        append.
+        """
+        with self._events_lock:
+            event = {"seq": len(self.events), "type": kind, "time": round(time.time(), 3), **data}
+            self.events.append(event)
+            listeners = list(self._listeners)
+        for loop, queue in listeners:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+    def subscribe(self) -> Tuple[List[Dict[str, Any]], asyncio.Queue]:
+        """Return the events so far and a queue receiving every later one.
+        
+        Must be called from the subscriber's event loop.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._events_lock:
+            self._listeners.append((asyncio.get_running_loop(), queue))
+            return list(self.events), queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Stop pushing events to `queue`."""
+        with self._events_lock:
+            self._listeners = [(loop, q) for loop, q in self._listeners if q is not queue]
+
+    def finish(self, result: Dict[str, Any]) -> None:
+        """Close the chain with its final result and keep it in the recent list."""
+        if result.get("correct"):
+            self.status = "correct"
+        else:
+            self.status = str(result.get("status") or "incorrect")
+        self.elapsed = round(time.time() - self.started_at, 3)
+        with _lock:
+            _active.pop(self.chain_id, None)
+            _recent.append(self)
+        self.emit("chain_finished", status=self.status, elapsed=self.elapsed, steps=len(self.steps))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form of the trace."""
+        data = asdict(self)
+        for step in data["steps"]:
+            if step["question"]:
+                step["question"] = step["question"][:100]
+            if not isinstance(step["answer"], (str, int, float, bool, type(None))):
+                step["answer"] = repr(step["answer"])[:200]
+        return data
+
+
+_recent: Deque[ChainTrace] = deque(maxlen=settings.CHAIN_TRACE_HISTORY)
+_active: Dict[str, ChainTrace] = {}
+_lock = threading.Lock()
+
+
+def register_active(trace: ChainTrace) -> None:
+    """Make a running chain findable by id and by (email, start URL)."""
+    with _lock:
+        _active[trace.chain_id] = trace
+
+
+def find_trace(chain_id: str | None = None, email: str | None = None,
+               start_url: str | None = None) -> ChainTrace | None:
+    """Return a running or recently finished chain by id or by (email, start URL).
+    
+    Running chains win over finished ones, and newer over older.
+    """
+    with _lock:
+        candidates = list(_active.values()) + list(reversed(_recent))
+    for trace in candidates:
+        if chain_id is not None:
+            if trace.chain_id == chain_id:
+                return trace
+        elif trace.email == email and trace.start_url == start_url:
+            return trace
+    return None
+
+
+def recent_traces(limit: int | None = None) -> List[Dict[str, Any]]:
+    """Return the most recent finished chain traces, newest first."""
+    with _lock:
+        traces = list(reversed(_recent))
+    return [t.to_dict() for t in traces[:limit]]
@@ -0,0 +1,213 @@
+"""Admission control: bounded concurrent solves with a bounded wait queue."""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS, HTTP_503_SERVICE_UNAVAILABLE
+from app.utils.config import settings
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+logger = get_logger("admission")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a solve cannot be admitted; carries the HTTP response to send."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limits concurrent solves, queues a bounded number and sheds the rest.
+
+    A solve runs at once if a slot is free and nobody is waiting. Otherwise
+    it waits in the priority or normal FIFO lane, up to `queue_timeout`
+    seconds (the queue-time SLO). Callers over their per-key limit get 429;
+    a full queue or an SLO miss gets 503. Both carry a Retry-After estimated
+    from recent solve durations.
+
+    Batch chains and background jobs have no client waiting on the queue,
+    so they use the backlog lane instead: served only after both others, it
+    has no per-key limit, queue bound or timeout, and does not count toward
+    the queue that sheds interactive requests.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, per_key_limit: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_key_limit = per_key_limit
+        self.active = 0
+        self._lanes: Dict[str, Deque[asyncio.Future]] = {"priority": deque(), "normal": deque(), "backlog": deque()}
+        self._per_key: Dict[str, int] = {}
+        self._waits: Deque[float] = deque(maxlen=200)
+        self._hold_ewma: float | None = None
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"key_limit": 0, "queue_full": 0, "queue_timeout": 0}
+
+    @property
+    def queued(self) -> int:
+        """Solves waiting for a slot."""
+        return sum(len(lane) for lane in self._lanes.values())
+
+    @property
+    def _interactive_queued(self) -> int:
+        """Solves waiting in the priority and normal lanes."""
+        return len(self._lanes["priority"]) + len(self._lanes["normal"])
+
+    def saturated(self) -> bool:
+        """True if a new solve would be rejected for a full queue."""
+        return self.active >= self.max_concurrent and self._interactive_queued >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from recent solve durations."""
+        hold = self._hold_ewma or settings.ADMISSION_DEFAULT_SOLVE_SECONDS
+        return max(1, math.ceil(hold * (self._interactive_queued + 1) / max(1, self.max_concurrent)))
+
+    @asynccontextmanager
+    async def slot(self, key: str, priority: bool = False, backlog: bool = False) -> AsyncIterator[None]:
+        """Hold a solve slot for the enclosed block.
+
+        Args:
+            key: Caller identity for the per-key limit (e.g. email)
+            priority: Wait in the priority lane
+            backlog: Wait in the backlog lane for as long as it takes
+
+        Raises:
+            AdmissionRejected: If the caller is over its limit, the queue is
+                full or the wait exceeded the queue-time SLO (never for backlog)
+        """
+        if backlog:
+            await self._acquire_backlog()
+        else:
+            await self._acquire(key, priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(None if backlog else key, time.monotonic() - start)
+
+    async def _acquire_backlog(self) -> None:
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+            self._waits.append(0.0)
+            self.admitted += 1
+            return
+        lane = self._lanes["backlog"]
+        waiter = asyncio.get_running_loop().create_future()
+        lane.append(waiter)
+        start = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter in lane:
+                lane.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.active -= 1
+                self._wake()
+            raise
+        self._waits.append(time.monotonic() - start)
+        self.admitted += 1
+
+    async def _acquire(self, key: str, priority: bool) -> None:
+        if self._per_key.get(key, 0) >= self.per_key_limit:
+            self._reject("key_limit", HTTP_429_TOO_MANY_REQUESTS, f"too many concurrent solves for {key}")
+        if self.active < self.max_concurrent and not self.queued:
+            self._admit(key, 0.0)
+            return
+        if self._interactive_queued >= self.max_queue:
+            self._reject("queue_full", HTTP_503_SERVICE_UNAVAILABLE, "solve queue full")
+
+        lane = self._lanes["priority" if priority else "normal"]
+        waiter = asyncio.get_running_loop().create_future()
+        lane.append(waiter)
+        self._per_key[key] = self._per_key.get(key, 0) + 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            self._per_key[key] -= 1
+            if waiter in lane:
+                lane.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                # a slot was handed over just as we gave up: pass it on
+                self.active -= 1
+                self._wake()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("queue_timeout", HTTP_503_SERVICE_UNAVAILABLE,
+                         f"no solve slot within {self.queue_timeout:.0f}s")
+        self._per_key[key] -= 1
+        self._admit(key, time.monotonic() - start, counted=True)
+
+    def _admit(self, key: str, waited: float, counted: bool = False) -> None:
+        if not counted:
+            self.active += 1
+        self._per_key[key] = self._per_key.get(key, 0) + 1
+        self._waits.append(waited)
+        self.admitted += 1
+
+    def _release(self, key: str | None, held: float) -> None:
+        if key is not None:
+            self._per_key[key] -= 1
+            if not self._per_key[key]:
+                del self._per_key[key]
+        self._hold_ewma = held if self._hold_ewma is None else 0.8 * self._hold_ewma + 0.2 * held
+        self.active -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters, priority lane first and backlog last."""
+        for lane in self._lanes.values():
+            while lane and self.active < self.max_concurrent:
+                waiter = lane.popleft()
+                if not waiter.done():
+                    # the slot is taken on the waiter's behalf
+                    self.active += 1
+                    waiter.set_result(None)
+
+    def _reject(self, reason: str, status_code: int, message: str) -> None:
+        self.rejected[reason] += 1
+        retry_after = self.retry_after()
+        logger.warning("Rejecting solve (%s): %s, retry after %ds", reason, message, retry_after)
+        raise AdmissionRejected(status_code, message, retry_after)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Slots, queue depth per lane, queue-time percentiles and outcome counts."""
+        waits = sorted(self._waits)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "queued": {name: len(lane) for name, lane in self._lanes.items()},
+            "queue_wait_p50": round(_percentile(waits, 50), 3),
+            "queue_wait_p95": round(_percentile(waits, 95), 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "retry_after": self.retry_after(),
+        }
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+admission = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENT,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT,
+    settings.ADMISSION_PER_KEY_LIMIT,
+)
+
+metrics.registry.register(metrics.Gauge(
+    "quiz_admission_slots", "Solve slots in use (active), waiting solves (queued) and the slot limit.", ["state"],
+    function=lambda: {("active",): admission.active, ("queued",): admission.queued,
+                      ("limit",): admission.max_concurrent},
+))
@@ -0,0 +1,107 @@
+"""Coalescing of identical concurrent solve requests."""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("coalesce")
+
+
+@dataclass
+class _Entry:
+    task: asyncio.Task
+    finished_at: float | None = None
+    waiters: int = 0
+
+
+class SolveCoalescer:
+    """Shares one solve between every caller with the same key.
+
+    A caller whose key matches a solve still in flight awaits that solve's
+    outcome (result or exception) instead of starting its own; a solve that
+    succeeded less than `window` seconds ago is reused the same way. The shared solve is shielded, so
+    a caller that disconnects does not cancel it for the others; once the
+    last caller waiting on it is cancelled, the solve is cancelled too.
+    """
+
+    def __init__(self, window: float, enabled: bool = True):
+        self.window = window
+        self.enabled = enabled
+        self._entries: Dict[Hashable, _Entry] = {}
+        self.leaders = 0
+        self.joined_inflight = 0
+        self.joined_recent = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return the outcome of the solve for `key`, starting it if needed.
+
+        Args:
+            key: Identity of the solve, e.g. (email, url)
+            factory: Coroutine factory that performs the solve
+
+        Returns:
+            The shared solve's result
+        """
+        if not self.enabled:
+            return await factory()
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        self._evict(now)
+        entry = self._entries.get(key)
+        if entry is not None and entry.task.get_loop() is loop:
+            if entry.finished_at is None:
+                self.joined_inflight += 1
+                logger.info("Joining in-flight solve for %s", key)
+            else:
+                self.joined_recent += 1
+                logger.info("Reusing solve for %s finished %.1fs ago", key, now - entry.finished_at)
+            return await self._wait(key, entry)
+
+        entry = _Entry(loop.create_task(factory()))
+        entry.task.add_done_callback(lambda task: self._finished(key, entry, task))
+        self._entries[key] = entry
+        self.leaders += 1
+        return await self._wait(key, entry)
+
+    async def _wait(self, key: Hashable, entry: _Entry) -> Dict[str, Any]:
+        """Await the shared solve, cancelling it if this was its last waiter."""
+        entry.waiters += 1
+        try:
+            return await asyncio.shield(entry.task)
+        except asyncio.CancelledError:
+            if entry.waiters == 1 and not entry.task.done():
+                logger.info("Every caller of the solve for %s went away; cancelling it", key)
+                entry.task.cancel()
+            raise
+        finally:
+            entry.waiters -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counts of started solves and of callers that joined one."""
+        return {
+            "enabled": self.enabled,
+            "window_seconds": self.window,
+            "inflight": sum(1 for e in self._entries.values() if e.finished_at is None),
+            "leaders": self.leaders,
+            "joined_inflight": self.joined_inflight,
+            "joined_recent": self.joined_recent,
+        }
+
+    def _finished(self, key: Hashable, entry: _Entry, task: asyncio.Task) -> None:
+        entry.finished_at = time.monotonic()
+        # only results are reused after the fact; a failed or rejected
+        # solve is shared with callers already waiting, then forgotten
+        if task.cancelled() or task.exception() is not None:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def _evict(self, now: float) -> None:
+        """Drop solves that finished longer than the window ago."""
+        stale = [k for k, e in self._entries.items() if e.finished_at is not None and now - e.finished_at > self.window]
+        for key in stale:
+            del self._entries[key]
+
+
+solve_coalescer = SolveCoalescer(settings.COALESCE_WINDOW_SECONDS, settings.COALESCE_ENABLED)
@@ -0,0 +1,167 @@
+"""Background solve jobs for `POST /solving?mode=async`."""
+import asyncio
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Set
+from app.utils.config import settings
+from app.utils.http import get_session
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+logger = get_logger("jobs")
+
+# Job fields only the submitter (and its webhook) may see
+_PRIVATE_FIELDS = ("email", "callback_url")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """One background solve and its outcome."""
+    email: str
+    url: str
+    callback_url: str | None = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: Dict[str, Any] | None = None
+    error: str | None = None
+    webhook_status: str | None = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form of the job, as POSTed to its callback URL."""
+        return asdict(self)
+
+    def public_dict(self) -> Dict[str, Any]:
+        """`to_dict` without the submitter's email and callback URL, for anyone holding the job id."""
+        return {k: v for k, v in self.to_dict().items() if k not in _PRIVATE_FIELDS}
+
+
+class JobManager:
+    """Runs solve jobs on the event loop with at most `workers` in flight.
+
+    Jobs beyond the worker count wait in a FIFO queue of at most
+    `max_pending` entries. The process-wide manager caps its workers at
+    ADMISSION_MAX_CONCURRENT, so a running job is at most briefly queued
+    for a solve slot, and jobs still waiting show as `queued`. Finished jobs are kept for `ttl` seconds so
+    clients can poll for their result.
+    """
+
+    def __init__(self, workers: int, max_pending: int, ttl: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Deque[tuple] = deque()
+        self._tasks: Set[asyncio.Task] = set()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        """Jobs queued or running."""
+        return len(self._queue) + self.running
+
+    def submit(self, email: str, url: str, runner: Callable[[], Awaitable[Dict[str, Any]]],
+               callback_url: str | None = None) -> Job | None:
+        """Queue a job; must be called from the event loop.
+
+        Args:
+            email: User email
+            url: Quiz start URL
+            runner: Coroutine factory that solves the chain
+            callback_url: URL to POST the finished job to
+
+        Returns:
+            The queued job, or None if the queue is full
+        """
+        self._evict()
+        if self.pending >= self.max_pending:
+            return None
+        job = Job(email=email, url=url, callback_url=callback_url)
+        self._jobs[job.id] = job
+        self._queue.append((job, runner))
+        self._pump()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        """Return a job by id, or None if unknown or expired."""
+        return self._jobs.get(job_id)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Worker, queue and outcome counters."""
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": len(self._queue),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retained": len(self._jobs),
+        }
+
+    def _pump(self) -> None:
+        """Start queued jobs while workers are free."""
+        while self.running < self.workers and self._queue:
+            job, runner = self._queue.popleft()
+            self.running += 1
+            task = asyncio.get_running_loop().create_task(self._run(job, runner))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job, runner: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        logger.info("Job %s started for %s", job.id, job.url)
+        try:
+            job.result = await runner()
+            job.status = DONE
+            self.completed += 1
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.status = FAILED
+            self.failed += 1
+        finally:
+            job.finished_at = time.time()
+            self.running -= 1
+            self._pump()
+        logger.info("Job %s %s in %.1fs", job.id, job.status, job.finished_at - job.started_at)
+        if job.callback_url:
+            job.webhook_status = await asyncio.to_thread(_post_webhook, job)
+
+    def _evict(self) -> None:
+        """Drop finished jobs older than the TTL."""
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+def _post_webhook(job: Job) -> str:
+    """POST the finished job to its callback URL (up to JOB_WEBHOOK_ATTEMPTS tries); return the outcome."""
+    for attempt in range(1, settings.JOB_WEBHOOK_ATTEMPTS + 1):
+        try:
+            response = get_session().post(job.callback_url, json=job.to_dict(), timeout=settings.REQUEST_TIMEOUT)
+            response.raise_for_status()
+            return "delivered"
+        except Exception as e:
+            logger.warning("Webhook for job %s failed (attempt %d): %s", job.id, attempt, e)
+    return "failed"
+
+
+job_manager = JobManager(
+    min(settings.JOB_WORKERS, settings.ADMISSION_MAX_CONCURRENT), settings.JOB_MAX_PENDING, settings.JOB_TTL_SECONDS,
+)
+
+metrics.registry.register(metrics.Gauge(
+    "quiz_jobs", "Background jobs running and queued.", ["state"],
+    function=lambda: {("running",): job_manager.running, ("queued",): job_manager.snapshot()["queued"]},
+))
@@ -1,6 +1,22 @@
 """FastAPI main application."""
-from fastapi import FastAPI
-from app.server.router import router
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_503_SERVICE_UNAVAILABLE
+from app.server.admission import admission
+from app.server.coalesce import solve_coalescer
+from app.server.jobs import job_manager
+from app.server.router import require_admin, router
+from app.quiz.breaker import breaker_status
+from app.quiz.browser import get_browser_pool
+from app.quiz.memo import memo_stats
+from app.quiz.netcapture import list_captures, load_capture
+from app.quiz.routing import provider_router
+from app.quiz.scheduler import stage_history
+from app.quiz.telemetry import get_telemetry_store
+from app.quiz.tiering import tier_tracker
+from app.quiz.trace import recent_traces
+from app.utils import metrics
+from app.utils.config import settings
 
 app = FastAPI(title="LLM Analysis Quiz Solver")
 app.include_router(router)
@@ -10,3 +26,74 @@ app.include_router(router)
 def healthz():
     """Health check endpoint."""
     return {"status": "ok"}
+
+
+@app.get("/status", dependencies=[Depends(require_admin)])
+def status():
+    """Runtime status: LLM breakers, routing, tiers, stage latency, memo, pools, jobs and admission."""
+    pool = get_browser_pool()
+    return {
+        "llm_providers": breaker_status(),
+        "llm_routes": provider_router.snapshot(),
+        "llm_tiers": tier_tracker.snapshot(),
+        "stage_latency": stage_history.snapshot(),
+        "answer_memo": memo_stats(),
+        "browser_pool": pool.snapshot() if pool else None,
+        "jobs": job_manager.snapshot(),
+        "coalescing": solve_coalescer.snapshot(),
+        "admission": admission.snapshot(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Stage latencies, fallback/cache/error counters and pool gauges in Prometheus text format."""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/stats", dependencies=[Depends(require_admin)])
+def stats(windows: str | None = None):
+    """Latency p50/p95/p99 per stage, LLM route and quiz host over trailing time windows.
+
+    Args:
+        windows: Comma-separated window lengths in seconds (defaults to
+            TELEMETRY_STATS_WINDOWS)
+
+    Raises:
+        HTTPException: 403 without the admin token, 400 for malformed windows, 503 if telemetry is off
+    """
+    store = get_telemetry_store()
+    if store is None:
+        raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail="telemetry disabled")
+    try:
+        lengths = [float(w) for w in (windows or settings.TELEMETRY_STATS_WINDOWS).split(",") if w.strip()]
+    except ValueError:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="windows must be seconds, e.g. 300,3600")
+    if not lengths or any(w <= 0 for w in lengths):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="windows must be positive")
+    return {"windows": store.stats(lengths)}
+
+
+@app.get("/chains", dependencies=[Depends(require_admin)])
+def chains(limit: int = 10):
+    """Structured traces of the most recently finished quiz chains."""
+    return {"chains": recent_traces(limit)}
+
+
+@app.get("/har", dependencies=[Depends(require_admin)])
+def har_captures(limit: int = 20):
+    """Newest network captures of slow or sampled browser fetches."""
+    return {"captures": list_captures(limit)}
+
+
+@app.get("/har/{capture_id}", dependencies=[Depends(require_admin)])
+def har_capture(capture_id: str):
+    """One network capture in HAR 1.2 form, loadable by HAR viewers.
+
+    Raises:
+        HTTPException: 403 without the admin token, 404 if the capture is unknown or was pruned
+    """
+    har = load_capture(capture_id)
+    if har is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="capture not found")
+    return har
@@ -1,20 +1,39 @@
-"""FastAPI router with /solving endpoint."""
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, HttpUrl, field_validator
-from starlette.status import HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+"""FastAPI router with /solving endpoints."""
+import asyncio
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+from typing import Any, AsyncIterator, Dict, List, Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from starlette.status import (
+    HTTP_202_ACCEPTED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_403_FORBIDDEN,
+    HTTP_404_NOT_FOUND,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
 from app.utils.config import settings
-from app.quiz.solver import solve_quiz
+from app.quiz.checkpoint import get_checkpoint_store
+from app.quiz.memo import get_answer_memo
+from app.quiz.solver import solve_chain
+from app.quiz.telemetry import get_telemetry_store
+from app.quiz.trace import ChainTrace, find_trace
+from app.server.admission import AdmissionRejected, admission
+from app.server.coalesce import solve_coalescer
+from app.server.jobs import job_manager
 from app.utils.logger import get_logger
-from typing import Any
+from app.utils.profiling import ProfileSession, load_profile, reserve_profile
 
 router = APIRouter()
 logger = get_logger("router")
 
 
-class SolveRequest(BaseModel):
-    """Request model for solving endpoint."""
+class SolveTarget(BaseModel):
+    """One quiz chain to solve: who is solving and where it starts."""
     email: str
-    secret: str
     url: str  # Accept any string to allow file:// URLs
     
     @field_validator('email')
@@ -25,14 +44,6 @@ class SolveRequest(BaseModel):
             raise ValueError("Email cannot be empty")
         return v
     
-    @field_validator('secret')
-    @classmethod
-    def validate_secret(cls, v: str) -> str:
-        """Validate secret is not empty."""
-        if not v or not v.strip():
-            raise ValueError("Secret cannot be empty")
-        return v
-    
     @field_validator('url')
     @classmethod
     def validate_url(cls, v: str) -> str:
@@ -45,31 +56,179 @@ class SolveRequest(BaseModel):
         return v
 
 
+class SolveRequest(SolveTarget):
+    """Request model for solving endpoint."""
+    secret: str
+    callback_url: str | None = None  # async mode: POST the finished job here
+    
+    @field_validator('secret')
+    @classmethod
+    def validate_secret(cls, v: str) -> str:
+        """Validate secret is not empty."""
+        if not v or not v.strip():
+            raise ValueError("Secret cannot be empty")
+        return v
+    
+    @field_validator('callback_url')
+    @classmethod
+    def validate_callback_url(cls, v: str | None) -> str | None:
+        """Validate callback URL is http(s)."""
+        if v is not None and not (v.startswith('http://') or v.startswith('https://')):
+            raise ValueError("Callback URL must start with http:// or https://")
+        return v
+
+
+class BatchSolveRequest(BaseModel):
+    """Request model for the batch solving endpoint."""
+    secret: str
+    items: List[SolveTarget]
+    parallelism: int | None = Field(default=None, ge=1)
+
+
+async def _solve(email: str, url: str, priority: bool = False,
+                 profile: ProfileSession | None = None, backlog: bool = False) -> Dict[str, Any]:
+    """Solve a chain under admission control, sharing the run with identical requests.
+    
+    A profiled solve is never shared, so the profile covers exactly one
+    chain, and sampling starts only once the solve has a slot. Backlog
+    solves wait in the admission backlog lane and are never shed.
+    
+    Raises:
+        AdmissionRejected: If no solve slot could be had
+    """
+    async def run() -> Dict[str, Any]:
+        async with admission.slot(email, priority, backlog=backlog):
+            chain = solve_chain(url, email, checkpoint=get_checkpoint_store(), memo=get_answer_memo(),
+                                telemetry=get_telemetry_store())
+            if profile is None:
+                return await chain
+            profile.start()
+            try:
+                return await chain
+            finally:
+                await asyncio.to_thread(profile.stop)
+
+    if profile is None:
+        return await solve_coalescer.run((email, url), run)
+    try:
+        return await run()
+    finally:
+        if profile.started_at is None:
+            profile.discard()
+
+
+def require_admin(x_admin_token: str | None = Header(default=None), token: str | None = None) -> None:
+    """Let a request through only with the admin token (QUIZ_SECRET when ADMIN_TOKEN is unset).
+
+    The token comes in the X-Admin-Token header, or as `?token=` for
+    clients such as EventSource that cannot set headers.
+
+    Raises:
+        HTTPException: 403 if the token is missing or wrong
+    """
+    expected = settings.ADMIN_TOKEN or settings.SECRET
+    if not hmac.compare_digest((x_admin_token or token or "").encode(), expected.encode()):
+        raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="invalid admin token")
+
+
+def _is_priority(token: str | None) -> bool:
+    """True if the request carries the configured priority-lane token."""
+    return bool(settings.ADMISSION_PRIORITY_TOKEN) and token == settings.ADMISSION_PRIORITY_TOKEN
+
+
+def _rejected(e: AdmissionRejected) -> HTTPException:
+    """HTTP error for a shed solve, telling the client when to retry."""
+    return HTTPException(status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+
 @router.post("/solving")
-def solving(req: SolveRequest):
+async def solving(req: SolveRequest, response: Response, mode: Literal["sync", "async"] = "sync",
+                  x_priority_token: str | None = Header(default=None),
+                  x_profile: str | None = Header(default=None)):
     """Endpoint to start solving a quiz at `url`.
 
-    Verifies secret and runs the solver recursively until completion.
+    Verifies secret and runs the quiz chain until completion. The chain's
+    blocking stages run in worker threads, so no thread is held between them.
+    A retry of an interrupted (email, url) session resumes from its first
+    unsolved step, and questions already answered correctly over the same
+    data are answered from the memo without an LLM call. Identical
+    (email, url) requests arriving while one is running, or within
+    COALESCE_WINDOW_SECONDS of it finishing, share its result.
+    
+    Solves are admitted up to ADMISSION_MAX_CONCURRENT at a time; the rest
+    wait in a bounded queue (a matching X-Priority-Token header selects the
+    priority lane) and are shed with 429/503 and Retry-After when over the
+    per-email limit, the queue is full or the queue-time SLO is missed.
+    
+    With `mode=async` the chain runs as a background job instead: the
+    response is 202 with a job id to poll at `GET /jobs/{id}`, and the
+    finished job is POSTed to `callback_url` when one is given. Admission
+    is checked when the job is accepted; the job then waits for its slot in
+    the backlog lane, so an accepted job is never shed.
+    
+    An `X-Profile: 1` header runs the solve under the sampling profiler and
+    tracemalloc (one profile at a time); the profile id comes back in the
+    X-Profile-Id header, or as `profile_id` in async mode.
     
     Args:
         req: Request containing email, secret, and quiz URL
+        response: Response whose headers carry the profile id
+        mode: "sync" to wait for the result, "async" to start a job
+        x_priority_token: Token selecting the priority admission lane
+        x_profile: "1" to profile this solve
         
     Returns:
-        Final quiz result JSON
+        Final quiz result JSON, or the job id and status URL in async mode
         
     Raises:
-        HTTPException: 403 if secret is invalid, 400 for bad requests, 500 for server errors
+        HTTPException: 403 if secret is invalid, 400 for bad requests, 500 for server errors,
+            429/503 with Retry-After when the solve is shed
     """
     # Check secret authentication
     if req.secret != settings.SECRET:
         logger.warning("Invalid secret for email=%s", req.email)
         raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="invalid secret")
 
+    priority = _is_priority(x_priority_token)
+    profile = None
+    if x_profile == "1":
+        profile = reserve_profile()
+        if profile is None:
+            logger.warning("Profile requested for %s but profiling is off or busy", req.url)
+    if mode == "async":
+        job = None
+        if not admission.saturated():
+            job = job_manager.submit(
+                req.email, req.url,
+                lambda: _solve(req.email, req.url, priority, profile, backlog=True),
+                callback_url=req.callback_url,
+            )
+        if job is None:
+            if profile is not None:
+                profile.discard()
+            raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail="job queue full",
+                                headers={"Retry-After": str(admission.retry_after())})
+        logger.info("Queued job %s for %s", job.id, req.url)
+        return JSONResponse(
+            status_code=HTTP_202_ACCEPTED,
+            content={
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": "/solving/events?" + urlencode({"email": req.email, "url": req.url}),
+                **({"profile_id": profile.id, "profile_url": f"/profiles/{profile.id}"} if profile else {}),
+            },
+        )
+
     try:
-        logger.info(f"Starting quiz solve for {req.url}")
-        result = solve_quiz(str(req.url), req.email)
-        logger.info(f"Quiz solve completed successfully")
+        logger.info("Starting quiz solve for %s", req.url)
+        if profile is not None:
+            response.headers["X-Profile-Id"] = profile.id
+        result = await _solve(req.email, req.url, priority, profile)
+        logger.info("Quiz solve completed successfully")
         return result
+    except AdmissionRejected as e:
+        raise _rejected(e)
     except ValueError as e:
         logger.exception("Bad request: %s", e)
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
@@ -78,6 +237,179 @@ def solving(req: SolveRequest):
         # Return more detailed error for debugging
         import traceback
         error_detail = f"internal error: {str(e)}"
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error("Traceback: %s", traceback.format_exc())
         raise HTTPException(status_code=500, detail=error_detail)
 
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and, once finished, result of a background solve job.
+    
+    The job id is the only credential, so the submitter's email and
+    callback URL are left out.
+    
+    Raises:
+        HTTPException: 404 if the job is unknown or has expired
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="job not found")
+    return job.public_dict()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str):
+    """Summary of a saved solve profile: hottest frames, top allocators and peak memory.
+    
+    Raises:
+        HTTPException: 403 without the admin token, 404 if the profile is unknown
+    """
+    summary = load_profile(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="profile not found")
+    return summary
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+def get_profile_stacks(profile_id: str):
+    """Sampled stacks of a saved profile in folded format, for flamegraph tools.
+    
+    Raises:
+        HTTPException: 403 without the admin token, 404 if the profile is unknown
+    """
+    stacks = load_profile(profile_id, folded=True)
+    if stacks is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="profile not found")
+    return PlainTextResponse(stacks)
+
+
+@router.get("/solving/events", dependencies=[Depends(require_admin)])
+async def solving_events(email: str, url: str):
+    """Server-Sent Events feed of the running (or latest) chain for (email, url).
+    
+    Raises:
+        HTTPException: 403 without the admin token, 404 if no such chain is running or recently finished
+    """
+    trace = find_trace(email=email, start_url=url)
+    if trace is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="no solve for this email and url")
+    return _event_response(trace)
+
+
+@router.get("/events/{chain_id}", dependencies=[Depends(require_admin)])
+async def chain_events(chain_id: str):
+    """Server-Sent Events feed of one chain by its trace id.
+    
+    Raises:
+        HTTPException: 403 without the admin token, 404 if the chain is unknown
+    """
+    trace = find_trace(chain_id=chain_id)
+    if trace is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="chain not found")
+    return _event_response(trace)
+
+
+def _event_response(trace: ChainTrace) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_events(trace),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_events(trace: ChainTrace) -> AsyncIterator[str]:
+    """Replay the chain's events so far, then follow it until it finishes."""
+    backlog, queue = trace.subscribe()
+    try:
+        for event in backlog:
+            yield _sse(event)
+            if event["type"] == "chain_finished":
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(event)
+            if event["type"] == "chain_finished":
+                return
+    finally:
+        trace.unsubscribe(queue)
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    """Format one event as an SSE message."""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@router.post("/solving/batch")
+async def solving_batch(req: BatchSolveRequest):
+    """Solve many (email, url) chains concurrently and stream their results.
+
+    Chains share the browser pool, HTTP connection pools, answer memo,
+    checkpoint store and LLM routing state; at most `parallelism` (capped by
+    BATCH_MAX_PARALLELISM) run at once. Chains wait for solve slots in the
+    admission backlog lane, behind interactive requests, rather than being
+    shed by the per-email limit or the queue-time SLO.
+    
+    Args:
+        req: Secret, chains to solve and optional parallelism
+        
+    Returns:
+        NDJSON stream with one line per finished chain, in completion order
+        (`index`, `email`, `url` and `result` or `error`), then a summary line
+        
+    Raises:
+        HTTPException: 403 if secret is invalid, 400 for an empty or oversized batch
+    """
+    if req.secret != settings.SECRET:
+        logger.warning("Invalid secret for batch of %d", len(req.items))
+        raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="invalid secret")
+    if not req.items or len(req.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST,
+                            detail=f"batch must have 1 to {settings.BATCH_MAX_ITEMS} items")
+
+    parallelism = min(req.parallelism or settings.BATCH_PARALLELISM, settings.BATCH_MAX_PARALLELISM)
+    logger.info("Starting batch of %d chains (parallelism=%d)", len(req.items), parallelism)
+    return StreamingResponse(_stream_batch(req.items, parallelism), media_type="application/x-ndjson")
+
+
+async def _solve_batch_item(index: int, item: SolveTarget, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Solve one chain of a batch once a parallelism slot is free."""
+    line: Dict[str, Any] = {"index": index, "email": item.email, "url": item.url}
+    async with semaphore:
+        try:
+            line["result"] = await _solve(item.email, item.url, backlog=True)
+        except Exception as e:
+            logger.exception("Batch chain %d failed: %s", index, e)
+            line["error"] = str(e)
+    return line
+
+
+async def _stream_batch(items: List[SolveTarget], parallelism: int) -> AsyncIterator[str]:
+    """Yield each chain's result line as it finishes, then a summary."""
+    start = time.monotonic()
+    semaphore = asyncio.Semaphore(parallelism)
+    tasks = [asyncio.create_task(_solve_batch_item(i, item, semaphore)) for i, item in enumerate(items)]
+    correct = errors = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            line = await finished
+            if "error" in line:
+                errors += 1
+            elif line["result"].get("correct"):
+                correct += 1
+            yield json.dumps(line, default=str) + "\n"
+        yield json.dumps({
+            "done": True,
+            "total": len(items),
+            "correct": correct,
+            "errors": errors,
+            "elapsed": round(time.monotonic() - start, 2),
+        }) + "\n"
+    finally:
+        # the client went away: stop chains that have not finished (the
+        # coalescer keeps a chain running while another request shares it)
+        for task in tasks:
+            task.cancel()
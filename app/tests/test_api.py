@@ -1,9 +1,26 @@
 """Unit tests for API endpoints."""
+import time
 import pytest
 from fastapi.testclient import TestClient
 from app.server.main import app
+from app.utils.config import settings
 
 client = TestClient(app)
+ADMIN = {"X-Admin-Token": settings.SECRET}
+
+
+@pytest.fixture
+def isolated_stores(monkeypatch, tmp_path):
+    """Keep solves off the shared on-disk stores; file outputs go to `tmp_path`."""
+    from app.utils.config import settings
+
+    monkeypatch.setattr(settings, "CHECKPOINT_ENABLED", False)
+    monkeypatch.setattr(settings, "ANSWER_MEMO_ENABLED", False)
+    monkeypatch.setattr(settings, "TELEMETRY_ENABLED", False)
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(settings, "HAR_DIR", str(tmp_path / "har"))
+    monkeypatch.setattr(settings, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    return tmp_path
 
 
 def test_healthz():
@@ -13,6 +30,29 @@ def test_healthz():
     assert response.json() == {"status": "ok"}
 
 
+def test_status_reports_breakers():
+    """Test status endpoint exposes provider breaker states."""
+    response = client.get("/status", headers=ADMIN)
+    assert response.status_code == 200
+    assert "llm_providers" in response.json()
+
+
+def test_observability_endpoints_require_admin_token(monkeypatch):
+    """Test endpoints exposing emails, answers and network data refuse requests without the admin token."""
+    paths = ["/status", "/stats", "/chains", "/har", "/har/" + "0" * 32, "/profiles/" + "0" * 32,
+             "/profiles/" + "0" * 32 + "/folded", "/events/unknown", "/solving/events?email=a@b.c&url=http://x"]
+    for path in paths:
+        assert client.get(path).status_code == 403, path
+        assert client.get(path, headers={"X-Admin-Token": "wrong"}).status_code == 403, path
+    assert client.get("/chains", headers=ADMIN).status_code == 200
+    assert client.get("/chains", params={"token": settings.SECRET}).status_code == 200
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "ops-only")
+    assert client.get("/chains", headers=ADMIN).status_code == 403
+    assert client.get("/chains", headers={"X-Admin-Token": "ops-only"}).status_code == 200
+    assert client.get("/healthz").status_code == client.get("/metrics").status_code == 200
+
+
 def test_solving_invalid_secret():
     """Test that invalid secret returns 403."""
     response = client.post(
@@ -43,3 +83,453 @@ def test_solving_invalid_url():
         }
     )
     assert response.status_code == 422
+
+
+def test_solving_batch_streams_results(monkeypatch, isolated_stores):
+    """Test batch solving bounds parallelism and streams one line per chain."""
+    import asyncio
+    import json
+    from app.server import router as router_module
+    from app.utils.config import settings
+
+    running = {"now": 0, "max": 0}
+
+    async def fake_chain(url, email, **kw):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        if url.endswith("bad"):
+            raise ValueError("Could not extract question from page")
+        return {"correct": True}
+
+    monkeypatch.setattr(router_module, "solve_chain", fake_chain)
+    items = [{"email": f"u{i}@x.y", "url": f"http://x/quiz/{i}"} for i in range(4)]
+    items.append({"email": "v@x.y", "url": "http://x/quiz/bad"})
+    response = client.post("/solving/batch", json={"secret": settings.SECRET, "items": items, "parallelism": 2})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2, 3, 4]
+    assert lines[-1]["done"] and lines[-1]["correct"] == 4 and lines[-1]["errors"] == 1
+    assert running["max"] == 2
+
+
+def test_batch_disconnect_stops_unfinished_chains(monkeypatch, isolated_stores):
+    """Test that closing a batch stream cancels a running chain nobody else shares, but not a shared one."""
+    import asyncio
+    import json
+    from app.server import router as router_module
+    from app.server.coalesce import SolveCoalescer
+
+    cancelled = []
+
+    async def fake_chain(url, email, **kw):
+        if url.endswith("fast"):
+            return {"correct": True}
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    monkeypatch.setattr(router_module, "solve_chain", fake_chain)
+    coalescer = SolveCoalescer(window=60)
+    monkeypatch.setattr(router_module, "solve_coalescer", coalescer)
+
+    async def scenario():
+        items = [router_module.SolveTarget(email="a@b.c", url=f"http://x/quiz/{name}")
+                 for name in ("fast", "alone", "shared")]
+        # another request waits on the same (email, url) as the "shared" chain
+        other = asyncio.create_task(coalescer.run(("a@b.c", "http://x/quiz/shared"),
+                                                  lambda: fake_chain("http://x/quiz/shared", "a@b.c")))
+        await asyncio.sleep(0)
+        stream = router_module._stream_batch(items, parallelism=3)
+        first = json.loads(await stream.__anext__())
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        still_running = not other.done()
+        other.cancel()
+        await asyncio.gather(other, return_exceptions=True)
+        return first, still_running
+
+    first, still_running = asyncio.run(scenario())
+    assert first["url"] == "http://x/quiz/fast"
+    assert still_running
+    assert cancelled == ["http://x/quiz/alone", "http://x/quiz/shared"]
+
+
+def test_solving_async_mode_returns_job(monkeypatch, isolated_stores):
+    """Test async mode answers 202 at once and the job result can be polled."""
+    import time
+    from app.server import router as router_module
+    from app.utils.config import settings
+
+    async def fake_chain(url, email, **kw):
+        return {"correct": True, "url": None}
+
+    monkeypatch.setattr(router_module, "solve_chain", fake_chain)
+    with TestClient(app) as session:
+        response = session.post(
+            "/solving?mode=async",
+            json={"email": "test@example.com", "secret": settings.SECRET, "url": "http://x/quiz/1"},
+        )
+        assert response.status_code == 202
+        status_url = response.json()["status_url"]
+        for _ in range(50):
+            job = session.get(status_url).json()
+            if job["status"] == "done":
+                break
+            time.sleep(0.01)
+        assert job["status"] == "done"
+        assert job["result"] == {"correct": True, "url": None}
+        assert "email" not in job and "callback_url" not in job
+        assert session.get("/jobs/unknown").status_code == 404
+
+
+def test_async_jobs_for_one_email_wait_for_admission(monkeypatch, isolated_stores):
+    """Test accepted jobs over the per-email limit and slot count queue instead of failing."""
+    import time
+    from app.server import router as router_module
+    from app.server.admission import AdmissionController
+    from app.server.jobs import JobManager
+    from app.utils.config import settings
+
+    async def fake_chain(url, email, **kw):
+        import asyncio
+        await asyncio.sleep(0.05)
+        return {"correct": True, "url": None}
+
+    monkeypatch.setattr(router_module, "solve_chain", fake_chain)
+    monkeypatch.setattr(router_module, "admission", AdmissionController(1, 1, 0.01, 1))
+    monkeypatch.setattr(router_module, "job_manager", JobManager(workers=3, max_pending=10, ttl=60))
+    with TestClient(app) as session:
+        urls = []
+        for i in range(3):
+            response = session.post(
+                "/solving?mode=async",
+                json={"email": "jobs@example.com", "secret": settings.SECRET, "url": f"http://x/quiz/{i}"},
+            )
+            assert response.status_code == 202
+            urls.append(response.json()["status_url"])
+        for _ in range(100):
+            jobs = [session.get(u).json() for u in urls]
+            if all(job["status"] in ("done", "failed") for job in jobs):
+                break
+            time.sleep(0.01)
+    assert [job["status"] for job in jobs] == ["done"] * 3
+
+
+def test_coalescer_shares_identical_solves():
+    """Test identical in-flight and just-finished solves run only once."""
+    import asyncio
+    from app.server.coalesce import SolveCoalescer
+
+    calls = []
+
+    async def solve():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"correct": True}
+
+    async def scenario():
+        coalescer = SolveCoalescer(window=60)
+        key = ("a@b.c", "http://x/quiz/1")
+        first = await asyncio.gather(*(coalescer.run(key, solve) for _ in range(3)))
+        again = await coalescer.run(key, solve)
+        other = await coalescer.run(("d@e.f", "http://x/quiz/1"), solve)
+        return first, again, other, coalescer.snapshot()
+
+    first, again, other, stats = asyncio.run(scenario())
+    assert first == [{"correct": True}] * 3 and again == other == {"correct": True}
+    assert len(calls) == 2
+    assert (stats["leaders"], stats["joined_inflight"], stats["joined_recent"]) == (2, 2, 1)
+
+
+def test_admission_queues_by_priority_and_sheds_load():
+    """Test per-key 429, full-queue 503, priority ordering and queue-time SLO."""
+    import asyncio
+    from app.server.admission import AdmissionController, AdmissionRejected
+
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=0.2, per_key_limit=1)
+        order, codes = [], []
+        release = asyncio.Event()
+
+        async def solve(key, priority=False):
+            try:
+                async with ctl.slot(key, priority):
+                    order.append(key)
+                    await release.wait()
+            except AdmissionRejected as e:
+                codes.append((key, e.status_code, e.retry_after >= 1))
+
+        holder = asyncio.create_task(solve("a"))
+        await asyncio.sleep(0)
+        await solve("a")  # same key over its limit
+        normal = asyncio.create_task(solve("b"))
+        urgent = asyncio.create_task(solve("c", priority=True))
+        await asyncio.sleep(0)
+        await solve("d")  # queue full
+        release.set()
+        await asyncio.gather(holder, normal, urgent)
+
+        release.clear()
+        holder = asyncio.create_task(solve("e"))
+        await asyncio.sleep(0)
+        await solve("f")  # waits past the SLO
+        release.set()
+        await holder
+        return order, codes, ctl.snapshot()
+
+    order, codes, stats = asyncio.run(scenario())
+    assert order == ["a", "c", "b", "e"]
+    assert codes == [("a", 429, True), ("d", 503, True), ("f", 503, True)]
+    assert stats["rejected"] == {"key_limit": 1, "queue_full": 1, "queue_timeout": 1}
+    assert stats["active"] == 0 and stats["queued"] == {"priority": 0, "normal": 0, "backlog": 0}
+
+
+def test_admission_backlog_lane_waits_without_shedding():
+    """Test backlog solves skip the per-key limit and SLO and yield to interactive ones."""
+    import asyncio
+    from app.server.admission import AdmissionController
+
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.15, per_key_limit=1)
+        order = []
+
+        async def solve(key, backlog=False):
+            async with ctl.slot(key, backlog=backlog):
+                order.append(key)
+                await asyncio.sleep(0.1)
+
+        batch = [asyncio.create_task(solve("a", backlog=True)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert not ctl.saturated()
+        await asyncio.sleep(0.12)
+        interactive = asyncio.create_task(solve("b"))
+        await asyncio.gather(*batch)
+        await interactive
+        return order, ctl.snapshot()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["a", "a", "b", "a"]
+    assert stats["rejected"] == {"key_limit": 0, "queue_full": 0, "queue_timeout": 0}
+    assert stats["admitted"] == 4 and stats["active"] == 0
+
+
+def test_solving_shed_returns_retry_after(monkeypatch):
+    """Test a saturated server answers 503 with Retry-After."""
+    from app.server import router as router_module
+    from app.server.admission import AdmissionController
+    from app.utils.config import settings
+
+    monkeypatch.setattr(router_module, "admission", AdmissionController(0, 0, 1, 1))
+    response = client.post(
+        "/solving",
+        json={"email": "shed@example.com", "secret": settings.SECRET, "url": "http://x/quiz/1"},
+    )
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_chain_events_stream_live(monkeypatch):
+    """Test the SSE feed replays past events and follows the chain to its end."""
+    import json
+    import threading
+    import time
+    from app.quiz.trace import ChainTrace, register_active
+
+    trace = ChainTrace("http://x/quiz/sse", "sse@example.com")
+    register_active(trace)
+    trace.emit("chain_started", url=trace.start_url)
+
+    def finish_later():
+        time.sleep(0.2)
+        trace.start_step(trace.start_url, 0).emit("page_fetched", seconds=0.1)
+        trace.finish({"correct": True})
+
+    threading.Thread(target=finish_later).start()
+    response = client.get("/solving/events", params={"email": "sse@example.com", "url": "http://x/quiz/sse"},
+                          headers=ADMIN)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["chain_started", "page_fetched", "chain_finished"]
+    assert events[1]["depth"] == 0
+    assert client.get(f"/events/{trace.chain_id}", headers=ADMIN).text.count("event: ") == 3
+
+
+def test_metrics_exposition():
+    """Test /metrics renders counters, histograms and pool gauges in Prometheus text format."""
+    from app.utils import metrics
+
+    metrics.stage_seconds.observe(0.3, stage="fetch")
+    metrics.fallbacks_total.inc(kind="mock_42")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE quiz_stage_seconds histogram" in body
+    assert 'quiz_stage_seconds_bucket{stage="fetch",le="0.25"}' in body
+    assert 'quiz_stage_seconds_bucket{stage="fetch",le="+Inf"}' in body
+    assert 'quiz_fallbacks_total{kind="mock_42"}' in body
+    assert 'quiz_admission_slots{state="limit"}' in body
+
+    hist = metrics.Histogram("t_seconds", "test", buckets=(1.0, 2.0))
+    for value in (0.5, 1.5, 3.0):
+        hist.observe(value)
+    lines = hist.render()
+    assert 't_seconds_bucket{le="1"} 1' in lines
+    assert 't_seconds_bucket{le="2"} 2' in lines
+    assert 't_seconds_bucket{le="+Inf"} 3' in lines
+    assert "t_seconds_count 3" in lines
+
+
+def test_solving_profile_is_saved_and_retrievable(monkeypatch, isolated_stores):
+    """Test X-Profile captures sampled stacks and allocations retrievable by id."""
+    from app.server import router as router_module
+    from app.utils.config import settings
+
+    def busy_work():
+        blocks = [bytearray(1024) for _ in range(2000)]
+        deadline = time.monotonic() + 0.1
+        while time.monotonic() < deadline:
+            sum(range(1000))
+        return len(blocks)
+
+    async def fake_chain(url, email, **kw):
+        return {"correct": True, "blocks": busy_work()}
+
+    monkeypatch.setattr(router_module, "solve_chain", fake_chain)
+    response = client.post(
+        "/solving",
+        json={"email": "prof@example.com", "secret": settings.SECRET, "url": "http://x/quiz/1"},
+        headers={"X-Profile": "1"},
+    )
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    summary = client.get(f"/profiles/{profile_id}", headers=ADMIN).json()
+    assert summary["samples"] > 0
+    assert summary["top_allocators"] and summary["peak_memory_mib"] > 0
+    assert summary["top_self"] and summary["top_total"]
+    folded = client.get(f"/profiles/{profile_id}/folded", headers=ADMIN).text
+    assert "busy_work" in folded
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+    assert client.get("/profiles/" + "0" * 32, headers=ADMIN).status_code == 404
+
+
+def test_stats_reports_percentiles_per_window(monkeypatch, tmp_path):
+    """Test telemetry rows are written off the solve path and summarized per stage, route and host."""
+    from app.quiz import telemetry
+    from app.quiz.trace import ChainTrace
+    from app.server import main
+
+    store = telemetry.TelemetryStore(str(tmp_path / "telemetry.sqlite3"))
+    for i in range(10):
+        trace = ChainTrace("http://quiz.example/q/1", "t@x.y")
+        step = trace.start_step("http://quiz.example/q/1", 0)
+        step.stages = {"fetch": 0.1 * (i + 1), "llm": 1.0 + i}
+        step.provider, step.model, step.attempts, step.correct = "aipipe", "gpt", 1 + (i == 0), i % 2 == 0
+        step.status = "correct" if step.correct else "incorrect"
+        store.record_chain(trace)
+    old = ChainTrace("http://old.example/q", "t@x.y")
+    old.start_step("http://old.example/q", 0).started_at = time.time() - 7200
+    store.record_chain(old)
+    store.flush()
+    monkeypatch.setattr(main, "get_telemetry_store", lambda: store)
+
+    short, long = client.get("/stats", params={"windows": "3600,86400"}, headers=ADMIN).json()["windows"]
+    assert short["steps"] == 10 and long["steps"] == 11
+    assert short["correct_rate"] == 0.5 and short["retries"] == 1
+    assert short["stages"]["fetch"]["count"] == 10
+    assert short["stages"]["fetch"]["p50"] <= short["stages"]["fetch"]["p95"] <= short["stages"]["fetch"]["p99"] == 1.0
+    assert short["providers"]["aipipe/gpt"]["p99"] == 10.0
+    assert set(short["hosts"]) == {"quiz.example"} and set(long["hosts"]) == {"quiz.example", "old.example"}
+    assert client.get("/stats", params={"windows": "abc"}, headers=ADMIN).status_code == 400
+
+
+def test_slow_fetch_network_capture(monkeypatch, isolated_stores):
+    """Test a slow fetch's requests are saved as a HAR capture, without browser round trips, and served by id."""
+    from app.quiz.netcapture import NetworkRecorder, flush_captures
+    from app.utils.config import settings
+
+    class FakeResponse:
+        status, status_text = 200, "OK"
+        headers = {"Content-Type": "text/csv", "Content-Length": "2048"}
+
+        def __init__(self, request):
+            self.request = request
+
+    class FakeRequest:
+        method, resource_type, failure = "GET", "fetch", None
+
+        def __init__(self, url, wait, ssl_start=-1):
+            self.url = url
+            self.timing = {"startTime": time.time() * 1000, "domainLookupStart": 0, "domainLookupEnd": 5,
+                           "connectStart": 5, "connectEnd": 25, "secureConnectionStart": ssl_start,
+                           "requestStart": 26, "responseStart": 26 + wait, "responseEnd": 30 + wait}
+
+        def response(self):
+            raise AssertionError("round trip to the browser")
+
+        sizes = response
+
+    class FakePage:
+        handlers = {}
+
+        def on(self, event, handler):
+            self.handlers[event] = handler
+
+    monkeypatch.setattr(settings, "HAR_SAMPLE_RATE", 0.0)
+    page = FakePage()
+    recorder = NetworkRecorder(page)
+    for request in (FakeRequest("http://x/data.csv", wait=900), FakeRequest("http://x/app.js", wait=10, ssl_start=15)):
+        page.handlers["response"](FakeResponse(request))
+        page.handlers["requestfinished"](request)
+    monkeypatch.setattr(settings, "HAR_SLOW_SECONDS", 60)
+    assert recorder.finish("http://x/quiz/1") is None
+    monkeypatch.setattr(settings, "HAR_SLOW_SECONDS", 0)
+    capture_id = recorder.finish("http://x/quiz/1")
+    flush_captures()
+
+    listed = client.get("/har", headers=ADMIN).json()["captures"]
+    assert [c["id"] for c in listed] == [capture_id] and listed[0]["resources"] == 2
+    entries = client.get(f"/har/{capture_id}", headers=ADMIN).json()["log"]["entries"]
+    slow = entries[0]
+    assert slow["request"]["url"] == "http://x/data.csv" and slow["_resourceType"] == "fetch"
+    assert slow["timings"]["dns"] == 5 and slow["timings"]["connect"] == 20 and slow["timings"]["ssl"] == -1
+    assert slow["timings"]["wait"] == 900 and slow["timings"]["receive"] == 4
+    assert slow["response"]["content"] == {"size": 2048, "mimeType": "text/csv"}
+    secure = next(e for e in entries if e["request"]["url"] == "http://x/app.js")
+    assert secure["timings"]["ssl"] == 10 and secure["time"] == 5 + 20 + 10 + 4
+    assert client.get("/har/" + "0" * 32, headers=ADMIN).status_code == 404
+
+
+def test_har_listing_skips_captures_pruned_meanwhile(monkeypatch, isolated_stores):
+    """Test captures deleted by a concurrent save while listing are skipped rather than failing the listing."""
+    import os
+    from app.quiz import netcapture
+
+    kept = netcapture.save_capture("http://x/quiz/1", time.time(), 0.1, [])
+    gone = netcapture.save_capture("http://x/quiz/2", time.time(), 0.1, [])
+    real_open, real_mtime = open, os.path.getmtime
+    gone_path = os.path.join(isolated_stores / "har", gone + ".har")
+
+    def racing_open(path, *args, **kwargs):
+        if path == gone_path and os.path.exists(path):
+            os.remove(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", racing_open)
+    assert [c["id"] for c in netcapture.list_captures()] == [kept]
+
+    def vanished_mtime(path):
+        if path.endswith(kept + ".har"):
+            raise FileNotFoundError(path)
+        return real_mtime(path)
+
+    monkeypatch.setattr(netcapture.os.path, "getmtime", vanished_mtime)
+    assert netcapture.list_captures() == []
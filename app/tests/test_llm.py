@@ -0,0 +1,223 @@
+"""Unit tests for LLM provider orchestration."""
+import time
+import pytest
+from app.quiz import llm
+from app.quiz.breaker import CircuitBreaker, get_breaker, reset_breakers
+from app.quiz.prompt import Conversation
+from app.quiz.providers import LocalProvider, register_provider, reset_providers, unregister_provider
+from app.quiz.routing import ProviderRouter
+from app.quiz.structured import JSON, NUMBER, StructuredAnswerError, expected_type, parse_structured
+from app.quiz.tiering import FAST, STRONG, TierTracker
+from app.utils.config import settings
+from app.utils.deadline import Deadline, DeadlineExceeded
+
+
+@pytest.fixture
+def fresh_llm(monkeypatch):
+    """Isolate provider registry, router, hedge budget and breakers."""
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_BUDGET", 1.0)
+    monkeypatch.setattr(llm, "latency_tracker", llm.LatencyTracker())
+    monkeypatch.setattr(llm, "hedge_budget", llm.HedgeBudget())
+    monkeypatch.setattr(llm, "provider_router", ProviderRouter(exploration=0.0))
+    reset_breakers()
+    for name in ("aipipe", "openai", "local"):
+        unregister_provider(name)
+    yield
+    reset_breakers()
+    reset_providers()
+
+
+def test_hedged_call_returns_faster_provider(fresh_llm):
+    """Test that a slow primary is overtaken by the hedged secondary."""
+    register_provider(LocalProvider(lambda m: "slow", latency=0.5, name="primary"))
+    register_provider(LocalProvider(lambda m: "fast", name="secondary"))
+    assert llm.call_llm("q") == "fast"
+
+
+def test_fast_primary_does_not_hedge(fresh_llm):
+    """Test that the secondary is never called when the primary answers in time."""
+    def fail(messages):
+        raise AssertionError("secondary should not be called")
+
+    register_provider(LocalProvider(lambda m: "primary", name="primary"))
+    register_provider(LocalProvider(fail, name="secondary"))
+    assert llm.call_llm("q") == "primary"
+
+
+def test_hedge_budget_caps_fraction():
+    """Test that the hedge budget refuses hedges beyond its fraction."""
+    budget = llm.HedgeBudget(window=100)
+    for _ in range(50):
+        budget.record_call()
+    granted = sum(budget.try_acquire(0.1) for _ in range(50))
+    assert 0 < granted <= 11
+
+
+def test_breaker_opens_on_errors_and_recovers():
+    """Test closed -> open -> half-open -> closed transitions."""
+    breaker = CircuitBreaker("test", window=10, min_calls=3, error_rate=0.5,
+                             slow_seconds=5, slow_rate=0.9, open_seconds=0.05,
+                             half_open_probes=1)
+    for _ in range(3):
+        assert breaker.acquire()
+        breaker.record(False, 0.1)
+    assert breaker.state == "open"
+    assert not breaker.available()
+
+    time.sleep(0.06)
+    assert breaker.acquire()
+    assert breaker.state == "half_open"
+    assert not breaker.acquire()  # only one probe at a time
+    breaker.record(True, 0.1)
+    assert breaker.state == "closed"
+
+
+def test_deadline_failure_releases_half_open_probe(fresh_llm, monkeypatch):
+    """Test that a probe cut short by the solve deadline frees its slot without tripping."""
+    monkeypatch.setattr(settings, "DEADLINE_MIN_CALL_SECONDS", 0.0)
+    provider = LocalProvider(latency=0.3, name="primary")
+    breaker = get_breaker("primary")
+    breaker.open_seconds = 0.0
+    breaker.half_open_probes = 1
+    breaker._trip(time.monotonic())
+    deadline = Deadline(0.2, reserve=0.0)
+    with pytest.raises(DeadlineExceeded):
+        llm._timed_call(provider, "local", [{"role": "user", "content": "q"}], 0.1, deadline=deadline)
+    assert breaker.state == "half_open"
+    assert breaker.acquire()
+
+
+def test_breaker_keeps_explicit_zero_settings():
+    """Test that explicit zeros are not replaced by the configured defaults."""
+    breaker = CircuitBreaker("test", open_seconds=0, error_rate=0)
+    assert breaker.open_seconds == 0 and breaker.error_rate == 0
+
+
+def test_open_provider_is_skipped(fresh_llm):
+    """Test that call_llm goes straight to the secondary when the primary is open."""
+    def fail(messages):
+        raise AssertionError("open provider should not be called")
+
+    register_provider(LocalProvider(fail, name="primary"))
+    register_provider(LocalProvider(lambda m: "secondary", name="secondary"))
+    get_breaker("primary")._trip(time.monotonic())
+    assert llm.call_llm("q") == "secondary"
+
+
+def test_router_prefers_faster_correct_route():
+    """Test that ranking follows expected time-to-correct-answer."""
+    router = ProviderRouter(alpha=0.5, exploration=0.0)
+    slow, fast = ("a", "big"), ("b", "small")
+    for _ in range(5):
+        router.record_call(slow, 20.0, ok=True)
+        router.record_call(fast, 2.0, ok=True)
+    assert router.rank([slow, fast]) == [fast, slow]
+
+    for _ in range(10):
+        router.record_correctness(fast, False)
+    assert router.rank([slow, fast]) == [slow, fast]
+
+
+def test_solve_with_llm_reports_route(fresh_llm):
+    """Test that solve_with_llm fills meta with the provider and model used."""
+    register_provider(LocalProvider(lambda m: "7", model_names=["tiny"]))
+    meta = {}
+    assert llm.solve_with_llm("What is 3+4?", {}, meta=meta) == 7
+    assert meta["provider"] == "local"
+    assert meta["model"] == "tiny"
+
+
+def test_tier_choice_and_history(monkeypatch):
+    """Test fast-first tiering, retry escalation and per-question memory."""
+    monkeypatch.setattr(settings, "LLM_TIERING_ENABLED", True)
+    tracker = TierTracker()
+    assert tracker.choose("What is 2+2?") == FAST
+    assert tracker.choose("What is 2+2?", attempt=1) == STRONG
+
+    tracker.record_outcome("What is  2+2?", FAST, correct=False)
+    assert tracker.choose("what is 2+2?") == STRONG
+    assert tracker.snapshot()[FAST]["accuracy"] == 0.0
+
+
+def test_solve_with_llm_uses_tier_model(fresh_llm):
+    """Test that a tier restricts routing to that tier's model."""
+    register_provider(LocalProvider(lambda m: "1", model_names=["small", "big"]))
+    meta = {}
+    llm.solve_with_llm("q", {}, meta=meta, tier=FAST)
+    assert meta["model"] == "small"
+    llm.solve_with_llm("q", {}, meta=meta, tier=STRONG)
+    assert meta["model"] == "big"
+
+
+def test_rank_candidates_by_agreement():
+    """Test de-duplication, vote ranking and exclusion of known-wrong answers."""
+    ranked = llm.rank_candidates([5, 4, "4", 4.0, "x", " X "], exclude=[5])
+    assert ranked[0] == (4, 3)
+    assert ("x", 2) in ranked
+    assert all(answer != 5 for answer, _ in ranked)
+
+
+def test_ask_candidates_samples_in_parallel(fresh_llm):
+    """Test that candidates are sampled concurrently at spread temperatures."""
+    replies = iter(["1", "2", "2"])
+    register_provider(LocalProvider(lambda m: next(replies), latency=0.2))
+    conv = Conversation("q", {})
+    t0 = time.monotonic()
+    results = llm.ask_candidates(conv, 3)
+    assert time.monotonic() - t0 < 0.5
+    assert [answer for answer, _ in results] == [2, 1]
+    assert results[0][1]["votes"] == 2
+    assert llm.candidate_temperatures(3) == [0.1, 0.55, 1.0]
+
+
+def test_native_n_candidates_record_one_tier_call(fresh_llm, monkeypatch):
+    """Test that one native `n` request counts as one call for the tier, not one per candidate."""
+
+    class BatchingProvider(LocalProvider):
+        supports_n = True
+
+        def complete_n(self, messages, model, temperature, n, json_mode=False, timeout=None):
+            return ["1", "2", "2"][:n]
+
+    tracker = TierTracker()
+    monkeypatch.setattr(llm, "tier_tracker", tracker)
+    register_provider(BatchingProvider(latency=0))
+    results = llm.ask_candidates(Conversation("q", {}), 3, tier=FAST)
+    assert [answer for answer, _ in results] == [2, 1]
+    assert tracker.snapshot()[FAST]["calls"] == 1
+
+
+def test_structured_reply_parsing():
+    """Test structured replies are validated, coerced and repaired."""
+    assert parse_structured('{"answer": "1,234", "type": "number", "confidence": 0.8}').answer == 1234
+    fenced = parse_structured('```json\n{"answer": "yes", "type": "boolean", "confidence": 0.9,}\n```')
+    assert fenced.answer is True and fenced.repaired
+    prose = parse_structured("There are 12 rows in total.", "How many rows are there?")
+    assert prose.answer == 12 and prose.type == "number"
+    assert parse_structured('{"answer": "[1, 2]", "type": "json"}').answer == [1, 2]
+    claimed = parse_structured('{"answer": "many", "type": "string", "confidence": 0.9}', "How many rows are there?")
+    assert (claimed.answer, claimed.type, claimed.confidence) == ("many", "string", 0.5)
+    with pytest.raises(StructuredAnswerError) as error:
+        parse_structured('{"answer": "many", "type": "number"}', "How many rows are there?")
+    assert error.value.value == "many"
+
+
+def test_expected_type_from_question():
+    """Test the question decides the answer type over the model's claim."""
+    assert expected_type("What is the total of the value column?") == "number"
+    assert expected_type("Is the file sorted? Answer true or false.") == "boolean"
+    assert parse_structured('{"answer": "42", "type": "string"}', "What is the sum?").answer == 42
+    assert expected_type("Which city has the maximum population?") is None
+    assert expected_type("Who scored the highest total?") is None
+    assert expected_type("What is the maximum population?") == NUMBER
+    assert expected_type("Return the matching ids as a list") == JSON
+
+
+def test_failed_structured_reply_falls_back_to_envelope_answer():
+    """Test a reply that fits no type is submitted as its answer, never as the whole envelope."""
+    reply = '{"answer": "Paris", "type": "string", "confidence": 0.9}'
+    assert llm.parse_reply(reply, "Which city has the maximum population?", True) == ("Paris", 0.9)
+    assert llm.parse_reply('{"answer": "lots", "type": "number"}', "What is the total?", True) == ("lots", 0.2)
+    assert llm.parse_reply('{"answer": "7", "confidence": 0.9}', "Is it sorted? true or false", True) == (7, 0.2)
@@ -0,0 +1,81 @@
+"""Unit tests for the logging pipeline."""
+import json
+import logging
+import queue
+import sys
+from app.utils.config import settings
+from app.utils.logger import JsonFormatter, RateLimitFilter, _DroppingQueueHandler, _level_for
+
+
+def _record(msg, *args, level=logging.INFO, lineno=1, **extra):
+    record = logging.LogRecord("solver", level, "solver.py", lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_truncates_fields(monkeypatch):
+    """Test records render as JSON with message and extra fields capped."""
+    monkeypatch.setattr(settings, "LOG_FIELD_MAX_CHARS", 10)
+    entry = json.loads(JsonFormatter().format(_record("answer %s", "x" * 50, chain_id="c" * 30, depth=2)))
+    assert entry["level"] == "INFO" and entry["logger"] == "solver"
+    assert entry["msg"].startswith("answer xxx") and entry["msg"].endswith("[47 more chars]")
+    assert entry["chain_id"].endswith("[20 more chars]")
+    assert entry["depth"] == 2
+
+
+def test_rate_limit_filter_samples_noisy_call_sites(monkeypatch):
+    """Test a noisy call site is throttled per window while warnings always pass."""
+    clock = [0.0]
+    monkeypatch.setattr("app.utils.logger.time.monotonic", lambda: clock[0])
+    limiter = RateLimitFilter(limit=3, window=10)
+    passed = [limiter.filter(_record("tick")) for _ in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    assert limiter.filter(_record("other site", lineno=2))
+    assert limiter.filter(_record("warn", level=logging.WARNING))
+
+    clock[0] = 11.0
+    record = _record("tick")
+    assert limiter.filter(record) and record.suppressed == 7
+
+
+def test_per_logger_levels(monkeypatch):
+    """Test LOG_LEVELS overrides LOG_LEVEL for named loggers."""
+    monkeypatch.setattr(settings, "LOG_LEVEL", "INFO")
+    monkeypatch.setattr(settings, "LOG_LEVELS", "solver=DEBUG, llm=warning")
+    assert _level_for("solver") == logging.DEBUG
+    assert _level_for("llm") == logging.WARNING
+    assert _level_for("router") == logging.INFO
+
+
+def test_queue_handler_snapshots_records_and_reports_drops(monkeypatch):
+    """Test queued records hold rendered text only and dropped records are counted and reported."""
+    from app.utils import metrics
+
+    class Payload:
+        def __str__(self):
+            return "payload"
+
+    monkeypatch.setattr(settings, "LOG_RATE_WINDOW_SECONDS", 0)
+    records = queue.Queue(maxsize=2)
+    handler = _DroppingQueueHandler(records)
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        failed = _record("parsed %s", Payload(), level=logging.ERROR, table=Payload())
+        failed.exc_info = sys.exc_info()
+    handler.handle(failed)
+    queued = records.get_nowait()
+    assert (queued.msg, queued.args, queued.exc_info, queued.table) == ("parsed payload", None, None, "payload")
+    entry = json.loads(JsonFormatter().format(queued))
+    assert entry["msg"] == "parsed payload" and "ValueError: bad row" in entry["exc"]
+
+    before = metrics.log_records_dropped_total.value()
+    for msg in ("kept", "kept", "lost", "lost"):
+        handler.handle(_record(msg))
+    assert metrics.log_records_dropped_total.value() == before + 2
+    assert [records.get_nowait().msg for _ in range(2)] == ["kept", "kept"]
+    handler.handle(_record("after"))
+    handler.handle(_record("next"))  # the warning took its place
+    assert [records.get_nowait().msg for _ in range(2)] == [
+        "Dropped 2 log records: the log queue was full", "after"]
+    assert metrics.log_records_dropped_total.value() == before + 3
@@ -0,0 +1,85 @@
+"""Unit tests for prompt assembly."""
+import pandas as pd
+from app.quiz.prompt import Conversation, PromptSection, assemble, build_prompt, count_tokens, minify_json
+from app.quiz.retrieval import BM25Index, chunk_text, get_index
+from app.utils.config import settings
+
+
+def test_compact_encodings():
+    """Test tables become CSV and JSON is minified."""
+    context = {
+        "tables": [[{"a": 1, "b": 2}, {"a": 3, "b": 4}]],
+        "csv_data": {"data.csv": pd.DataFrame({"x": [1, 2], "y": ["p", "q"]})},
+        "embedded_json": [{"key": [1, 2]}],
+    }
+    prompt = build_prompt("Sum a?", context)
+    assert "a,b\n1,2\n3,4" in prompt.text
+    assert "x,y\n1,p\n2,q" in prompt.text
+    assert '[{"key":[1,2]}]' in prompt.text
+    assert "Question: Sum a?" in prompt.text
+    assert prompt.text.index("a,b") < prompt.text.index("Question:")
+    assert prompt.tokens == count_tokens(prompt.text)
+    assert minify_json({"a": [1, 2]}) == '{"a":[1,2]}'
+
+
+def test_budget_truncates_by_priority():
+    """Test low-priority sections are truncated first and fixed ones kept."""
+    rows = "col\n" + "\n".join(str(i) for i in range(2000))
+    sections = [
+        PromptSection("question", "", "Question: how many?", kind="fixed"),
+        PromptSection("rows", "Rows:", rows, priority=1, kind="rows"),
+        PromptSection("notes", "Notes:", "word " * 2000, priority=2),
+    ]
+    built = assemble(sections, budget=300)
+    assert built.tokens <= 320
+    assert "Question: how many?" in built.text
+    assert "rows" in built.truncated
+    assert "more rows)" in built.text
+    assert "Rows:\ncol\n0\n1" in built.text
+
+
+def test_section_cap():
+    """Test max_tokens caps a section even with budget to spare."""
+    sections = [PromptSection("pdf", "PDF:", "text " * 1000, max_tokens=50)]
+    built = assemble(sections, budget=5000)
+    assert built.section_tokens["pdf"] <= 70
+    assert built.truncated == ["pdf"]
+
+
+def test_bm25_ranks_relevant_chunk_first():
+    """Test BM25 scores the chunk containing the query terms highest."""
+    index = BM25Index(["apples and pears", "the total revenue was 1234", "nothing here"])
+    assert index.top_k("what was the total revenue", 2)[0] == 1
+
+
+def test_long_pdf_uses_retrieval(monkeypatch):
+    """Test that an answer beyond the first 2000 characters reaches the prompt."""
+    monkeypatch.setattr(settings, "RETRIEVAL_MIN_TOKENS", 200)
+    monkeypatch.setattr(settings, "RETRIEVAL_TOKEN_BUDGET", 300)
+    filler = "\n\n".join(f"Paragraph {i} talks about unrelated weather patterns." for i in range(400))
+    pdf_text = filler + "\n\nThe secret code for the vault is 98765.\n\n" + filler
+    prompt = build_prompt("What is the secret code for the vault?", {"pdf_text": pdf_text})
+    assert "98765" in prompt.text
+    assert "most relevant excerpts" in prompt.text
+    assert prompt.section_tokens["pdf_text"] < 400
+
+
+def test_index_cached_by_document_hash():
+    """Test the same document text reuses its index."""
+    text = "alpha beta gamma " * 200
+    assert get_index(text) is get_index(text)
+    assert len(chunk_text(text, size=100, overlap=10)) > 1
+
+
+def test_conversation_retry_sends_only_feedback_delta():
+    """Test that a retry appends the reply and feedback without rebuilding the data prompt."""
+    conv = Conversation("What is x?", {"tables": [[{"x": 1}]]})
+    first_prompt = conv.messages[1]["content"]
+    conv.add_reply("2")
+    delta = conv.add_feedback(2, {"correct": False, "reason": "Off by one"})
+
+    assert [m["role"] for m in conv.messages] == ["system", "user", "assistant", "user"]
+    assert conv.messages[1]["content"] == first_prompt
+    assert "Off by one" in conv.messages[-1]["content"]
+    assert "x\n1" not in conv.messages[-1]["content"]
+    assert delta < 40
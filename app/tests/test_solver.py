@@ -1,7 +1,21 @@
 """Unit tests for quiz solver components."""
+import time
 import pytest
-from app.quiz.extractor import parse_html_for_quiz, parse_llm_response
+from app.quiz.extractor import parse_html_for_quiz
 from app.quiz.llm import parse_llm_response
+from app.quiz.providers import LocalProvider, register_provider, reset_providers, unregister_provider
+from app.utils.deadline import Deadline, DeadlineExceeded, call_timeout
+
+NUMBER_REPLY = '{"answer": 3, "type": "number", "confidence": 0.9}'
+
+
+@pytest.fixture
+def local_provider():
+    """Route LLM calls to an in-process provider answering with the given responder."""
+    for name in ("aipipe", "openai"):
+        unregister_provider(name)
+    yield lambda responder: register_provider(LocalProvider(responder))
+    reset_providers()
 
 
 def test_parse_html_for_quiz():
@@ -45,3 +59,377 @@ def test_parse_llm_response_string():
     """Test parsing string response."""
     result = parse_llm_response("hello world")
     assert result == "hello world"
+
+
+def test_solve_quiz_retries_with_feedback_turn(monkeypatch, local_provider):
+    """Test that a rejected answer is retried as a follow-up turn with the submit reason."""
+    from app.quiz import solver
+
+    sent = []
+
+    def responder(messages):
+        sent.append([dict(m) for m in messages])
+        answer = 4 if len(sent) > 1 else 5
+        return f'{{"answer": {answer}, "type": "number", "confidence": 0.9}}'
+
+    html = '<html><body><h1 class="question">What is 2+2?</h1><form action="http://x/submit"></form></body></html>'
+    monkeypatch.setattr(solver, "fetch_page_and_downloads", lambda url, **kw: {"html": html, "downloads": []})
+    monkeypatch.setattr(solver, "submit_answer", lambda submit_url, answer, *a, **kw: (
+        {"correct": True} if answer == 4 else {"correct": False, "reason": "Not five"}
+    ))
+    local_provider(responder)
+    result = solver.solve_quiz("http://x/quiz/1", "a@b.c")
+
+    assert result == {"correct": True}
+    assert len(sent) == 2
+    assert sent[1][:2] == sent[0][:2]
+    assert "Not five" in sent[1][-1]["content"]
+
+
+def test_deadline_bounds_call_timeouts(monkeypatch):
+    """Test timeouts shrink to the remaining budget minus the reserve."""
+    deadline = Deadline(20, reserve=5)
+    assert call_timeout(deadline, 30, "llm") == pytest.approx(15, abs=0.5)
+    assert call_timeout(deadline, 10, "llm") == 10
+    assert call_timeout(None, 30, "llm") == 30
+    with pytest.raises(DeadlineExceeded):
+        Deadline(3, reserve=5).timeout(30, "fetch")
+
+
+def test_solve_quiz_reports_deadline_stage(monkeypatch):
+    """Test that running out of budget mid-step returns a distinct result."""
+    from app.quiz import solver
+
+    def slow_fetch(url, deadline=None, **kw):
+        raise DeadlineExceeded("fetch", deadline.remaining())
+
+    monkeypatch.setattr(solver, "fetch_page_and_downloads", slow_fetch)
+    result = solver.solve_quiz("http://x/quiz/1", "a@b.c")
+    assert result["status"] == "deadline_exceeded"
+    assert result["stage"] == "fetch"
+
+
+def test_plan_step_degrades_with_budget():
+    """Test that a tight budget yields a best-effort plan and a loose one does not."""
+    from app.quiz.scheduler import StageHistory, plan_step
+    from app.quiz.tiering import FAST
+
+    history = StageHistory()
+    tight = plan_step(Deadline(10, reserve=5), depth=3, history=history)
+    assert tight.best_effort and tight.tier == FAST
+    assert (tight.fetch, tight.extraction, tight.max_attempts) == ("http", "minimal", 1)
+
+    loose = plan_step(Deadline(180, reserve=5), depth=0, history=history)
+    assert not loose.best_effort and loose.allow_escalation
+    assert loose.extraction == "full" and loose.max_attempts >= 2
+
+    # the same budget goes further once fewer steps are expected to follow
+    early = plan_step(Deadline(45, reserve=5), depth=0, history=history)
+    late = plan_step(Deadline(45, reserve=5), depth=2, history=history)
+    assert not early.allow_escalation and early.extraction == "minimal"
+    assert late.allow_escalation and late.extraction == "full"
+
+
+def test_solve_chain_follows_next_url_iteratively(monkeypatch, tmp_path, local_provider):
+    """Test that a chain walks next URLs in one loop and records a trace per step."""
+    from app.quiz import solver
+    from app.quiz.trace import ChainTrace
+
+    csv = tmp_path / "data.csv"
+    csv.write_text("a\n1\n2\n")
+    html = '<html><body><h1 class="question">Sum column a of the file</h1><form action="http://x/submit"></form></body></html>'
+    monkeypatch.setattr(solver, "fetch_page_and_downloads",
+                        lambda url, **kw: {"html": html, "downloads": [str(csv)]})
+    monkeypatch.setattr(solver, "submit_answer", lambda submit_url, answer, email, secret, url, **kw: (
+        {"correct": True, "url": url[:-1] + str(int(url[-1]) + 1)} if not url.endswith("3") else {"correct": True}
+    ))
+    local_provider(lambda messages: NUMBER_REPLY)
+    trace = ChainTrace("http://x/quiz/1", "a@b.c")
+    result = solver.solve_quiz("http://x/quiz/1", "a@b.c", trace=trace)
+
+    assert result == {"correct": True}
+    assert [s.depth for s in trace.steps] == [0, 1, 2]
+    assert trace.status == "correct"
+    assert all(s.files == 1 and s.attempts == 1 and s.status == "correct" for s in trace.steps)
+    assert {"fetch", "extract", "llm", "submit"} <= set(trace.steps[0].stages)
+    kinds = [e["type"] for e in trace.events]
+    assert kinds[:7] == ["chain_started", "step_started", "page_fetched", "extracted", "answer", "submitted", "next_url"]
+    assert kinds[-1] == "chain_finished"
+
+
+def test_checkpoint_resumes_interrupted_chain(monkeypatch, tmp_path, local_provider):
+    """Test that a retried session resumes at the first unsolved URL."""
+    from app.quiz import solver
+    from app.quiz.checkpoint import CheckpointStore
+
+    fetched = []
+    broken = {"http://x/quiz/2"}
+    html = '<html><body><h1 class="question">What is 1+2?</h1><form action="http://x/submit"></form></body></html>'
+
+    def fetch(url, **kw):
+        fetched.append(url)
+        if url in broken:
+            raise RuntimeError("worker died")
+        return {"html": html, "downloads": []}
+
+    monkeypatch.setattr(solver, "fetch_page_and_downloads", fetch)
+    monkeypatch.setattr(solver, "submit_answer", lambda submit_url, answer, email, secret, url, **kw: (
+        {"correct": True, "url": "http://x/quiz/2"} if url.endswith("1") else {"correct": True}
+    ))
+    local_provider(lambda messages: NUMBER_REPLY)
+    store = CheckpointStore(str(tmp_path / "cp.sqlite3"))
+    with pytest.raises(ValueError):
+        solver.solve_quiz("http://x/quiz/1", "a@b.c", checkpoint=store)
+    broken.clear()
+    result = solver.solve_quiz("http://x/quiz/1", "a@b.c", checkpoint=store)
+
+    assert result == {"correct": True}
+    assert fetched == ["http://x/quiz/1", "http://x/quiz/2", "http://x/quiz/2"]
+    assert [s["depth"] for s in store.steps("a@b.c", "http://x/quiz/1")] == [0, 1]
+    assert store.begin("a@b.c", "http://x/quiz/1") is None
+
+
+def test_answer_memo_skips_llm_for_known_question(monkeypatch, tmp_path, local_provider):
+    """Test that a verified answer is reused until the data changes."""
+    from app.quiz import solver
+    from app.quiz.memo import AnswerMemo, data_fingerprint
+
+    calls = []
+    csv = tmp_path / "data.csv"
+    csv.write_text("a\n1\n")
+    html = '<html><body><h1 class="question">What is the total?</h1><form action="http://x/submit"></form></body></html>'
+
+    def fetch(url, **kw):
+        return {"html": html, "downloads": [str(csv)]}
+
+    def responder(messages):
+        calls.append(messages)
+        return '{"answer": 1, "type": "number", "confidence": 0.9}'
+
+    monkeypatch.setattr(solver, "fetch_page_and_downloads", fetch)
+    monkeypatch.setattr(solver, "submit_answer", lambda *a, **kw: {"correct": True})
+    local_provider(responder)
+    memo = AnswerMemo(str(tmp_path / "memo.sqlite3"))
+    solver.solve_quiz("http://x/quiz/1", "a@b.c", memo=memo)
+    solver.solve_quiz("http://x/quiz/1", "d@e.f", memo=memo)
+    csv.write_text("a\n2\n")
+    solver.solve_quiz("http://x/quiz/1", "a@b.c", memo=memo)
+
+    assert len(calls) == 2
+    stats = memo.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"], stats["entries"]) == (1, 2, 1, 1)
+
+    # a step downgraded to minimal extraction still finds the answer stored by a full one
+    full = {"tables": [], "csv_data": {}, "pdf_text": "\n\nreport.pdf:\nrevenue", "page_text": "long page"}
+    minimal = {"tables": [], "csv_data": {}, "pdf_text": ""}
+    assert data_fingerprint(full) == data_fingerprint(minimal)
+
+
+def test_answer_memo_misses_when_pdf_changes(monkeypatch, tmp_path, local_provider):
+    """Test that a quiz whose only data is a PDF goes back to the LLM once the PDF changes."""
+    from app.quiz import solver
+    from app.quiz.memo import AnswerMemo, data_fingerprint
+
+    calls = []
+    pdf = tmp_path / "report.pdf"
+    pdf.write_bytes(b"%PDF-1.4 revenue 10")
+    html = '<html><body><h1 class="question">What is the revenue?</h1><form action="http://x/submit"></form></body></html>'
+
+    def responder(messages):
+        calls.append(messages)
+        return '{"answer": 10, "type": "number", "confidence": 0.9}'
+
+    monkeypatch.setattr(solver, "fetch_page_and_downloads", lambda url, **kw: {"html": html, "downloads": [str(pdf)]})
+    monkeypatch.setattr(solver, "parse_pdf", lambda path: open(path, "rb").read().decode())
+    monkeypatch.setattr(solver, "submit_answer", lambda *a, **kw: {"correct": True})
+    local_provider(responder)
+    memo = AnswerMemo(str(tmp_path / "memo.sqlite3"))
+    solver.solve_quiz("http://x/quiz/1", "a@b.c", memo=memo)
+    solver.solve_quiz("http://x/quiz/1", "a@b.c", memo=memo)
+    pdf.write_bytes(b"%PDF-1.4 revenue 12")
+    solver.solve_quiz("http://x/quiz/1", "a@b.c", memo=memo)
+
+    assert len(calls) == 2
+    assert (memo.stats()["hits"], memo.stats()["misses"]) == (1, 2)
+    # the PDF's bytes count even when the plan did not extract its text
+    context = {"tables": [], "csv_data": {}, "pdf_text": ""}
+    before = data_fingerprint(context, [str(pdf)])
+    pdf.write_bytes(b"%PDF-1.4 revenue 14")
+    assert data_fingerprint(context, [str(pdf)]) != before
+
+
+def test_tracing_exports_nested_spans(monkeypatch, tmp_path, local_provider):
+    """Test that a sampled solve exports one trace of nested spans and an unsampled one exports none."""
+    import json
+    from app.quiz import solver
+    from app.utils import tracing
+    from app.utils.config import settings
+
+    csv = tmp_path / "data.csv"
+    csv.write_text("a\n1\n2\n")
+    html = '<html><body><h1 class="question">Sum column a of the file</h1><form action="http://x/submit"></form></body></html>'
+    monkeypatch.setattr(solver, "fetch_page_and_downloads",
+                        lambda url, **kw: {"html": html, "downloads": [str(csv)]})
+    monkeypatch.setattr(solver, "submit_answer", lambda *a, **kw: {"correct": True})
+    trace_file = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACE_FILE", str(trace_file))
+    local_provider(lambda messages: NUMBER_REPLY)
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 0.0)
+    solver.solve_quiz("http://x/quiz/1", "a@b.c")
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    solver.solve_quiz("http://x/quiz/1", "a@b.c")
+    tracing.get_exporter().flush()
+
+    spans = {s["name"]: s for s in map(json.loads, trace_file.read_text().splitlines())}
+    assert {"solve_chain", "solve_step", "parse_html_for_quiz", "parse_csv", "llm_ask", "llm_provider_call"} <= set(spans)
+    assert len({s["traceId"] for s in spans.values()}) == 1
+    assert spans["solve_chain"]["parentSpanId"] is None
+    assert spans["solve_step"]["parentSpanId"] == spans["solve_chain"]["spanId"]
+    assert spans["parse_csv"]["parentSpanId"] == spans["solve_step"]["spanId"]
+    assert spans["parse_csv"]["attributes"]["rows"] == 2
+    assert spans["llm_provider_call"]["parentSpanId"] == spans["llm_ask"]["spanId"]
+    assert spans["solve_chain"]["attributes"]["steps"] == 1
+
+
+class _HangingPage:
+    """Playwright page stand-in whose waits run to their full timeout."""
+
+    url = "http://x/quiz/1"
+
+    def __init__(self):
+        self.timeouts = []
+
+    def set_default_timeout(self, ms):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    def _hang(self, ms):
+        self.timeouts.append(ms)
+        time.sleep(ms / 1000)
+        raise TimeoutError(f"timed out after {ms:.0f}ms")
+
+    def goto(self, url, timeout, wait_until):
+        self._hang(timeout)
+
+    def wait_for_load_state(self, state, timeout):
+        self._hang(timeout)
+
+    def content(self):
+        return "<html></html>"
+
+    def evaluate(self, expression):
+        return None
+
+
+class _FakeBrowser:
+    def __init__(self, page):
+        self.page = page
+
+    def new_context(self, **kw):
+        browser = self
+
+        class Context:
+            def new_page(self):
+                return browser.page
+
+            def close(self):
+                pass
+
+        return Context()
+
+
+def test_render_waits_share_one_page_deadline(monkeypatch, tmp_path):
+    """Test that navigation and network-idle waits split one page budget instead of each getting it."""
+    from app.quiz import browser
+
+    monkeypatch.setattr(browser.settings, "HAR_CAPTURE_ENABLED", False)
+    page = _HangingPage()
+    t0 = time.monotonic()
+    result = browser._render(_FakeBrowser(page), "http://x/quiz/1", tmp_path, time.monotonic() + 0.5)
+    assert time.monotonic() - t0 < 0.6
+    assert result["html"] == "<html></html>"
+    assert sum(page.timeouts) <= 500
+
+
+def test_browser_pool_wait_raises_deadline_exceeded(monkeypatch, tmp_path):
+    """Test the pool waits no longer than the fetch budget and blames the solve deadline."""
+    from app.quiz.browser import BrowserPool
+
+    pool = BrowserPool(1)
+    monkeypatch.setattr(pool, "_run", lambda url, path, until: time.sleep(1))
+    deadline = Deadline(0.3, reserve=0.0)
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        pool.fetch("http://x/quiz/1", tmp_path, deadline.remaining(), deadline)
+    assert time.monotonic() - t0 < 0.5
+    with pytest.raises(TimeoutError) as error:
+        pool.fetch("http://x/quiz/1", tmp_path, 0.1)
+    assert not isinstance(error.value, DeadlineExceeded)
+
+
+def test_browser_pool_render_annotates_the_fetch_span(monkeypatch, tmp_path):
+    """Test a pooled render runs in the caller's trace context, so its attributes reach the fetch span."""
+    from app.quiz.browser import BrowserPool
+    from app.utils import tracing
+    from app.utils.config import settings
+
+    def run(url, path, until):
+        tracing.current_span().set(har_capture="abc123")
+        return {"html": "", "url": url, "downloads": [], "js_data": {}}
+
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    pool = BrowserPool(1)
+    monkeypatch.setattr(pool, "_run", run)
+    with tracing.span("fetch_page_and_downloads") as span:
+        pool.fetch("http://x/quiz/1", tmp_path, 5)
+    assert span.attributes["har_capture"] == "abc123"
+
+
+def test_answer_loop_releases_worker_between_llm_and_submit(monkeypatch, local_provider):
+    """Test that the LLM call and the submit run as separate worker-thread jobs, not one held across both."""
+    import asyncio
+    import itertools
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.quiz import solver
+
+    calls = []
+    worker = threading.local()
+    html = '<html><body><h1 class="question">What is 1+2?</h1><form action="http://x/submit"></form></body></html>'
+
+    class JobExecutor(ThreadPoolExecutor):
+        """Numbers every submitted job so calls can tell which job they ran in."""
+        jobs = itertools.count()
+
+        def submit(self, fn, *args, **kwargs):
+            job = next(self.jobs)
+
+            def run():
+                worker.job = job
+                return fn(*args, **kwargs)
+            return super().submit(run)
+
+    def responder(messages):
+        calls.append(("llm", worker.job))
+        return NUMBER_REPLY
+
+    def submit(submit_url, answer, email, secret, url, **kw):
+        calls.append(("submit", worker.job))
+        return {"correct": True}
+
+    monkeypatch.setattr(solver, "fetch_page_and_downloads", lambda url, **kw: {"html": html, "downloads": []})
+    monkeypatch.setattr(solver, "submit_answer", submit)
+    local_provider(responder)
+
+    async def scenario():
+        asyncio.get_running_loop().set_default_executor(JobExecutor(max_workers=1))
+        return await solver.solve_chain("http://x/quiz/1", "a@b.c")
+
+    assert asyncio.run(scenario()) == {"correct": True}
+    (llm, llm_job), (sub, submit_job) = calls
+    assert (llm, sub) == ("llm", "submit") and llm_job != submit_job
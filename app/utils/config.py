@@ -15,12 +15,16 @@ if not os.getenv("VERCEL"):
 class Settings:
     """Application settings loaded from environment variables."""
     SECRET: str = os.getenv("QUIZ_SECRET", "changeme")
+    # Token for the status, stats, trace, HAR and profile endpoints (QUIZ_SECRET if empty)
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    OPENAI_STRONG_MODEL: str = os.getenv("OPENAI_STRONG_MODEL", "gpt-4o")
     
     # AIPipe configuration (institution LLM API)
     AIPIPE_API_URL: str = os.getenv("AIPIPE_API_URL", "https://aipipe.org/openrouter/v1/chat/completions")
     AIPIPE_MODEL: str = os.getenv("AIPIPE_MODEL", "openai/gpt-4o")
+    AIPIPE_FAST_MODEL: str = os.getenv("AIPIPE_FAST_MODEL", "openai/gpt-4o-mini")
     USE_AIPIPE: bool = os.getenv("USE_AIPIPE", "1") in ("1", "true", "True")
     
     PLAYWRIGHT_HEADLESS: bool = os.getenv("PLAYWRIGHT_HEADLESS", "1") in ("1", "true", "True")
@@ -28,6 +32,143 @@ class Settings:
     REQUEST_TIMEOUT: int = int(os.getenv("REQUEST_TIMEOUT", "30"))
     MAX_RETRIES: int = int(os.getenv("MAX_RETRIES", "3"))
     RETRY_WINDOW_SECONDS: int = int(os.getenv("RETRY_WINDOW_SECONDS", "180"))
+    # Seconds of the window kept back for the final submit, and the shortest
+    # timeout worth starting a call with
+    DEADLINE_RESERVE_SECONDS: float = float(os.getenv("DEADLINE_RESERVE_SECONDS", "5"))
+    DEADLINE_MIN_CALL_SECONDS: float = float(os.getenv("DEADLINE_MIN_CALL_SECONDS", "1"))
+    
+    # Adaptive provider routing ("local" is an in-process stand-in for testing)
+    LLM_PROVIDERS: str = os.getenv("LLM_PROVIDERS", "aipipe,openai")
+    LLM_ROUTER_ALPHA: float = float(os.getenv("LLM_ROUTER_ALPHA", "0.3"))
+    LLM_ROUTER_EXPLORATION: float = float(os.getenv("LLM_ROUTER_EXPLORATION", "0.05"))
+    LLM_ROUTER_PRIOR_LATENCY: float = float(os.getenv("LLM_ROUTER_PRIOR_LATENCY", "10"))
+    LOCAL_LLM_RESPONSE: str = os.getenv("LOCAL_LLM_RESPONSE", "42")
+    LOCAL_LLM_LATENCY: float = float(os.getenv("LOCAL_LLM_LATENCY", "0"))
+    
+    # Model tiering: fast model first, escalate to the strong model on retry
+    # (AIPIPE_FAST_MODEL/OPENAI_MODEL are fast, AIPIPE_MODEL/OPENAI_STRONG_MODEL strong)
+    LLM_TIERING_ENABLED: bool = os.getenv("LLM_TIERING_ENABLED", "1") in ("1", "true", "True")
+    LLM_ESCALATE_CONFIDENCE: float = float(os.getenv("LLM_ESCALATE_CONFIDENCE", "0.6"))
+    
+    # Durable per-step checkpoints so a retried /solving resumes its chain
+    CHECKPOINT_ENABLED: bool = os.getenv("CHECKPOINT_ENABLED", "1") in ("1", "true", "True")
+    CHECKPOINT_DB: str = os.getenv("CHECKPOINT_DB", ".data/checkpoints.sqlite3")
+    CHECKPOINT_TTL_SECONDS: float = float(os.getenv("CHECKPOINT_TTL_SECONDS", "600"))
+    
+    # Persistent memo of answers the quiz server confirmed correct
+    ANSWER_MEMO_ENABLED: bool = os.getenv("ANSWER_MEMO_ENABLED", "1") in ("1", "true", "True")
+    ANSWER_MEMO_DB: str = os.getenv("ANSWER_MEMO_DB", ".data/answers.sqlite3")
+    
+    # Shared resources: HTTP connections per host and long-lived browsers
+    HTTP_POOL_SIZE: int = int(os.getenv("HTTP_POOL_SIZE", "16"))
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    
+    # Batch solving: default and maximum concurrent chains, maximum batch size
+    BATCH_PARALLELISM: int = int(os.getenv("BATCH_PARALLELISM", "4"))
+    BATCH_MAX_PARALLELISM: int = int(os.getenv("BATCH_MAX_PARALLELISM", "16"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+    
+    # Admission control: concurrent solves, wait queue, queue-time SLO and
+    # per-email limit; requests carrying the priority token skip the normal lane
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+    ADMISSION_PER_KEY_LIMIT: int = int(os.getenv("ADMISSION_PER_KEY_LIMIT", "2"))
+    ADMISSION_PRIORITY_TOKEN: str = os.getenv("ADMISSION_PRIORITY_TOKEN", "")
+    ADMISSION_DEFAULT_SOLVE_SECONDS: float = float(os.getenv("ADMISSION_DEFAULT_SOLVE_SECONDS", "60"))
+    
+    # Identical (email, url) solves within the window share one run
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "1") in ("1", "true", "True")
+    COALESCE_WINDOW_SECONDS: float = float(os.getenv("COALESCE_WINDOW_SECONDS", "5"))
+    
+    # Background jobs (POST /solving?mode=async)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "8"))
+    JOB_MAX_PENDING: int = int(os.getenv("JOB_MAX_PENDING", "100"))
+    JOB_TTL_SECONDS: float = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+    JOB_WEBHOOK_ATTEMPTS: int = int(os.getenv("JOB_WEBHOOK_ATTEMPTS", "3"))
+    
+    # Seconds between keepalive comments on idle progress streams
+    SSE_HEARTBEAT_SECONDS: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    
+    # Tracing spans exported as JSON lines; the sample rate applies per solve
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "0") in ("1", "true", "True")
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    TRACE_FILE: str = os.getenv("TRACE_FILE", ".data/traces.jsonl")
+    
+    # Per-solve profiling requested with the X-Profile header
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "1") in ("1", "true", "True")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", ".data/profiles")
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_TOP_N: int = int(os.getenv("PROFILE_TOP_N", "25"))
+    PROFILE_TRACEMALLOC_FRAMES: int = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+    
+    # Logging: levels (LOG_LEVELS="solver=DEBUG,llm=WARNING" overrides per logger),
+    # output format, field truncation, queue size and per-call-site rate limit
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    LOG_FIELD_MAX_CHARS: int = int(os.getenv("LOG_FIELD_MAX_CHARS", "2000"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_RATE_LIMIT: int = int(os.getenv("LOG_RATE_LIMIT", "20"))
+    LOG_RATE_WINDOW_SECONDS: float = float(os.getenv("LOG_RATE_WINDOW_SECONDS", "10"))
+    
+    # Per-step solve telemetry for /stats
+    TELEMETRY_ENABLED: bool = os.getenv("TELEMETRY_ENABLED", "1") in ("1", "true", "True")
+    TELEMETRY_DB: str = os.getenv("TELEMETRY_DB", ".data/telemetry.sqlite3")
+    TELEMETRY_RETENTION_DAYS: float = float(os.getenv("TELEMETRY_RETENTION_DAYS", "7"))
+    TELEMETRY_STATS_WINDOWS: str = os.getenv("TELEMETRY_STATS_WINDOWS", "300,3600,86400")
+    
+    # HAR-like network captures of browser fetches slower than HAR_SLOW_SECONDS
+    # (plus a HAR_SAMPLE_RATE fraction of the rest)
+    HAR_CAPTURE_ENABLED: bool = os.getenv("HAR_CAPTURE_ENABLED", "1") in ("1", "true", "True")
+    HAR_SLOW_SECONDS: float = float(os.getenv("HAR_SLOW_SECONDS", "10"))
+    HAR_SAMPLE_RATE: float = float(os.getenv("HAR_SAMPLE_RATE", "0"))
+    HAR_DIR: str = os.getenv("HAR_DIR", ".data/har")
+    HAR_MAX_CAPTURES: int = int(os.getenv("HAR_MAX_CAPTURES", "50"))
+    
+    # Finished chain traces kept in memory for /chains
+    CHAIN_TRACE_HISTORY: int = int(os.getenv("CHAIN_TRACE_HISTORY", "20"))
+    
+    # Budget-aware per-step strategy selection
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "1") in ("1", "true", "True")
+    SCHEDULER_FULL_EXTRACTION_SLACK: float = float(os.getenv("SCHEDULER_FULL_EXTRACTION_SLACK", "15"))
+    SCHEDULER_EXPECTED_STEPS: int = int(os.getenv("SCHEDULER_EXPECTED_STEPS", "3"))
+    
+    # Structured {answer, type, confidence} replies via JSON mode
+    LLM_STRUCTURED_OUTPUT: bool = os.getenv("LLM_STRUCTURED_OUTPUT", "1") in ("1", "true", "True")
+    
+    # Retry strategy: "serial" (one LLM call per retry) or "candidates"
+    # (sample RETRY_CANDIDATES answers once and submit them in rank order)
+    RETRY_MODE: str = os.getenv("RETRY_MODE", "serial")
+    RETRY_CANDIDATES: int = int(os.getenv("RETRY_CANDIDATES", "3"))
+    RETRY_CANDIDATE_TEMPERATURE: float = float(os.getenv("RETRY_CANDIDATE_TEMPERATURE", "0.8"))
+    
+    # Prompt assembly
+    PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+    PROMPT_MAX_ROWS: int = int(os.getenv("PROMPT_MAX_ROWS", "200"))
+    
+    # Retrieval over long PDF/page text
+    RETRIEVAL_MIN_TOKENS: int = int(os.getenv("RETRIEVAL_MIN_TOKENS", "1500"))
+    RETRIEVAL_TOKEN_BUDGET: int = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1500"))
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+    RETRIEVAL_CHUNK_CHARS: int = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1200"))
+    RETRIEVAL_CHUNK_OVERLAP: int = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "150"))
+    RETRIEVAL_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", "32"))
+    
+    # Hedged LLM requests (fire the fallback provider when the primary is slow)
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "1") in ("1", "true", "True")
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+    LLM_HEDGE_DEFAULT_DELAY: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "8"))
+    LLM_HEDGE_BUDGET: float = float(os.getenv("LLM_HEDGE_BUDGET", "0.2"))
+    
+    # Per-provider circuit breakers
+    LLM_BREAKER_WINDOW: int = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+    LLM_BREAKER_MIN_CALLS: int = int(os.getenv("LLM_BREAKER_MIN_CALLS", "4"))
+    LLM_BREAKER_ERROR_RATE: float = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    LLM_BREAKER_SLOW_SECONDS: float = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "20"))
+    LLM_BREAKER_SLOW_RATE: float = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+    LLM_BREAKER_OPEN_SECONDS: float = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+    LLM_BREAKER_HALF_OPEN_PROBES: int = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "1"))
 
 
 settings = Settings()
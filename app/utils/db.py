@@ -0,0 +1,27 @@
+"""SQLite helper shared by the local durable stores."""
+import os
+import sqlite3
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the SQLite database at `path` for use from several threads.
+    
+    The parent directory is created if needed, and WAL journaling lets
+    readers proceed while a write commits. Callers serialize their own
+    writes with a lock.
+    
+    Args:
+        path: Database file, or ":memory:"
+        
+    Returns:
+        Open connection
+    """
+    directory = os.path.dirname(path)
+    if directory and path != ":memory:":
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+    conn.row_factory = sqlite3.Row
+    if path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,71 @@
+"""Solve-wide deadline shared by every network call in a quiz chain."""
+import time
+from app.utils.config import settings
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the remaining solve budget cannot cover a call."""
+
+    def __init__(self, stage: str, remaining: float):
+        super().__init__(f"Deadline exceeded during {stage} ({remaining:.1f}s left)")
+        self.stage = stage
+        self.remaining = remaining
+
+
+class Deadline:
+    """Absolute deadline for a solve, created once at solve start.
+    
+    Each network call asks for `timeout(cap, stage)`, which returns
+    min(cap, remaining - reserve) so that a call can never outlive the
+    window. `reserve` keeps time back for the final submit.
+    """
+
+    def __init__(self, seconds: float, start: float | None = None, reserve: float | None = None):
+        start = time.time() if start is None else start
+        self.start = start
+        self.expires_at = start + seconds
+        self.reserve = settings.DEADLINE_RESERVE_SECONDS if reserve is None else reserve
+
+    def elapsed(self) -> float:
+        """Seconds since the solve started."""
+        return time.time() - self.start
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline (negative once past it)."""
+        return self.expires_at - time.time()
+
+    def expired(self, reserve: float = 0.0) -> bool:
+        """Return True if less than `reserve` seconds are left."""
+        return self.remaining() <= reserve
+
+    def timeout(self, cap: float, stage: str, reserve: float | None = None) -> float:
+        """Timeout for one call: its own cap, bounded by the remaining budget.
+        
+        Args:
+            cap: The call's own timeout in seconds
+            stage: Name of the call, used in the error
+            reserve: Seconds to keep back (defaults to the deadline's reserve)
+            
+        Returns:
+            Timeout in seconds
+            
+        Raises:
+            DeadlineExceeded: If less than the minimum call time is left
+        """
+        reserve = self.reserve if reserve is None else reserve
+        available = self.remaining() - reserve
+        if available < settings.DEADLINE_MIN_CALL_SECONDS:
+            raise DeadlineExceeded(stage, self.remaining())
+        return min(cap, available)
+
+    def check(self, stage: str, reserve: float = 0.0) -> None:
+        """Raise DeadlineExceeded if fewer than `reserve` seconds are left."""
+        if self.expired(reserve):
+            raise DeadlineExceeded(stage, self.remaining())
+
+
+def call_timeout(deadline: "Deadline | None", cap: float, stage: str, reserve: float | None = None) -> float:
+    """Return `cap`, or the deadline-bounded timeout when a deadline is given."""
+    if deadline is None:
+        return cap
+    return deadline.timeout(cap, stage, reserve)
@@ -0,0 +1,52 @@
+"""Process-wide HTTP clients so concurrent solves share connection pools."""
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from app.utils.config import settings
+
+_session: requests.Session | None = None
+_client: httpx.Client | None = None
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the shared requests session used for LLM and submit calls.
+    
+    Its adapter keeps up to HTTP_POOL_SIZE connections per host alive, so
+    every chain reuses warm connections instead of opening its own.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=settings.HTTP_POOL_SIZE, pool_maxsize=settings.HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def get_httpx_client() -> httpx.Client:
+    """Return the shared httpx client used for plain page fetches."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=settings.HTTP_POOL_SIZE,
+                                    max_keepalive_connections=settings.HTTP_POOL_SIZE),
+            )
+        return _client
+
+
+def close_clients() -> None:
+    """Close the shared clients (they are recreated on next use)."""
+    global _session, _client
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _client is not None:
+            _client.close()
+            _client = None
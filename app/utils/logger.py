@@ -1,22 +1,213 @@
-"""Logging utility for the application."""
+"""Logging utility for the application.
+
+Every logger created by `get_logger` hands its records to one shared queue;
+a single listener thread formats them (JSON by default) and writes them to
+stdout, so request threads never contend for stdout. Records are reduced to
+plain strings before they are queued, so a backlog holds no live objects.
+Noisy INFO/DEBUG messages are rate limited per call site, and long fields
+are truncated.
+"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+from app.utils.config import settings
+from app.utils import metrics
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "suppressed"}
+
+
+def _truncate(text: str, limit: int) -> str:
+    if limit > 0 and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} more chars]"
+    return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with every field capped at LOG_FIELD_MAX_CHARS."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        limit = settings.LOG_FIELD_MAX_CHARS
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": _truncate(record.getMessage(), limit),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value if isinstance(value, (int, float, bool, type(None))) else _truncate(str(value), limit)
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        exc = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exc:
+            entry["exc"] = _truncate(exc, limit)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic one-line format, with the message capped at LOG_FIELD_MAX_CHARS."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = _truncate(record.message, settings.LOG_FIELD_MAX_CHARS)
+        line = super().formatMessage(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+
+class RateLimitFilter(logging.Filter):
+    """Pass at most `limit` INFO/DEBUG records per call site every `window` seconds.
+
+    Warnings and errors always pass. The first record after a throttled
+    window carries the number of records dropped in `suppressed`.
+    """
+
+    def __init__(self, limit: int, window: float):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                dropped = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if dropped:
+                    record.suppressed = dropped
+                return True
+            if site[1] < self.limit:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues snapshots of records and drops them when the queue is full.
+
+    Drops are counted in `quiz_log_records_dropped_total`, and once the
+    queue has room again a warning reports them, at most once per
+    LOG_RATE_WINDOW_SECONDS.
+    """
+
+    dropped = 0
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self._reported = _DroppingQueueHandler.dropped
+        self._reported_at = 0.0
+        self._report_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # render the message, traceback and extras now so a queued record keeps
+        # no args, frames or other live objects alive; layout is still left to
+        # the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_ATTRS and not isinstance(value, (str, int, float, bool, type(None))):
+                setattr(record, key, str(value))
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._report_dropped()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+            metrics.log_records_dropped_total.inc()
+
+    def _report_dropped(self) -> None:
+        """Queue a warning with the records dropped since the last one, if there is room."""
+        now = time.monotonic()
+        with self._report_lock:
+            missing = _DroppingQueueHandler.dropped - self._reported
+            if not missing or now - self._reported_at < settings.LOG_RATE_WINDOW_SECONDS:
+                return
+            warning = logging.makeLogRecord({
+                "name": "logger", "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": f"Dropped {missing} log records: the log queue was full",
+            })
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                return
+            self._reported += missing
+            self._reported_at = now
+
+
+_handler: logging.Handler | None = None
+_listener: logging.handlers.QueueListener | None = None
+_setup_lock = threading.Lock()
+
+
+def _queue_handler() -> logging.Handler:
+    """Return the shared queue handler, starting its listener on first use."""
+    global _handler, _listener
+    with _setup_lock:
+        if _handler is None:
+            records: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+            output = logging.StreamHandler(sys.stdout)
+            output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+            _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+            handler = _DroppingQueueHandler(records)
+            handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMIT, settings.LOG_RATE_WINDOW_SECONDS))
+            _handler = handler
+        return _handler
+
+
+def _level_for(name: str) -> int:
+    """Level for logger `name` from LOG_LEVELS ("solver=DEBUG,llm=WARNING"), else LOG_LEVEL."""
+    levels = dict(
+        item.split("=", 1) for item in settings.LOG_LEVELS.replace(" ", "").split(",") if "=" in item
+    )
+    return logging.getLevelName(levels.get(name, settings.LOG_LEVEL).upper())
 
 
 def get_logger(name: str = __name__) -> logging.Logger:
     """Create a configured logger for the application.
-    
+
     Args:
         name: Logger name (typically module name)
-        
+
     Returns:
         Configured logger instance
     """
     logger = logging.getLogger(name)
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        fmt = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
-        handler.setFormatter(logging.Formatter(fmt))
-        logger.addHandler(handler)
-        logger.setLevel(logging.INFO)
+        logger.addHandler(_queue_handler())
+        level = _level_for(name)
+        logger.setLevel(level if isinstance(level, int) else logging.INFO)
     return logger
+
+
+def flush_logs() -> None:
+    """Write out every queued record (e.g. before exit or in tests)."""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
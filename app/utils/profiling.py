@@ -0,0 +1,150 @@
+"""Opt-in per-solve profiling: sampled stacks plus tracemalloc allocations.
+
+The solve spreads over the event loop and worker threads, which cProfile
+(one thread per profiler) cannot follow, so a sampler thread reads every
+thread's stack with `sys._current_frames()` at a fixed interval instead.
+Stacks are saved in the folded format read by flamegraph.pl, speedscope
+and inferno, next to a JSON summary with the hottest functions, the top
+allocating lines and peak traced memory.
+
+Nothing here runs unless a solve asks for a profile.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Dict, List
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("profiling")
+
+# Leaf frames in these files are threads parked on a lock, queue or selector
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+_busy = threading.Lock()
+
+
+class ProfileSession:
+    """One profiled solve; only one runs at a time since tracemalloc is process-wide."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.started_at: float | None = None
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._owns_tracemalloc = False
+
+    def start(self) -> None:
+        """Start sampling stacks and tracing allocations."""
+        self.started_at = time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+            self._owns_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop, save the artifacts and release the profiler; return the summary."""
+        try:
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+            summary = self._summary(snapshot, current, peak)
+            try:
+                self._save(summary)
+            except OSError as e:
+                logger.warning("Could not save profile %s to %s: %s", self.id, settings.PROFILE_DIR, e)
+            logger.info("Saved profile %s (%d samples, peak %.1f MiB)", self.id, self._samples, peak / 2**20)
+            return summary
+        finally:
+            _busy.release()
+
+    def discard(self) -> None:
+        """Release a session that was never started."""
+        _busy.release()
+
+    def _sample_loop(self) -> None:
+        interval = settings.PROFILE_INTERVAL_MS / 1000.0
+        own = threading.get_ident()
+        while not self._stop.wait(interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self._samples += 1
+
+    def _summary(self, snapshot: tracemalloc.Snapshot, current: int, peak: int) -> Dict[str, Any]:
+        top_n = settings.PROFILE_TOP_N
+        own_time: Counter = Counter()
+        total_time: Counter = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(";")[1:]
+            own_time[frames[-1]] += count
+            for name in set(frames):
+                total_time[name] += count
+        snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        allocators = [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_kib": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:top_n]
+        ]
+        return {
+            "id": self.id,
+            "started_at": self.started_at,
+            "duration": round(time.time() - self.started_at, 3),
+            "interval_ms": settings.PROFILE_INTERVAL_MS,
+            "samples": self._samples,
+            "top_self": [{"frame": f, "samples": n} for f, n in own_time.most_common(top_n)],
+            "top_total": [{"frame": f, "samples": n} for f, n in total_time.most_common(top_n)],
+            "top_allocators": allocators,
+            "peak_memory_mib": round(peak / 2**20, 2),
+            "traced_memory_mib": round(current / 2**20, 2),
+        }
+
+    def _save(self, summary: Dict[str, Any]) -> None:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILE_DIR, self.id)
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self._stacks.items())
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+
+
+def reserve_profile() -> ProfileSession | None:
+    """Return a new session, or None if profiling is off or another profile is running."""
+    if not settings.PROFILING_ENABLED or not _busy.acquire(blocking=False):
+        return None
+    return ProfileSession()
+
+
+def load_profile(profile_id: str, folded: bool = False) -> Dict[str, Any] | str | None:
+    """Return a saved profile's summary, or its folded stacks; None if unknown."""
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, profile_id + (".folded" if folded else ".json"))
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read() if folded else json.load(f)
+    except FileNotFoundError:
+        return None
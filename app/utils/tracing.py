@@ -0,0 +1,169 @@
+"""Sampled tracing spans exported as OpenTelemetry-style JSON lines.
+
+A span opened with no active parent starts a trace and rolls the sampling
+decision; nested spans inherit it through a context variable, which
+`asyncio.to_thread` carries into worker threads. Finished spans are queued
+to a background writer, so exporting never blocks the solve.
+"""
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator
+from app.utils.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger("tracing")
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace."""
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_span_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    def set(self, **attributes: Any) -> None:
+        """Add or overwrite attributes."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OTLP field names with a flat attribute map."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded when tracing is off or the trace was not sampled."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: contextvars.ContextVar[Span | _NoopSpan | None] = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    """Appends finished spans to a JSONL file from a background thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self.exported = 0
+        self.dropped = 0
+        threading.Thread(target=self._write_loop, name="span-exporter", daemon=True).start()
+
+    def export(self, span: Span) -> None:
+        """Queue `span` for writing."""
+        self._queue.put(span)
+
+    def flush(self) -> None:
+        """Block until every queued span has been written."""
+        self._queue.join()
+
+    def _write_loop(self) -> None:
+        while True:
+            span = self._queue.get()
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+                self.exported += 1
+            except OSError as e:
+                self.dropped += 1
+                logger.warning("Could not export span %s to %s: %s", span.name, self.path, e)
+            finally:
+                self._queue.task_done()
+
+
+_exporter: SpanExporter | None = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> SpanExporter:
+    """Return the exporter writing to TRACE_FILE."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None or _exporter.path != settings.TRACE_FILE:
+            _exporter = SpanExporter(settings.TRACE_FILE)
+        return _exporter
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    """Time the enclosed block as a span of the current trace.
+
+    With tracing disabled, or inside an unsampled trace, this yields a no-op
+    span and records nothing. An exception marks the span as an error and
+    propagates.
+
+    Args:
+        name: Operation name, e.g. "fetch_page_and_downloads"
+        **attributes: Initial span attributes
+
+    Yields:
+        The span, whose `set()` adds attributes
+    """
+    parent = _current.get()
+    if parent is NOOP_SPAN or (parent is None and not settings.TRACING_ENABLED):
+        yield NOOP_SPAN
+        return
+    if parent is None and random.random() >= settings.TRACE_SAMPLE_RATE:
+        # unsampled root: children must not start traces of their own
+        token = _current.set(NOOP_SPAN)
+        try:
+            yield NOOP_SPAN
+        finally:
+            _current.reset(token)
+        return
+
+    if parent is None:
+        current = Span(name, trace_id=uuid.uuid4().hex, attributes=attributes)
+    else:
+        current = Span(name, trace_id=parent.trace_id, parent_span_id=parent.span_id, attributes=attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.set(error=f"{type(e).__name__}: {e}"[:300])
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        get_exporter().export(current)
+
+
+def current_span() -> Span | _NoopSpan:
+    """The active span, for adding attributes from a callee; a no-op span if none."""
+    return _current.get() or NOOP_SPAN
+
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap `fn` to run in a copy of the caller's context, for thread pool submits."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)